@@ -0,0 +1 @@
+"""Offline benchmarks. Run individual benchmarks with `python -m bench.<name>`."""
@@ -0,0 +1,88 @@
+"""
+Benchmark: ReAct agent versus native tool calling on multi-hop questions.
+
+Every question needs `--hops` independent searches. The ReAct agent makes one
+search per step (one LLM round-trip each, searches in sequence); the
+tool-calling agent requests all searches in one step and runs them
+concurrently. Fake LLM and Tavily backends with fixed latencies stand in for
+the real ones.
+
+    python -m bench.agent_modes --questions 10 --hops 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from bench.fakes import (
+    FakeAsyncTavilyClient,
+    FakeChatModel,
+    FakeTavilyAPIWrapper,
+    FakeToolCallingModel,
+    multi_hop_react_responder,
+)
+
+
+def make_question(index: int, hops: int) -> str:
+    return " and ".join(f"fact {index}.{hop}" for hop in range(hops))
+
+
+async def run_mode(mode: str, args) -> dict:
+    """Asks every question once, one after another, with a fresh executor in `mode`."""
+    from langchain_community.tools import TavilySearchResults
+    from logic import chat_agent
+
+    if mode == "react":
+        llm = FakeChatModel(responder=multi_hop_react_responder, latency=args.llm_latency)
+    else:
+        llm = FakeToolCallingModel(latency=args.llm_latency)
+    tavily = FakeAsyncTavilyClient(latency=args.tool_latency)
+    # The uncached tool, so both modes pay for every search
+    search_tool = TavilySearchResults(max_results=3, api_wrapper=FakeTavilyAPIWrapper(tavily_api_key="fake", fake_client=tavily))
+    chat_agent.configure(llm=llm, tools=[search_tool], mode=mode)
+
+    timings = []
+    for index in range(args.questions):
+        executor = chat_agent.build_agent_executor(chat_agent.build_memory())
+        start = time.perf_counter()
+        await executor.ainvoke({"input": make_question(index, args.hops)})
+        timings.append(time.perf_counter() - start)
+    return {
+        "mean_s": statistics.mean(timings),
+        "max_s": max(timings),
+        "llm_calls_per_question": llm.calls / args.questions,
+        "tool_calls_per_question": tavily.calls / args.questions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10, help="Questions per mode (default: 10)")
+    parser.add_argument("--hops", type=int, default=2, help="Searches each question needs (default: 2)")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tool-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    os.environ["SESSION_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-sessions-")
+    logging.basicConfig(level=logging.WARNING)
+
+    results = {}
+    # The agent executor is verbose; keep its chain output out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for mode in ("react", "tool_calling"):
+            results[mode] = asyncio.run(run_mode(mode, args))
+
+    print(f"questions={args.questions} hops={args.hops} llm_latency={args.llm_latency} tool_latency={args.tool_latency}")
+    print(f"{'mode':<14}{'mean s':>10}{'max s':>10}{'LLM calls':>12}{'tool calls':>12}")
+    for mode, report in results.items():
+        print(f"{mode:<14}{report['mean_s']:>10.3f}{report['max_s']:>10.3f}"
+              f"{report['llm_calls_per_question']:>12.1f}{report['tool_calls_per_question']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
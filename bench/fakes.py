@@ -0,0 +1,245 @@
+"""Fake providers with configurable latency, used by the offline benchmarks."""
+import asyncio
+import itertools
+import random
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning scripted responses after a fixed latency.
+
+    Responses are cycled through in order, unless `responder` is given: it then
+    receives the prompt text and returns the response, which keeps scripted
+    conversations consistent when many sessions share one model. With
+    `error_rate` > 0 a call fails with a RuntimeError at that probability.
+    `calls` counts every invocation.
+    """
+
+    responses: List[str] = ["Final Answer: ok"]
+    responder: Optional[Callable[[str], str]] = None
+    latency: float = 0.0
+    error_rate: float = 0.0
+
+    _cycle: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _next_response(self, messages: List[BaseMessage]) -> str:
+        with self._lock:
+            self._calls += 1
+            if self.responder is not None:
+                return self.responder("\n".join(str(m.content) for m in messages))
+            if self._cycle is None:
+                self._cycle = itertools.cycle(self.responses)
+            return next(self._cycle)
+
+    def _result(self, text: str) -> ChatResult:
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        text = self._next_response(messages)
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(text)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        # Sleep on the event loop instead of tying up a thread per concurrent call
+        text = self._next_response(messages)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(text)
+
+
+def react_responder(prompt: str) -> str:
+    """
+    Scripted ReAct model: searches for the question once, then answers.
+
+    Summary prompts from the conversation memory get a short summary back, and
+    any other prompt that is not a ReAct prompt (e.g. the router's single
+    answer call) gets a plain answer.
+    """
+    if "Progressively summarize" in prompt:
+        return "The user asked a few questions and got answers."
+    if "New input:" not in prompt:
+        return "Here is what I found."
+    question = prompt.rsplit("New input:", 1)[-1].split("\n", 1)[0].strip()
+    # The scratchpad holds our own Action Input once the search has run
+    if f"Action Input: {question}" in prompt:
+        return "I now know the final answer.\nFinal Answer: Here is what I found."
+    return f"I should search for this.\nAction: tavily_search_results_json\nAction Input: {question}"
+
+
+def multi_hop_questions(question: str) -> list[str]:
+    """The independent lookups a benchmark question needs: "a and b and c" -> [a, b, c]."""
+    return [part.strip() for part in question.split(" and ")]
+
+
+def multi_hop_react_responder(prompt: str) -> str:
+    """
+    Scripted ReAct model for multi-hop questions: one search per step, then answers.
+
+    A question "a and b" takes a search for "a", a search for "b" and a final
+    answer, i.e. one LLM call per lookup plus one.
+    """
+    if "Progressively summarize" in prompt:
+        return "The user asked a few questions and got answers."
+    question = prompt.rsplit("New input:", 1)[-1].split("\n", 1)[0].strip()
+    for part in multi_hop_questions(question):
+        if f"Action Input: {part}" not in prompt:
+            return f"I still need to look up {part}.\nAction: tavily_search_results_json\nAction Input: {part}"
+    return "I now know the final answer.\nFinal Answer: Here is what I found."
+
+
+class FakeToolCallingModel(FakeChatModel):
+    """
+    Chat model with native tool calling for multi-hop questions.
+
+    The first call requests one search per lookup in the question, all in the
+    same step; once the tool results are in, the next call answers.
+    """
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _tool_calling_result(self, messages: List[BaseMessage]) -> ChatResult:
+        with self._lock:
+            self._calls += 1
+        if "Progressively summarize" in str(messages[-1].content):
+            return self._result("The user asked a few questions and got answers.")
+        if any(isinstance(m, ToolMessage) for m in messages):
+            return self._result("Here is what I found.")
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error")
+        question = str(messages[-1].content)
+        tool_calls = [
+            {"name": "tavily_search_results_json", "args": {"query": part}, "id": f"call_{i}"}
+            for i, part in enumerate(multi_hop_questions(question))
+        ]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="", tool_calls=tool_calls))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._tool_calling_result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._tool_calling_result(messages)
+
+
+# Padding so fake results are about as long as real page extracts
+_FILLER = " ".join(f"Sentence {i} of the page is about something else entirely." for i in range(6))
+
+
+def _fake_tavily_response(query: str) -> dict:
+    return {
+        "query": query,
+        "answer": f"A fake answer about {query}.",
+        "images": [f"https://example.com/{i}.jpg" for i in range(3)],
+        "results": [
+            {"title": f"Result {i} for {query}", "url": f"https://example.com/{'-'.join(query.split())}/{i}",
+             "content": f"{_FILLER} Fake content {i} about {query}. {_FILLER}", "score": 1.0 - i / 10}
+            for i in range(5)
+        ],
+        "response_time": 0.0,
+    }
+
+
+class FakeTavilyClient:
+    """Stands in for both TavilyClient and AsyncTavilyClient."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def _respond(self, query: str) -> dict:
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("Fake Tavily error")
+        return _fake_tavily_response(query)
+
+    def search(self, query: str, **kwargs) -> dict:
+        time.sleep(self.latency)
+        return self._respond(query)
+
+    async def asearch(self, query: str, **kwargs) -> dict:
+        await asyncio.sleep(self.latency)
+        return self._respond(query)
+
+
+class FakeAsyncTavilyClient(FakeTavilyClient):
+    """FakeTavilyClient exposing the async client's `search` coroutine."""
+
+    async def search(self, query: str, **kwargs) -> dict:
+        return await self.asearch(query, **kwargs)
+
+
+class FakeTavilyAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily wrapper for the agent's search tool, backed by a FakeTavilyClient."""
+
+    fake_client: Any = None
+
+    def raw_results(self, query: str, *args, **kwargs) -> dict:
+        return self.fake_client.search(query)
+
+    async def raw_results_async(self, query: str, *args, **kwargs) -> dict:
+        return await self.fake_client.asearch(query)
+
+
+class FakeYouTubeClient:
+    """Mimics the chained youtube.search().list(...).execute() API."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def search(self):
+        return self
+
+    def list(self, q: str = "", maxResults: int = 10, **kwargs):
+        return _FakeYouTubeRequest(self, q, maxResults)
+
+
+class _FakeYouTubeRequest:
+    def __init__(self, client: FakeYouTubeClient, query: str, max_results: int):
+        self.client = client
+        self.query = query
+        self.max_results = max_results
+
+    def execute(self) -> dict:
+        self.client.calls += 1
+        time.sleep(self.client.latency)
+        if self.client.error_rate and random.random() < self.client.error_rate:
+            raise RuntimeError("Fake YouTube error")
+        return {"items": [
+            {"id": {"videoId": f"fake{i}"},
+             "snippet": {"title": f"Video {i} about {self.query}",
+                         "thumbnails": {"default": {"url": f"https://i.ytimg.com/vi/fake{i}/default.jpg"}}}}
+            for i in range(self.max_results)
+        ]}
@@ -0,0 +1,266 @@
+"""
+Offline benchmark of the chat agent and the search pipeline.
+
+Fake LLM, Tavily and YouTube backends (see bench/fakes.py) replace the real
+providers, each with configurable latency and error rate, so no API keys or
+network access are needed. N concurrent sessions each run a number of turns;
+the report gives p50/p95/p99 latency, throughput and LLM calls per turn.
+
+    python -m bench --scenario all --sessions 20 --turns 5
+    python -m bench --scenario chat --llm-latency 0.5 --json bench_output.json
+    python -m bench --scenario search --fail-above-p95 1.0   # regression gate
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fakes import (
+    FakeAsyncTavilyClient,
+    FakeChatModel,
+    FakeTavilyAPIWrapper,
+    FakeTavilyClient,
+    FakeYouTubeClient,
+    react_responder,
+)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Latency percentiles and throughput over every attempted turn."""
+    count = len(latencies) + errors
+    return {
+        "turns": count,
+        "errors": errors,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "mean_s": sum(latencies) / len(latencies) if latencies else 0.0,
+        "throughput_per_s": count / elapsed if elapsed else 0.0,
+        "elapsed_s": elapsed,
+    }
+
+
+def install_fakes(args) -> dict:
+    """Points the app's modules at fake providers and returns them for call counting."""
+    from logic import chat_agent, search_agent, youtube_agent
+    from tools.cached_search import CachedTavilySearchResults
+    from tools.random_joke import ProvideJoke
+
+    fakes = {
+        "llm": FakeChatModel(responder=react_responder, latency=args.llm_latency, error_rate=args.error_rate),
+        "tavily": FakeTavilyClient(latency=args.tavily_latency, error_rate=args.error_rate),
+        "tavily_async": FakeAsyncTavilyClient(latency=args.tavily_latency, error_rate=args.error_rate),
+        "youtube": FakeYouTubeClient(latency=args.youtube_latency, error_rate=args.error_rate),
+    }
+    search_agent.client = fakes["tavily"]
+    search_agent.async_client = fakes["tavily_async"]
+    youtube_agent.get_youtube_client = lambda *a, **k: fakes["youtube"]
+    chat_agent.configure(
+        llm=fakes["llm"],
+        tools=[
+            CachedTavilySearchResults(max_results=3, api_wrapper=FakeTavilyAPIWrapper(tavily_api_key="fake", fake_client=fakes["tavily_async"])),
+            ProvideJoke(),
+        ],
+    )
+    return fakes
+
+
+def make_query(session: int, turn: int, distinct: int) -> str:
+    # Cycling through `distinct` queries controls how often the search cache can hit
+    return f"benchmark query {(session * 1000 + turn) % distinct if distinct else session * 1000 + turn}"
+
+
+def make_prompt(session: int, turn: int, args) -> str:
+    """A chat prompt; `args.fast_path_share` of them are jokes or explicit searches the router handles."""
+    query = make_query(session, turn, args.distinct_queries)
+    if random.Random(session * 1000 + turn).random() < args.fast_path_share:
+        return "tell me a joke" if turn % 2 else f"search for {query}"
+    return query
+
+
+async def run_chat(args, fakes: dict) -> dict:
+    """Drives `arun_turn` from `args.sessions` concurrent sessions on one event loop."""
+    from logic.chat_agent import arun_turn, get_answer_cache, route_stats
+
+    latencies, errors = [], 0
+
+    async def session(index: int):
+        nonlocal errors
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            try:
+                await arun_turn(f"bench-{index}", make_prompt(index, turn, args))
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(args.sessions)))
+    report = summarize(latencies, errors, time.perf_counter() - start)
+    report["llm_calls"] = fakes["llm"].calls
+    report["llm_calls_per_turn"] = fakes["llm"].calls / report["turns"] if report["turns"] else 0.0
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        stats = answer_cache.stats()
+        report["answer_cache_hit_rate"] = stats["hit_rate"]
+        report["answer_cache_saved_s"] = stats["saved_latency_s"]
+    for route, counters in route_stats.stats().items():
+        report[f"route_{route}_turns"] = counters["turns"]
+        report[f"route_{route}_mean_s"] = counters["mean_s"]
+    return report
+
+
+def run_search(args, fakes: dict) -> dict:
+    """Runs `search_all` from `args.sessions` threads, like concurrent Streamlit sessions."""
+    from logic.multi_search import search_all
+
+    # list.append is atomic, so the session threads can share these
+    latencies, failures = [], []
+
+    def session(index: int):
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            outcome = search_all(make_query(index, turn, args.distinct_queries))
+            (failures if outcome["errors"] else latencies).append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        list(pool.map(session, range(args.sessions)))
+    report = summarize(latencies, len(failures), time.perf_counter() - start)
+    report["tavily_calls"] = fakes["tavily"].calls
+    report["youtube_calls"] = fakes["youtube"].calls
+    return report
+
+
+def cache_report() -> dict:
+    """Search cache hits/misses and coalesced calls, per namespace."""
+    from logic import search_cache
+
+    stats = search_cache.stats()
+    return {
+        f"{namespace}_{counter}": value
+        for group in (stats["namespaces"], stats["coalescing"])
+        for namespace, counters in group.items()
+        for counter, value in counters.items()
+    }
+
+
+def rate_limit_report() -> dict:
+    """Throttled waits, retries and failures per upstream provider."""
+    from logic import rate_limit
+
+    return {
+        f"{provider}_{counter}": value
+        for provider, counters in rate_limit.stats().items()
+        for counter, value in counters.items()
+        if counter != "circuit"
+    }
+
+
+def stage_report() -> dict:
+    """p50/p95 seconds per telemetry stage (LLM, tool, memory, search, turn)."""
+    from logic import telemetry
+
+    return {
+        f"{stage}_{counter}": value
+        for stage, summary in telemetry.stage_stats().items()
+        for counter, value in summary.items()
+        if counter in ("p50_s", "p95_s")
+    }
+
+
+def compaction_report() -> dict:
+    """Observation tokens sent to the agent's prompts and saved by compaction."""
+    from logic.compaction import observation_compactor
+
+    return observation_compactor.stats()
+
+
+def print_report(name: str, report: dict) -> None:
+    print(f"\n[{name}]")
+    for key, value in report.items():
+        print(f"  {key:<28}{value:.4f}" if isinstance(value, float) else f"  {key:<28}{value}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["chat", "search", "all"], default="all")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions (default: 10)")
+    parser.add_argument("--turns", type=int, default=5, help="Turns per session (default: 5)")
+    parser.add_argument("--distinct-queries", type=int, default=0,
+                        help="Cycle through this many distinct queries (default: 0 = all distinct, no cache hits)")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tavily-latency", type=float, default=0.5)
+    parser.add_argument("--youtube-latency", type=float, default=0.3)
+    parser.add_argument("--no-answer-cache", action="store_true", help="Disable the semantic answer cache")
+    parser.add_argument("--fast-path-share", type=float, default=0.0,
+                        help="Share of chat prompts that are jokes or 'search for ...' (default: 0)")
+    parser.add_argument("--no-fast-path", action="store_true", help="Send every prompt through the agent loop")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Failure probability of every fake provider")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    parser.add_argument("--fail-above-p95", type=float, metavar="SECONDS",
+                        help="Exit with status 1 if any scenario's p95 latency exceeds this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Keep benchmark sessions out of the real session store
+    os.environ["SESSION_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-sessions-")
+    # The fakes have no quota; export e.g. TAVILY_RATE=5 to benchmark under the real limits
+    for provider in ("TAVILY", "YOUTUBE", "GEMINI"):
+        os.environ.setdefault(f"{provider}_RATE", "1000")
+        os.environ.setdefault(f"{provider}_BURST", "1000")
+    # The app leaves the answer cache off by default; the benchmark measures it unless told not to
+    os.environ["SEMANTIC_CACHE"] = "0" if args.no_answer_cache else os.environ.get("SEMANTIC_CACHE", "1")
+    if args.no_fast_path:
+        os.environ["FAST_PATH"] = "0"
+
+    # Configured before the app modules are imported, so their INFO logging stays quiet
+    logging.basicConfig(level=logging.WARNING)
+    fakes = install_fakes(args)
+
+    reports = {}
+    # The agent executor is verbose; keep its chain output out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.scenario in ("chat", "all"):
+            reports["chat"] = asyncio.run(run_chat(args, fakes))
+        if args.scenario in ("search", "all"):
+            reports["search"] = run_search(args, fakes)
+    reports["search_cache"] = cache_report()
+    reports["rate_limit"] = rate_limit_report()
+    reports["stages"] = stage_report()
+    reports["compaction"] = compaction_report()
+
+    print(f"sessions={args.sessions} turns={args.turns} error_rate={args.error_rate}")
+    for name, report in reports.items():
+        print_report(name, report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": reports}, f, indent=2)
+
+    if args.fail_above_p95 is not None:
+        slow = [name for name, report in reports.items() if report.get("p95_s", 0) > args.fail_above_p95]
+        if slow:
+            print(f"\np95 above {args.fail_above_p95}s in: {', '.join(slow)}", file=sys.stderr)
+            return 1
+    return 0
@@ -0,0 +1,72 @@
+"""
+Micro-benchmark of the image pipeline (logic.image_cache) against a local stub host.
+
+The stub serves full-size JPEGs with a fixed latency, plus one slow and one
+broken URL, so the numbers show what a grid of images costs downloaded one by
+one at full size, on a cold cache (parallel fetch and downscale), and warm
+from memory and from disk.
+
+    python -m bench.image_fetch --images 12 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# Keep benchmark images out of the real cache; set before logic.image_cache is imported
+os.environ["IMAGE_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-images-")
+# The stub host listens on 127.0.0.1, which the image proxy refuses by default
+os.environ["IMAGE_FETCH_ALLOW_PRIVATE"] = "1"
+
+from bench.stub_server import StubServer, jpeg_route
+from logic import image_cache
+
+
+def slow_route(delay: float):
+    def route(path):
+        time.sleep(delay)
+        return 200, "image/jpeg", b""
+    return route
+
+
+def timed(fn) -> tuple[float, object]:
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=12, help="Images in the grid (default: 12)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per image in seconds (default: 0.2)")
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-grid fetch timeout in seconds (default: 1.0)")
+    args = parser.parse_args()
+
+    routes = {
+        "/img/": jpeg_route(1600, 1200),
+        "/slow/": slow_route(args.timeout * 3),
+        "/broken/": lambda path: (500, "text/plain", b"error"),
+    }
+    with StubServer(routes, latency=args.latency) as server:
+        urls = [f"{server.url}img/{i}.jpg" for i in range(args.images)]
+        grid = urls + [f"{server.url}slow/1.jpg", f"{server.url}broken/1.jpg"]
+
+        direct_ms, originals = timed(lambda: [image_cache.fetch_image(url) for url in urls])
+        cold_ms, images = timed(lambda: image_cache.get_images(grid, image_cache.IMAGE_TILE, timeout=args.timeout))
+        warm_ms, _ = timed(lambda: image_cache.get_images(grid, image_cache.IMAGE_TILE, timeout=args.timeout))
+        # A fresh memory tier, so every image comes from disk
+        image_cache.image_cache = image_cache.ImageCache(image_cache.cache_dir, image_cache.memory_max_bytes, image_cache.disk_max_bytes)
+        disk_ms, _ = timed(lambda: image_cache.get_images(urls, image_cache.IMAGE_TILE, timeout=args.timeout))
+
+    loaded = [data for data in images.values() if data]
+    print(f"{'variant':<28}{'ms':>10}")
+    for name, ms in [("direct, sequential", direct_ms), ("cold cache, parallel", cold_ms),
+                     ("warm cache, memory", warm_ms), ("warm cache, disk", disk_ms)]:
+        print(f"{name:<28}{ms:>10.1f}")
+    print(f"\nimages loaded: {len(loaded)}/{len(grid)} (slow and broken hosts skipped)")
+    print(f"bytes per image: {sum(map(len, originals)) // len(originals)} original, "
+          f"{sum(map(len, loaded)) // len(loaded)} resized")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Measures the import cost each Streamlit page pays on a cold start.
+
+Every page's imports run in a fresh interpreter under `python -X importtime`;
+the cumulative time of the page's top-level app modules is reported (best of
+several runs, in milliseconds).
+
+    python -m bench.import_time --runs 5
+"""
+import argparse
+import subprocess
+import sys
+
+# The app modules each page imports at the top of its script
+PAGE_IMPORTS = {
+    "chat.py": ["logic.chat_agent", "logic.conversation_store", "logic.jobs"],
+    "search.py": ["logic.multi_search", "logic.incremental_search", "logic.query_suggest"],
+}
+
+
+def import_time_ms(modules: list[str]) -> float:
+    """Cumulative import time of `modules` in a fresh interpreter, in milliseconds."""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, check=True)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | package"
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() in modules:
+            total_us += int(parts[1])
+    return total_us / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'page':<12}{'import ms (best)':>18}")
+    for page, modules in PAGE_IMPORTS.items():
+        best = min(import_time_ms(modules) for _ in range(args.runs))
+        print(f"{page:<12}{best:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
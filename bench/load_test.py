@@ -0,0 +1,431 @@
+"""
+Load test: how many concurrent users one Streamlit server carries on the chat and search pages.
+
+The app (main.py) runs in a real Streamlit server, started as a subprocess
+with the fake providers of bench/fakes.py installed (images come from a local
+stub server). Each simulated user is a websocket client speaking Streamlit's
+browser protocol: it opens the chat or search page, submits prompts or queries
+through the page's widgets, and follows the reruns of the fragments polling
+the background turn or search, like a browser does, until the answer is on the
+page. The clients share one event loop in this process, so the server does
+the measured work; the number of concurrent users is stepped up level by
+level.
+
+For every level and page the report gives the latency of a script rerun (from
+the client's request to the server's "script finished") and of a whole action
+(prompt answered, search shown), throughput and errors; pages without users
+at a level are left out. Per level it gives the total throughput, turns
+rejected as busy, and the server's resident memory growth per session (Linux
+only; noisy at small levels: freed memory isn't always returned to the OS). The
+saturation point is the first level where p95 rerun latency exceeds --slo, or
+throughput stops growing by at least 10%.
+
+    python -m bench.load_test --levels 1 5 10 20 --actions 3
+    python -m bench.load_test --pages chat --levels 10 40 --json load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Optional
+
+from bench.harness import install_fakes, make_prompt, make_query, percentile
+from bench.stub_server import StubServer, jpeg_route
+
+# The app scripts, next to the bench package
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# URL path of each page in main.py's navigation
+PAGES = {"chat": "chat", "search": "search"}
+# What chat.py answers when the job queue rejects a turn
+BUSY_MESSAGE = "The assistant is busy right now"
+# Users of every level get distinct queries, so later levels don't just hit the search cache
+_user_ids = itertools.count()
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process; None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def serve(args) -> None:
+    """Runs main.py in a Streamlit server on args.port, against the fake providers."""
+    from streamlit.web import bootstrap
+
+    # Keep simulated users out of the real conversation and session stores
+    scratch = tempfile.mkdtemp(prefix="bench-load-")
+    os.environ["CONVERSATION_DB"] = os.path.join(scratch, "conversations.db")
+    os.environ["SESSION_STORE_DIR"] = os.path.join(scratch, "sessions")
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(scratch, "images")
+    os.environ.pop("LOCAL_INDEX_DB", None)
+    # Images come from the stub server on 127.0.0.1, which the image proxy refuses by default
+    os.environ["IMAGE_FETCH_ALLOW_PRIVATE"] = "1"
+    # The fakes have no quota; export e.g. TAVILY_RATE=5 to load-test under the real limits
+    for provider in ("TAVILY", "YOUTUBE", "GEMINI"):
+        os.environ.setdefault(f"{provider}_RATE", "1000")
+        os.environ.setdefault(f"{provider}_BURST", "1000")
+
+    logging.basicConfig(level=logging.WARNING)
+    install_fakes(args)
+    from logic import image_cache
+
+    images = StubServer({"/img/": jpeg_route(640, 480)}).__enter__()
+    fetch_image = image_cache.fetch_image
+    # Result and thumbnail images are served by the stub, under their own path so each is fetched once
+    image_cache.fetch_image = lambda url, *a, **k: fetch_image(f"{images.url}img/{abs(hash(url))}.jpg", *a, **k)
+
+    flag_options = {
+        "server_address": "127.0.0.1",
+        "server_port": args.port,
+        "server_headless": True,
+        "server_fileWatcherType": "none",
+        "browser_gatherUsageStats": False,
+        # Always send whole messages; the clients don't keep the browser's message cache
+        "global_minCachedMessageSize": 2 ** 31,
+    }
+    bootstrap.load_config_options(flag_options)
+    bootstrap.run(os.path.join(APP_DIR, "main.py"), False, [], flag_options)
+
+
+def start_server(argv: list[str], port: int) -> tuple[subprocess.Popen, str]:
+    """Starts `serve` in a subprocess and waits until it answers; returns it and its log path."""
+    log_path = os.path.join(tempfile.mkdtemp(prefix="bench-load-"), "server.log")
+    with open(log_path, "wb") as log:
+        # The agent executor is verbose; keep its chain output out of the report
+        server = subprocess.Popen([sys.executable, "-m", "bench.load_test", *argv, "--serve", "--port", str(port)],
+                                  cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            break
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server, log_path
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        raise RuntimeError(f"Streamlit server did not start:\n{f.read()[-2000:]}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Session:
+    """One simulated browser tab on a page; records how long each rerun and each action took."""
+
+    def __init__(self, page: str, index: int, args, port: int):
+        self.page = page
+        self.index = index
+        self.args = args
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.reruns: list[float] = []
+        self.actions: list[float] = []
+        self.errors = 0
+        self.rejected = 0
+        self._ws = None
+        self._reader: Optional[asyncio.Task] = None
+        self._query_string = ""
+        # Widget ids by element type, and the values of non-trigger widgets the user has set
+        self._widget_ids: dict[str, str] = {}
+        self._widget_states: dict[str, object] = {}
+        self._requested_at: Optional[float] = None
+        # Full script runs started, and the last one that finished with nothing left pending
+        self._full_runs = 0
+        self._settled_run = 0
+        self._settled = asyncio.Event()
+        self._polling = False
+        self._pollers: list[asyncio.Task] = []
+        self._markdown: list[str] = []
+        self._exceptions: list[str] = []
+
+    def _rerun(self, trigger=None, fragment_id: str = "") -> None:
+        """Asks the server for a script run, sending the widget states as the browser would."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self._query_string
+        state.page_name = PAGES[self.page]
+        state.widget_states.widgets.extend(self._widget_states.values())
+        if trigger is not None:
+            state.widget_states.widgets.append(trigger)
+        if fragment_id:
+            state.fragment_id = fragment_id
+            state.is_auto_rerun = True
+        if self._requested_at is None:
+            self._requested_at = time.perf_counter()
+        self._ws.write_message(msg.SerializeToString(), binary=True)
+
+    async def _poll(self, interval: float, fragment_id: str) -> None:
+        # A fragment with run_every: the browser reruns it on a timer until the next full run
+        while True:
+            await asyncio.sleep(interval)
+            self._rerun(fragment_id=fragment_id)
+
+    def _stop_polling(self) -> None:
+        for poller in self._pollers:
+            poller.cancel()
+        self._pollers.clear()
+        self._polling = False
+
+    def _handle(self, msg) -> None:
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        kind = msg.WhichOneof("type")
+        if kind == "new_session" and not msg.new_session.fragment_ids_this_run:
+            self._full_runs += 1
+            self._stop_polling()
+            self._markdown.clear()
+        elif kind == "auto_rerun":
+            self._polling = True
+            self._pollers.append(asyncio.ensure_future(self._poll(msg.auto_rerun.interval, msg.auto_rerun.fragment_id)))
+        elif kind == "page_info_changed":
+            self._query_string = msg.page_info_changed.query_string
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type in ("chat_input", "text_input"):
+                self._widget_ids[element_type] = getattr(element, element_type).id
+            elif element_type == "markdown":
+                self._markdown.append(element.markdown.body)
+            elif element_type == "exception":
+                self._exceptions.append(element.exception.message)
+        elif kind == "script_finished":
+            status = msg.script_finished
+            # The run replacing it reports instead
+            if status == ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+            if self._requested_at is not None:
+                self.reruns.append(time.perf_counter() - self._requested_at)
+                self._requested_at = None
+            if status != ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY and not self._polling:
+                self._settled_run = self._full_runs
+                self._settled.set()
+
+    async def _read(self) -> None:
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while (payload := await self._ws.read_message()) is not None:
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            self._handle(msg)
+
+    async def _settle(self, since: int, deadline: float) -> None:
+        """Waits for a full run after run `since` that leaves nothing pending on the page."""
+        while self._settled_run <= since:
+            if self._reader.done():
+                raise ConnectionError("connection closed")
+            self._settled.clear()
+            await asyncio.wait_for(self._settled.wait(), max(deadline - time.perf_counter(), 0))
+        if self._exceptions:
+            message = self._exceptions[0]
+            self._exceptions.clear()
+            raise RuntimeError(message)
+
+    async def act(self, turn: int) -> None:
+        """Sends one prompt or query and follows the page's reruns until its answer is on the page."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        start = time.perf_counter()
+        since = self._full_runs
+        try:
+            if self.page == "chat":
+                trigger = WidgetState(id=self._widget_ids["chat_input"])
+                trigger.chat_input_value.data = make_prompt(self.index, turn, self.args)
+                self._rerun(trigger)
+            else:
+                state = WidgetState(id=self._widget_ids["text_input"])
+                state.string_value = make_query(self.index, turn, self.args.distinct_queries)
+                self._widget_states[state.id] = state
+                self._rerun()
+            try:
+                await self._settle(since, start + self.args.timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"{self.page} action not done after {self.args.timeout}s") from None
+            self.actions.append(time.perf_counter() - start)
+            if self.page == "chat" and self._markdown and self._markdown[-1].startswith(BUSY_MESSAGE):
+                self.rejected += 1
+        except Exception as e:
+            logging.warning(f"{self.page} session {self.index}: {e}")
+            self.errors += 1
+
+    async def connect(self) -> bool:
+        """Opens the page; False (counted as an error) if it doesn't load."""
+        from tornado.websocket import websocket_connect
+
+        try:
+            self._ws = await websocket_connect(self.url)
+            self._reader = asyncio.ensure_future(self._read())
+            self._rerun()
+            await self._settle(0, time.perf_counter() + self.args.timeout)
+            return True
+        except Exception as e:
+            logging.warning(f"{self.page} session {self.index} failed to load: {e!r}")
+            self.errors += 1
+            return False
+
+    async def play(self) -> None:
+        if not await self.connect():
+            return
+        for turn in range(self.args.actions):
+            await self.act(turn)
+            await asyncio.sleep(self.args.think_time)
+
+    def close(self) -> None:
+        self._stop_polling()
+        if self._reader is not None:
+            self._reader.cancel()
+        if self._ws is not None:
+            self._ws.close()
+
+
+async def run_level(users: int, args, server: subprocess.Popen, port: int) -> dict:
+    """Runs `users` concurrent sessions, split evenly across the selected pages."""
+    rss_before = rss_bytes(server.pid)
+    sessions = [Session(args.pages[i % len(args.pages)], next(_user_ids), args, port) for i in range(users)]
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(session.play() for session in sessions))
+        elapsed = time.perf_counter() - start
+        # Measured while the sessions (and their server-side state) are still alive
+        rss_after = rss_bytes(server.pid)
+    finally:
+        for session in sessions:
+            session.close()
+    rss_growth = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+
+    report = {"users": users, "elapsed_s": elapsed,
+              "memory_growth_mb": rss_growth / 2 ** 20 if rss_growth is not None else None,
+              "memory_per_session_kb": rss_growth / users / 1024 if rss_growth is not None else None,
+              "chat_turns_rejected": sum(session.rejected for session in sessions), "pages": {}}
+    actions = 0
+    for page in args.pages:
+        page_sessions = [session for session in sessions if session.page == page]
+        # Fewer users than pages: nothing was measured on the rest
+        if not page_sessions:
+            continue
+        reruns = [t for session in page_sessions for t in session.reruns]
+        done = [t for session in page_sessions for t in session.actions]
+        actions += len(done)
+        report["pages"][page] = {
+            "sessions": len(page_sessions),
+            "reruns": len(reruns),
+            "rerun_p50_s": percentile(reruns, 50),
+            "rerun_p95_s": percentile(reruns, 95),
+            "rerun_max_s": max(reruns, default=0.0),
+            "actions": len(done),
+            "action_p50_s": percentile(done, 50),
+            "action_p95_s": percentile(done, 95),
+            "errors": sum(session.errors for session in page_sessions),
+            "actions_per_s": len(done) / elapsed if elapsed else 0.0,
+        }
+    report["actions_per_s"] = actions / elapsed if elapsed else 0.0
+    report["rerun_p95_s"] = max(page["rerun_p95_s"] for page in report["pages"].values())
+    return report
+
+
+async def run_levels(args, server: subprocess.Popen, port: int) -> list[dict]:
+    # Imports and first-use setup in the server shouldn't count as the first level's memory growth
+    warmup = [Session(page, next(_user_ids), args, port) for page in args.pages]
+    try:
+        await asyncio.gather(*(session.play() for session in warmup))
+    finally:
+        for session in warmup:
+            session.close()
+    return [await run_level(users, args, server, port) for users in args.levels]
+
+
+def saturation_point(levels: list[dict], slo: float) -> dict:
+    """The first level past the SLO or without a 10% throughput gain, and why; None if none is."""
+    previous = None
+    for level in levels:
+        if level["rerun_p95_s"] > slo:
+            return {"users": level["users"], "reason": f"p95 rerun latency above {slo:g}s"}
+        if previous is not None and level["actions_per_s"] < previous["actions_per_s"] * 1.1:
+            return {"users": level["users"], "reason": "throughput stopped growing"}
+        previous = level
+    return {"users": None, "reason": "not reached"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.load_test", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="Concurrent users to step through (default: 1 5 10 20)")
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--actions", type=int, default=3, help="Prompts or searches per user (default: 3)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds a user waits between actions")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds an action may take")
+    parser.add_argument("--slo", type=float, default=1.0, help="p95 rerun latency, in seconds, users still accept")
+    parser.add_argument("--distinct-queries", type=int, default=0,
+                        help="Cycle through this many distinct queries (default: 0 = all distinct, no cache hits)")
+    parser.add_argument("--fast-path-share", type=float, default=0.0,
+                        help="Share of chat prompts that are jokes or 'search for ...' (default: 0)")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--tavily-latency", type=float, default=0.5)
+    parser.add_argument("--youtube-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Failure probability of every fake provider")
+    parser.add_argument("--port", type=int, default=0, help="Port of the Streamlit server (default: a free one)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    # Internal: run the server side in this process (the load test starts itself this way)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.serve:
+        serve(args)
+        return 0
+
+    logging.basicConfig(level=logging.WARNING)
+    port = args.port or free_port()
+    server, log_path = start_server(argv, port)
+    try:
+        levels = asyncio.run(run_levels(args, server, port))
+    finally:
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    saturation = saturation_point(levels, args.slo)
+
+    print(f"pages={','.join(args.pages)} actions={args.actions} slo={args.slo:g}s server log={log_path}")
+    print(f"{'users':>6} {'page':<8}{'sessions':>9}{'rerun p50':>11}{'rerun p95':>11}{'action p95':>12}"
+          f"{'errors':>8}{'actions/s':>11}")
+    for level in levels:
+        for page, report in level["pages"].items():
+            print(f"{level['users']:>6} {page:<8}{report['sessions']:>9}{report['rerun_p50_s']:>11.3f}"
+                  f"{report['rerun_p95_s']:>11.3f}{report['action_p95_s']:>12.3f}{report['errors']:>8}"
+                  f"{report['actions_per_s']:>11.2f}")
+        # Throughput and memory of the whole server, once per level
+        memory = level["memory_per_session_kb"]
+        print(f"{'':>6} all: {level['actions_per_s']:.2f} actions/s, {level['chat_turns_rejected']} chat turns"
+              f" rejected, {'-' if memory is None else f'{memory:.0f}'} KB server memory/session")
+    print(f"saturation: {saturation['users'] or '-'} users ({saturation['reason']})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "levels": levels, "saturation": saturation}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
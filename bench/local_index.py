@@ -0,0 +1,84 @@
+"""
+Benchmark: local search index size versus indexing and query latency.
+
+Fills a LocalIndex with synthetic pages (Zipf-distributed vocabulary, about
+the length of a Tavily extract) and times BM25 queries at each size, with and
+without embedding reranking.
+
+    python -m bench.local_index --sizes 1000 10000 50000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from logic.local_index import LocalIndex
+from logic.semantic_cache import HashingEmbedder
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_page(index: int, vocabulary: list[str], weights: list[float], rng: random.Random) -> dict:
+    words = rng.choices(vocabulary, weights, k=120)
+    return {"title": " ".join(words[:6]), "url": f"https://example.com/page/{index}", "content": " ".join(words)}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(pct / 100 * len(values)))]
+
+
+def run_size(size: int, args, embed=None) -> dict:
+    rng = random.Random(size)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    index = LocalIndex(max_docs=size, ttl=float("inf"), embed=embed)
+
+    pages = [make_page(i, vocabulary, weights, rng) for i in range(size)]
+    start = time.perf_counter()
+    for batch_start in range(0, size, 10):
+        index.add(pages[batch_start:batch_start + 10])
+    add_elapsed = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(args.queries):
+        query = " ".join(rng.choices(vocabulary, weights, k=rng.randint(2, 4)))
+        start = time.perf_counter()
+        index.search(query, k=5)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "docs": len(index),
+        "terms": index.stats()["terms"],
+        "add_docs_per_s": size / add_elapsed,
+        "query_p50_ms": percentile(latencies, 50) * 1000,
+        "query_p95_ms": percentile(latencies, 95) * 1000,
+        "query_mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.local_index", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct words in the corpus")
+    parser.add_argument("--embeddings", action="store_true", help="Also time hashing-embedding reranking")
+    args = parser.parse_args(argv)
+
+    modes = [("bm25", None)] + ([("bm25+embed", HashingEmbedder())] if args.embeddings else [])
+    print(f"queries={args.queries} vocabulary={args.vocabulary}")
+    print(f"{'mode':<12}{'docs':>8}{'terms':>9}{'add docs/s':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, embed in modes:
+        for size in args.sizes:
+            result = run_size(size, args, embed)
+            print(f"{name:<12}{result['docs']:>8}{result['terms']:>9}{result['add_docs_per_s']:>12.0f}"
+                  f"{result['query_p50_ms']:>9.2f}{result['query_p95_ms']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+"""
+Compares ConversationSummaryMemory with BudgetedSummaryMemory on a scripted
+conversation, using a fake LLM with fixed latency.
+
+Each turn is one "agent" LLM call that reads the memory, followed by saving the
+turn to memory; the time until the turn's answer is available is what a user
+waits for. Summary calls made by the memory itself are counted separately.
+
+    python -m bench.memory_compare --turns 20 --latency 0.2
+"""
+import argparse
+import statistics
+import time
+
+from langchain.memory import ConversationSummaryMemory
+
+from bench.fakes import FakeChatModel
+from logic.memory import BudgetedSummaryMemory
+
+
+def scripted_turns(count: int) -> list[tuple[str, str]]:
+    return [
+        (f"Question {i}: tell me something about topic number {i} in a few sentences.",
+         f"Answer {i}: " + "Here is a reasonably long explanation of the topic. " * 4)
+        for i in range(count)
+    ]
+
+
+def run(memory, agent_llm: FakeChatModel, turns: list[tuple[str, str]]) -> list[float]:
+    latencies = []
+    for question, _ in turns:
+        start = time.perf_counter()
+        history = memory.load_memory_variables({"input": question})["chat_history"]
+        answer = agent_llm.invoke(f"{history}\n{question}").content
+        memory.save_context({"input": question}, {"output": answer})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM latency in seconds")
+    parser.add_argument("--token-limit", type=int, default=400)
+    args = parser.parse_args()
+
+    turns = scripted_turns(args.turns)
+    print(f"{'memory':<28}{'mean turn s':>12}{'p95 turn s':>12}{'agent calls':>13}{'memory calls':>14}")
+    for name in ("ConversationSummaryMemory", "BudgetedSummaryMemory"):
+        agent_llm = FakeChatModel(responses=[answer for _, answer in turns], latency=args.latency)
+        memory_llm = FakeChatModel(responses=["A short running summary."], latency=args.latency)
+        if name == "ConversationSummaryMemory":
+            memory = ConversationSummaryMemory(llm=memory_llm, memory_key="chat_history", input_key="input")
+        else:
+            memory = BudgetedSummaryMemory(llm=memory_llm, memory_key="chat_history", input_key="input",
+                                           max_token_limit=args.token_limit)
+
+        latencies = sorted(run(memory, agent_llm, turns))
+        if isinstance(memory, BudgetedSummaryMemory):
+            memory.wait_for_summary()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<28}{statistics.mean(latencies):>12.3f}{p95:>12.3f}"
+              f"{agent_llm.calls:>13}{memory_llm.calls:>14}")
+
+
+if __name__ == "__main__":
+    main()
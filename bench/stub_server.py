@@ -0,0 +1,88 @@
+import io
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+# Minimal YouTube Data API search response, matching the `fields` mask used by youtube_agent
+YOUTUBE_SEARCH_RESPONSE = {
+    "items": [
+        {
+            "id": {"videoId": f"video{i}"},
+            "snippet": {"title": f"Stub video {i}", "thumbnails": {"default": {"url": f"https://i.ytimg.com/vi/video{i}/default.jpg"}}},
+        }
+        for i in range(10)
+    ]
+}
+
+
+class StubServer:
+    """
+    A local HTTP/1.1 server (with keep-alive) serving canned responses.
+
+    Routes map a URL path prefix to a callable returning (status, content type, body bytes).
+    An optional fixed latency is added to every response.
+    """
+
+    def __init__(self, routes: dict[str, Callable[[str], tuple[int, str, bytes]]], latency: float = 0.0):
+        self.routes = routes
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle delays on keep-alive connections
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                path = urlparse(self.path).path
+                route = next((fn for prefix, fn in server.routes.items() if path.startswith(prefix)), None)
+                status, content_type, body = route(self.path) if route else (404, "text/plain", b"not found")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def json_route(payload: dict) -> Callable[[str], tuple[int, str, bytes]]:
+    """Route answering every request with the same JSON payload."""
+    body = json.dumps(payload).encode()
+    return lambda path: (200, "application/json", body)
+
+
+def jpeg_route(width: int, height: int) -> Callable[[str], tuple[int, str, bytes]]:
+    """Route answering every request with the same generated JPEG."""
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 120, 200)).save(output, format="JPEG", quality=95)
+    body = output.getvalue()
+    return lambda path: (200, "image/jpeg", body)
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: per-call overhead of building a YouTube client on every search
+versus reusing the long-lived client from logic.youtube_agent.
+
+Both variants hit a local stub server, so the numbers measure client overhead
+(discovery parsing, transport setup, connection reuse) rather than network time.
+
+    python -m bench.youtube_client --calls 200
+"""
+import argparse
+import statistics
+import time
+
+from googleapiclient.discovery import build
+
+from bench.stub_server import YOUTUBE_SEARCH_RESPONSE, StubServer, json_route
+from logic.youtube_agent import get_youtube_client
+
+
+def _search(youtube) -> dict:
+    return youtube.search().list(
+        part="snippet", q="python tutorial", type="video", maxResults=10,
+        fields="items(id/videoId,snippet(title,thumbnails/default/url))",
+    ).execute()
+
+
+def build_per_call(endpoint: str) -> dict:
+    """The previous behaviour: a fresh client (and connection) for every search."""
+    youtube = build("youtube", "v3", developerKey="bench-key", static_discovery=True,
+                    cache_discovery=False, client_options={"api_endpoint": endpoint})
+    return _search(youtube)
+
+
+def reuse_client(endpoint: str) -> dict:
+    """The current behaviour: the thread's long-lived client."""
+    return _search(get_youtube_client("bench-key", api_endpoint=endpoint))
+
+
+def measure(fn, endpoint: str, calls: int) -> list[float]:
+    fn(endpoint)  # warm-up
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn(endpoint)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100, help="Searches per variant (default: 100)")
+    args = parser.parse_args()
+
+    with StubServer({"/youtube/v3/search": json_route(YOUTUBE_SEARCH_RESPONSE)}) as server:
+        print(f"{'variant':<16}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, fn in [("build per call", build_per_call), ("reused client", reuse_client)]:
+            timings = sorted(measure(fn, server.url, args.calls))
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(f"{name:<16}{statistics.mean(timings):>10.2f}{statistics.median(timings):>10.2f}{p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,117 @@
-import asyncio
+import re
+import uuid
 import streamlit as st
-from logic.chat_agent import agent_executor
+from logic.chat_agent import forget_session, run_turn_job
+from logic.conversation_store import chat_page_size, get_conversation_store
+from logic.jobs import CANCELLED, FAILED, JobRejectedError, job_queue
 
 
 st.title("🤖 AI Assistant")
 
-# Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Each browser session talks to its own agent executor and memory. The id is
+# kept in the URL, so a reload or a server restart resumes the same conversation.
+if "session_id" not in st.session_state:
+    session_id = st.query_params.get("session", "")
+    st.session_state.session_id = session_id if re.fullmatch(r"[0-9a-f]{32}", session_id) else uuid.uuid4().hex
+st.query_params["session"] = st.session_state.session_id
+
+# The conversation lives in the store; only the latest messages are loaded and rendered
+conversation = get_conversation_store()
+if "history_limit" not in st.session_state:
+    st.session_state.history_limit = chat_page_size
+
+# One extra message tells whether there is anything earlier to load
+history = conversation.recent(st.session_state.session_id, st.session_state.history_limit + 1)
+if len(history) > st.session_state.history_limit:
+    history = history[1:]
+    if st.button("Load earlier messages", icon=":material/history:"):
+        st.session_state.history_limit += chat_page_size
+        st.rerun()
 
 # Display chat messages from history on app rerun
-for message in st.session_state.messages:
+for message in history:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# React to user input
-if prompt := st.chat_input("What's up?"):
-    # Display user message in chat message container
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
-
-    # Get assistant response
-    with st.spinner("Thinking..."):
-        try:
-            response = agent_executor.invoke({"input": prompt})
-            final_answer = response.get('output', 'Sorry, I could not find an answer.')
-        except Exception as e:
-            final_answer = f"An error occurred: {e}"
-
-    # Display assistant response in chat message container
-    st.session_state.messages.append({"role": "assistant", "content": final_answer})
+# --- Background Turns ---
+# Agent turns run as jobs in a worker pool, not in this script run: a rerun or
+# leaving the page doesn't abandon or repeat a turn, and the answer is written
+# to the conversation store when the turn ends, whoever is watching.
+
+def final_answer(job, status) -> str:
+    """The assistant message recorded for a turn that ended with `status`."""
+    answer = "".join(payload for kind, payload in job.events if kind == "token").strip()
+    if status == FAILED:
+        return f"An error occurred: {job.error}"
+    if status == CANCELLED:
+        return f"{answer}\n\n*Stopped.*" if answer else "*Stopped before answering.*"
+    return job.result or answer or 'Sorry, I could not find an answer.'
+
+
+def stop_turn(job_id):
+    job_queue.cancel(job_id)
+
+
+@st.fragment(run_every=0.5)
+def render_turn(job_id):
+    """
+    Shows the running turn's progress: agent steps in a status box, then the answer so far.
+
+    Polls the job twice a second without rerunning the rest of the page; once
+    the turn is over, reruns the page, which now shows the stored answer.
+    """
+    job = job_queue.get(job_id)
+    if job is None or job.done:
+        st.session_state.pop("chat_job", None)
+        st.rerun()
     with st.chat_message("assistant"):
-        st.markdown(final_answer)
\ No newline at end of file
+        status = st.status("Waiting for a free worker..." if job.status == "queued" else "Thinking...")
+        tokens = []
+        for kind, payload in job.events_since(0):
+            if kind == "action":
+                # ReAct logs carry the model's reasoning before "Action:"
+                thought = payload.log.split("Action:")[0].strip() if "Action:" in payload.log else ""
+                if thought:
+                    status.markdown(f"**Thought:** {thought}")
+                status.markdown(f"**Action:** `{payload.tool}` — {payload.tool_input}")
+            elif kind == "observation":
+                status.caption(payload[:300] + ("…" if len(payload) > 300 else ""))
+            elif kind == "token":
+                tokens.append(payload)
+        if tokens:
+            st.markdown("".join(tokens) + " ▌")
+        st.button("Stop", key="stop_turn", icon=":material/stop_circle:", on_click=stop_turn, args=(job_id,))
+
+
+def delete_conversation():
+    """Deletes the conversation and the agent's memory of it, and starts a new session."""
+    get_conversation_store().forget(st.session_state.session_id)
+    forget_session(st.session_state.session_id)
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.history_limit = chat_page_size
+
+
+job_id = st.session_state.get("chat_job")
+if job_id is not None:
+    render_turn(job_id)
+
+# Conversations are also deleted after CONVERSATION_RETENTION_DAYS without a new message
+if history:
+    st.sidebar.button("Delete this conversation", icon=":material/delete:", disabled=job_id is not None,
+                      on_click=delete_conversation)
+
+# React to user input; one turn per session at a time
+if prompt := st.chat_input("What's up?", disabled=job_id is not None):
+    session_id = st.session_state.session_id
+    conversation.append(session_id, "user", prompt)
+    try:
+        job = job_queue.submit(
+            session_id, run_turn_job, session_id, prompt,
+            on_finish=lambda finished, status: conversation.append(session_id, "assistant", final_answer(finished, status)),
+        )
+    except JobRejectedError:
+        # Overloaded: say so right away instead of queueing without bound
+        conversation.append(session_id, "assistant", "The assistant is busy right now. Please try again in a moment.")
+    else:
+        st.session_state.chat_job = job.id
+    st.rerun()
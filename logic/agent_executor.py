@@ -0,0 +1,35 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+
+
+class TimedAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor whose async tool calls are bounded by per-tool timeouts.
+
+    When the agent requests several tool calls in one step (native tool
+    calling), the executor already runs them concurrently; the timeouts make
+    sure one slow tool cannot hold the whole step. A timed-out call becomes an
+    observation telling the model so, like any other tool error.
+    """
+
+    tool_timeouts: Dict[str, float] = {}
+    default_tool_timeout: Optional[float] = None
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action: AgentAction,
+                                     run_manager=None) -> AgentStep:
+        timeout = self.tool_timeouts.get(agent_action.tool, self.default_tool_timeout)
+        try:
+            return await asyncio.wait_for(
+                super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            logging.warning(f"Tool {agent_action.tool} timed out after {timeout:g} seconds.")
+            return AgentStep(
+                action=agent_action,
+                observation=f"The {agent_action.tool} tool timed out after {timeout:g} seconds.",
+            )
@@ -0,0 +1,231 @@
+"""
+Runs many searches at once, e.g. to pre-warm the search cache or for evaluations.
+
+Reads one query per line from a file or stdin and writes one JSON object per
+query as soon as it completes. Each provider gets its own concurrency limit,
+and all calls run at background priority, so interactive users are served
+first by the shared rate limiters. Because results stream to the output file,
+an interrupted run can be resumed with --resume: queries that already
+succeeded are skipped.
+
+Pre-warming only outlives the run through the SQLite caches: set
+SEARCH_CACHE_DB (and LOCAL_INDEX_DB for the local index) to the same paths
+the app uses. Without them, results are cached in this process only.
+
+    python -m logic.batch_search queries.txt --output results.jsonl
+    cat queries.txt | python -m logic.batch_search --providers web --web-concurrency 8
+    SEARCH_CACHE_DB=.search_cache.db python -m logic.batch_search queries.txt -o results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import AsyncIterator, Iterable, Optional
+
+from logic.multi_search import async_providers, provider_timeouts
+from logic.rate_limit import BACKGROUND, priority
+from logic.search_cache import cache_db_path
+
+# --- Configuration ---
+# Concurrent calls per provider during a batch
+batch_concurrency = {
+    "web": int(os.getenv("BATCH_WEB_CONCURRENCY", 4)),
+    "videos": int(os.getenv("BATCH_VIDEOS_CONCURRENCY", 4)),
+}
+# Seconds between progress lines on stderr
+progress_interval = 5.0
+
+
+def read_queries(lines: Iterable[str]) -> Iterable[str]:
+    """Non-empty, non-comment lines, stripped and without repeats."""
+    seen = set()
+    for line in lines:
+        query = line.strip()
+        if query and not query.startswith("#") and query not in seen:
+            seen.add(query)
+            yield query
+
+
+def completed_queries(path: str) -> set[str]:
+    """Queries of an earlier run's output that finished without errors (for resuming)."""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short when the run was interrupted
+                if not record.get("errors"):
+                    done.add(record["query"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+async def abatch_search(queries: Iterable[str], selected: Optional[dict] = None,
+                        concurrency: Optional[dict] = None, timeouts: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Searches every query with every selected provider, yielding results as they complete.
+
+    At most `concurrency[name]` calls to each provider are in flight; queries
+    are read from `queries` only as capacity frees up, so the iterable can be
+    arbitrarily long, and in a worker thread, so a slow source (e.g. stdin)
+    never blocks the event loop. Calls run at BACKGROUND priority.
+
+    Args:
+        queries: The queries to run.
+        selected: Mapping of provider name to coroutine function (defaults to
+            logic.multi_search.async_providers).
+        concurrency: Mapping of provider name to its limit (defaults to `batch_concurrency`).
+        timeouts: Mapping of provider name to timeout in seconds, counted once
+            the call starts (defaults to logic.multi_search.provider_timeouts).
+
+    Yields:
+        One dictionary per query, in completion order: 'query', 'web' (structured
+        Tavily output or None), 'response_time', 'videos', 'errors' (provider
+        name -> message) and 'elapsed' seconds.
+    """
+    selected = async_providers if selected is None else selected
+    concurrency = batch_concurrency if concurrency is None else concurrency
+    timeouts = provider_timeouts if timeouts is None else timeouts
+    limits = {name: max(1, concurrency.get(name, 4)) for name in selected}
+    semaphores = {name: asyncio.Semaphore(limit) for name, limit in limits.items()}
+    results = asyncio.Queue()
+
+    async def call(name, fn, query):
+        async with semaphores[name]:
+            timeout = timeouts.get(name, 15.0)
+            try:
+                return name, await asyncio.wait_for(fn(query), timeout), None
+            except asyncio.TimeoutError:
+                return name, None, f"timed out after {timeout:g} seconds"
+            except Exception as e:
+                return name, None, str(e) or type(e).__name__
+
+    async def run(query):
+        start = time.monotonic()
+        record = {"query": query, "web": None, "response_time": None, "videos": None, "errors": {}}
+        for name, value, error in await asyncio.gather(*(call(name, fn, query) for name, fn in selected.items())):
+            if error is not None:
+                record["errors"][name] = error
+            elif name == "web":
+                record["web"], record["response_time"] = value
+            else:
+                record[name] = value
+        record["elapsed"] = time.monotonic() - start
+        await results.put(record)
+
+    async def feed():
+        # Enough queries in flight to keep every provider busy, and no more
+        slots = asyncio.Semaphore(max(limits.values()) * 2)
+        tasks = set()
+        iterator = iter(queries)
+        with priority(BACKGROUND):
+            while True:
+                await slots.acquire()
+                query = await asyncio.to_thread(next, iterator, None)
+                if query is None:
+                    break
+                task = asyncio.create_task(run(query))
+                task.add_done_callback(lambda t: slots.release())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*list(tasks))
+        await results.put(None)
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while (record := await results.get()) is not None:
+            yield record
+        await feeder  # Surfaces errors raised while reading the queries
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+
+
+def batch_search(queries: Iterable[str], **kwargs) -> list[dict]:
+    """Synchronous version of `abatch_search`, returning all results once done."""
+
+    async def collect():
+        return [record async for record in abatch_search(queries, **kwargs)]
+
+    return asyncio.run(collect())
+
+
+async def _run_cli(args) -> dict:
+    done = completed_queries(args.output) if args.resume and args.output else set()
+    source = open(args.input, encoding="utf-8") if args.input != "-" else sys.stdin
+    output = open(args.output, "a" if args.resume else "w", encoding="utf-8") if args.output else sys.stdout
+    selected = {name: async_providers[name] for name in args.providers}
+    concurrency = {"web": args.web_concurrency, "videos": args.videos_concurrency}
+    counts = {"queries": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+
+    def pending():
+        for query in read_queries(source):
+            if query in done:
+                counts["skipped"] += 1
+            else:
+                yield query
+
+    start = last_progress = time.monotonic()
+    try:
+        async for record in abatch_search(pending(), selected, concurrency):
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()  # Every finished query survives an interruption
+            counts["queries"] += 1
+            counts["failed" if record["errors"] else "succeeded"] += 1
+            if time.monotonic() - last_progress >= progress_interval:
+                last_progress = time.monotonic()
+                rate = counts["queries"] / (last_progress - start)
+                print(f"{counts['queries']} done ({counts['failed']} failed), {rate:.1f} queries/s", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.monotonic() - start
+    return {**counts, "elapsed_s": round(elapsed, 3),
+            "queries_per_s": round(counts["queries"] / elapsed, 3) if elapsed else 0.0}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m logic.batch_search", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="File with one query per line (default: stdin)")
+    parser.add_argument("--output", "-o", help="JSONL file to write results to (default: stdout)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Append to --output, skipping queries that already succeeded there")
+    parser.add_argument("--providers", type=lambda value: value.split(","), default=list(async_providers),
+                        help=f"Comma-separated providers to query (default: {','.join(async_providers)})")
+    parser.add_argument("--web-concurrency", type=int, default=batch_concurrency["web"])
+    parser.add_argument("--videos-concurrency", type=int, default=batch_concurrency["videos"])
+    args = parser.parse_args(argv)
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+    unknown = set(args.providers) - set(async_providers)
+    if unknown:
+        parser.error(f"unknown providers: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    if not cache_db_path:
+        logging.warning("SEARCH_CACHE_DB is not set: results are cached in this process only, "
+                        "so this run won't warm the app's search cache.")
+    try:
+        summary = asyncio.run(_run_cli(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun with --resume to continue.", file=sys.stderr)
+        return 130
+    print(json.dumps(summary), file=sys.stderr)
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,27 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
 import os
+import threading
+import time
 import dotenv
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI, HarmCategory, HarmBlockThreshold
-from langchain_community.tools import TavilySearchResults
-from tools.random_joke import ProvideJoke
-from langchain.agents import create_react_agent, AgentExecutor
-from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationSummaryMemory
+from typing import TYPE_CHECKING
+from logic.conversation_store import conversation_retention_days
+from logic.rate_limit import circuit_breaker_callback, langchain_rate_limiter, limiters
+from logic.router import RouteRule, Router, RouteStats, astream_route
+from logic.session_pool import SessionPool, SessionStore
+from logic.telemetry import langchain_callback, span
+
+# LangChain and the Gemini SDK take over a second to import; they are imported
+# inside the functions that need them, so importing this module stays cheap.
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain.memory import ConversationSummaryMemory
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from logic.memory import BudgetedSummaryMemory
+    from logic.semantic_cache import SemanticCache
 
 # Load environment variables from .env file
 dotenv.load_dotenv(".env")
@@ -19,17 +34,39 @@ google_api_key = os.getenv("GOOGLE_API_KEY")
 tavily_api_key = os.getenv("TAVILY_API_KEY")
 model_name = os.getenv("MODEL_NAME", "gemini-1.5-flash")
 temperature = float(os.getenv("TEMPERATURE", 0.7))
-
-# --- Input Validation ---
-if not google_api_key:
-    logging.error("GOOGLE_API_KEY not found in environment variables.")
-    exit(1)
-if not tavily_api_key:
-    logging.error("TAVILY_API_KEY not found in environment variables.")
-    exit(1)
+session_store_dir = os.getenv("SESSION_STORE_DIR", ".sessions")
+max_sessions = int(os.getenv("MAX_SESSIONS", 100))
+session_idle_timeout = float(os.getenv("SESSION_IDLE_TIMEOUT", 1800))
+# "budgeted" summarizes only on overflow and in the background; "summary" re-summarizes every turn
+memory_strategy = os.getenv("MEMORY_STRATEGY", "budgeted")
+memory_token_limit = int(os.getenv("MEMORY_TOKEN_LIMIT", 1000))
+# "react" (text Thought/Action format, one tool call per step) or "tool_calling"
+# (Gemini's native tool calling, several concurrent tool calls per step)
+agent_mode = os.getenv("AGENT_MODE", "react")
+# Seconds a single tool call may take within an agent step
+tool_timeouts = {
+    "tavily_search_results_json": float(os.getenv("TAVILY_TIMEOUT", 20)),
+    "provide_joke": 5.0,
+}
+default_tool_timeout = float(os.getenv("TOOL_TIMEOUT", 30))
+# Send obvious single-tool prompts straight to the tool instead of the ReAct loop
+fast_path_enabled = os.getenv("FAST_PATH", "1") not in ("0", "false", "off")
 
 # --- LLM Initialization ---
-try:
+def build_llm() -> ChatGoogleGenerativeAI:
+    """
+    Creates the Gemini chat model from the environment configuration.
+
+    Raises:
+        ValueError: If GOOGLE_API_KEY is not set.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI, HarmCategory, HarmBlockThreshold
+    from logic.llm_cache import cache_for_temperature
+
+    if not google_api_key:
+        logging.error("GOOGLE_API_KEY not found in environment variables.")
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
     llm = ChatGoogleGenerativeAI(
         google_api_key=google_api_key,
         model=model_name,
@@ -37,35 +74,130 @@ try:
         convert_system_message_to_human=True,
         safety_settings={
             HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE
-        }
+        },
+        # Shared client-side rate limit and circuit breaker for every Gemini call; retries of
+        # throttled calls are left to the SDK (UPSTREAM_MAX_RETRIES doesn't apply here)
+        rate_limiter=langchain_rate_limiter(limiters["gemini"], google_api_key),
+        callbacks=[circuit_breaker_callback(limiters["gemini"])],
+        # Identical calls (a repeated question's first ReAct step, the same summary input) are answered locally
+        cache=cache_for_temperature(temperature),
     )
     logging.info(f"Initialized LLM: {model_name} with temperature {temperature}")
-except Exception as e:
-    logging.error(f"Failed to initialize LLM: {e}")
-    exit(1)
+    return llm
 
 # --- Tools Definition ---
-try:
-    search_tool = TavilySearchResults(
-        max_results=3,
-    )
-    # Initialize the async joke tool
-    joke_tool = ProvideJoke()
-    tools = [search_tool, joke_tool]
-    logging.info("Initialized TavilySearchResults and ProvideJoke tool.")
-except Exception as e:
-    logging.error(f"Failed to initialize tools: {e}")
-    tools = []
-    logging.warning("Continuing without tools due to initialization error.")
+def build_tools() -> list:
+    """
+    Creates the agent's tools. Continues without them if initialization fails
+    (e.g. TAVILY_API_KEY is missing).
+    """
+    from tools.cached_search import CachedTavilySearchResults
+    from tools.random_joke import ProvideJoke
+
+    try:
+        # Shares its result cache with the search page
+        search_tool = CachedTavilySearchResults(
+            max_results=3,
+        )
+        # Initialize the async joke tool
+        joke_tool = ProvideJoke()
+        logging.info("Initialized CachedTavilySearchResults and ProvideJoke tool.")
+        return [search_tool, joke_tool]
+    except Exception as e:
+        logging.error(f"Failed to initialize tools: {e}")
+        logging.warning("Continuing without tools due to initialization error.")
+        return []
+
+# --- Shared Components ---
+# Built on first use rather than at import, so importing this module never needs
+# API keys; `configure` lets benchmarks plug in fake LLMs and tools instead.
+_llm = None
+_tools = None
+_agent = None
+_answer_cache = None
+_components_lock = threading.Lock()
+
+
+def configure(llm=None, tools: list = None, mode: str = None) -> None:
+    """
+    Overrides the LLM, tools and/or agent mode used by every executor built from now on.
+
+    Args:
+        llm: A chat model to use instead of Gemini.
+        tools: A list of tools to use instead of the default ones.
+        mode: "react" or "tool_calling", instead of AGENT_MODE.
+    """
+    global _llm, _tools, _agent, agent_mode
+    with _components_lock:
+        if llm is not None:
+            _llm = llm
+        if tools is not None:
+            _tools = tools
+        if mode is not None:
+            agent_mode = mode
+        _agent = None
+
+
+def get_llm():
+    """Returns the shared chat model, building it on first use."""
+    global _llm
+    with _components_lock:
+        if _llm is None:
+            _llm = build_llm()
+        return _llm
+
+
+def get_tools() -> list:
+    """Returns the shared tools, building them on first use."""
+    global _tools
+    with _components_lock:
+        if _tools is None:
+            _tools = build_tools()
+        return _tools
 
 # --- Memory Initialization ---
-memory = ConversationSummaryMemory(
-    llm=llm,
-    memory_key="chat_history",
-    return_messages=True,
-    input_key="input"
-)
-logging.info("Initialized ConversationSummaryMemory.")
+def build_memory(state: dict | None = None) -> BudgetedSummaryMemory | ConversationSummaryMemory:
+    """
+    Creates a fresh conversation memory using the configured MEMORY_STRATEGY.
+
+    Args:
+        state: State restored from a persisted session (None for a new conversation).
+
+    Returns:
+        A BudgetedSummaryMemory ("budgeted", the default) or a ConversationSummaryMemory
+        ("summary"), bound to the shared LLM.
+    """
+    state = state or {}
+    if memory_strategy == "summary":
+        from langchain.memory import ConversationSummaryMemory
+
+        return ConversationSummaryMemory(
+            llm=get_llm(),
+            memory_key="chat_history",
+            return_messages=True,
+            input_key="input",
+            buffer=state.get("summary", ""),
+        )
+
+    from logic.memory import BudgetedSummaryMemory
+
+    memory = BudgetedSummaryMemory(
+        llm=get_llm(),
+        memory_key="chat_history",
+        return_messages=True,
+        input_key="input",
+        output_key="output",
+        max_token_limit=memory_token_limit,
+    )
+    memory.load_state(state)
+    return memory
+
+
+def memory_state(memory: BudgetedSummaryMemory | ConversationSummaryMemory) -> dict:
+    """Returns the persistable state of a memory built by `build_memory`."""
+    if hasattr(memory, "to_state"):
+        return memory.to_state()
+    return {"summary": memory.buffer}
 
 # --- Prompt Template ---
 react_prompt_template = """Answer the following questions as best you can. You have access to the following tools:
@@ -91,49 +223,384 @@ Previous conversation history:
 New input: {input}
 Thought:{agent_scratchpad}"""
 
-prompt = PromptTemplate(
-    input_variables=["input", "agent_scratchpad", "tools", "tool_names", "chat_history"],
-    template=react_prompt_template
-)
-logging.info("Created PromptTemplate.")
+tool_calling_system_prompt = """You are a helpful assistant. Use the available tools when they help answer the question.
+When a question needs several independent lookups, request all of those tool calls at once.
+Remember to consider the conversation history."""
 
 # --- Agent Initialization ---
-try:
-    agent = create_react_agent(
-        llm=llm,
-        tools=tools,
-        prompt=prompt
-    )
-    logging.info("Created ReAct agent.")
-except Exception as e:
-    logging.error(f"Failed to create agent: {e}")
-    exit(1)
+def build_agent(llm, tools: list, mode: str):
+    """
+    Creates the agent for an AGENT_MODE.
+
+    Raises:
+        ValueError: For an unknown mode.
+    """
+    if mode == "react":
+        from langchain.agents import create_react_agent
+        from langchain.prompts import PromptTemplate
+
+        prompt = PromptTemplate(
+            input_variables=["input", "agent_scratchpad", "tools", "tool_names", "chat_history"],
+            template=react_prompt_template
+        )
+        return create_react_agent(
+            llm=llm,
+            tools=tools,
+            prompt=prompt
+        )
+    if mode == "tool_calling":
+        from langchain.agents import create_tool_calling_agent
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", tool_calling_system_prompt),
+            MessagesPlaceholder("chat_history", optional=True),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ])
+        return create_tool_calling_agent(llm=llm, tools=tools, prompt=prompt)
+    raise ValueError(f"Unknown AGENT_MODE: {mode}")
+
+
+def get_agent():
+    """Returns the shared agent for the configured AGENT_MODE, creating it on first use."""
+    global _agent
+    llm, tools = get_llm(), get_tools()
+    with _components_lock:
+        if _agent is None:
+            _agent = build_agent(llm, tools, agent_mode)
+            logging.info(f"Created {agent_mode} agent.")
+        return _agent
+
+
+def answer_marker() -> str | None:
+    """
+    The text announcing the final answer in the agent's output, if any.
+
+    ReAct replies put it before the answer; a tool-calling agent's text is the answer itself.
+    """
+    from logic.chat_stream import FINAL_ANSWER_MARKER
+
+    return FINAL_ANSWER_MARKER if agent_mode == "react" else None
 
 # --- Agent Executor ---
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=memory,
-    verbose=True,
-    max_iterations=5,
-    handle_parsing_errors=True,
-    return_intermediate_steps=True
+def build_agent_executor(memory: BudgetedSummaryMemory | ConversationSummaryMemory) -> AgentExecutor:
+    """
+    Creates an AgentExecutor around the shared agent and tools with its own memory.
+
+    The LLM, tools and agent are stateless and shared; only the memory differs per executor.
+    Async tool calls are bounded by `tool_timeouts`, and tool observations are
+    compacted before they go into the prompt (see logic.compaction).
+    """
+    from logic.agent_executor import TimedAgentExecutor
+    from logic.compaction import compaction_enabled, observation_compactor
+    from logic.llm_cache import has_cache
+
+    return TimedAgentExecutor(
+        agent=get_agent(),
+        tools=get_tools(),
+        memory=memory,
+        verbose=True,
+        max_iterations=5,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+        tool_timeouts=tool_timeouts,
+        default_tool_timeout=default_tool_timeout,
+        trim_intermediate_steps=observation_compactor if compaction_enabled else -1,
+        # A streamed LLM call skips the response cache; invoked calls check it first and
+        # still stream tokens to the chat page's handler on a miss (see logic.chat_stream)
+        stream_runnable=not has_cache(get_llm()),
+    )
+
+# --- Semantic Answer Cache ---
+# Answers produced with these tools differ on purpose every time; never reuse them
+uncacheable_tools = {"provide_joke"}
+
+
+def get_answer_cache() -> SemanticCache | None:
+    """Returns the shared semantic answer cache, or None if SEMANTIC_CACHE is off."""
+    from logic import semantic_cache
+
+    global _answer_cache
+    if not semantic_cache.semantic_cache_enabled:
+        return None
+    with _components_lock:
+        if _answer_cache is None:
+            _answer_cache = semantic_cache.SemanticCache(
+                embed=semantic_cache.build_embedder(),
+                threshold=semantic_cache.semantic_cache_threshold,
+                ttl=semantic_cache.semantic_cache_ttl,
+                volatile_ttl=semantic_cache.semantic_cache_volatile_ttl,
+                maxsize=semantic_cache.semantic_cache_size,
+            )
+            logging.info(f"Created semantic answer cache ({semantic_cache.semantic_cache_embedder} embeddings).")
+        return _answer_cache
+
+
+def lookup_answer(prompt: str) -> str | None:
+    """Returns a cached answer to a prompt that means the same as `prompt`, if any."""
+    cache = get_answer_cache()
+    if cache is None:
+        return None
+    try:
+        hit = cache.lookup(prompt)
+    except Exception as e:
+        # e.g. the embedding API is unreachable; the agent can still answer
+        logging.warning(f"Semantic cache lookup failed: {e}")
+        return None
+    return hit["answer"] if hit else None
+
+
+def remember_answer(prompt: str, answer: str, latency: float, tools_used=()) -> None:
+    """
+    Offers an agent answer to the semantic cache.
+
+    Args:
+        prompt: The user's prompt.
+        answer: The agent's final answer.
+        latency: Seconds the agent took to answer.
+        tools_used: Names of the tools the agent called for this answer.
+    """
+    cache = get_answer_cache()
+    # Without a tool call, the answer may rest on what this session's memory holds
+    if cache is None or not tools_used or uncacheable_tools.intersection(tools_used):
+        return
+    if answer.startswith("Agent stopped"):
+        # The executor's placeholder after hitting max_iterations, not an answer
+        return
+    try:
+        cache.store(prompt, answer, latency)
+    except Exception as e:
+        logging.warning(f"Semantic cache store failed: {e}")
+
+# --- Fast-Path Router ---
+search_answer_template = """Answer the question using the search results below. If they do not contain the answer, say so.
+
+Question: {input}
+
+Search results:
+{observation}
+
+Answer:"""
+
+# Extend with router.add_rule(RouteRule(...)) for new tools; anything unmatched goes to the agent
+router = Router([
+    # Explicit requests: "tell me a joke", "another chuck norris joke please"; not "I hate your
+    # jokes" or "is that a joke?". Jokes "in german" or "about cats" need arguments the
+    # pattern doesn't extract, so those go to the agent
+    RouteRule(
+        name="joke",
+        tool="provide_joke",
+        pattern=r"^\s*(please\s+)?((can|could|would)\s+you\s+)?(tell|give|say|another|one\s+more)\b"
+                r"(?!.*\b(in|about|on|with)\b).*\bjokes?\b",
+        tool_input=lambda match: {"category": "chuck" if "chuck" in match.string.lower() else "neutral"},
+        max_words=8,
+        allow_follow_ups=True,
+    ),
+    # "search for X", "look up X", "google X": one Tavily call and one LLM call
+    RouteRule(
+        name="search",
+        tool="tavily_search_results_json",
+        pattern=r"^\s*(please\s+)?(search(\s+(the\s+web|online|google))?(\s+for)?|look\s+up|google)\s+(?P<query>\S.*?)[\s?.!]*$",
+        tool_input=lambda match: {"query": match.group("query")},
+        answer_template=search_answer_template,
+    ),
+])
+# Turn latency per route, to compare the fast paths with the agent loop
+route_stats = RouteStats()
+
+
+def match_route(prompt: str):
+    """
+    Returns (rule, tool, tool arguments) if `prompt` can skip the agent loop, else None.
+    """
+    if not fast_path_enabled:
+        return None
+    return router.match(prompt, get_tools())
+
+
+async def astream_fast_path(route, prompt: str):
+    """Runs a turn matched by `match_route`; yields the same events as astream_agent_events."""
+    rule, tool, tool_input = route
+    llm = get_llm() if rule.answer_template else None
+    async for event in astream_route(rule, tool, tool_input, prompt, llm):
+        yield event
+
+
+async def arun_fast_path(route, prompt: str) -> str:
+    """Runs a turn matched by `match_route` to completion and returns its answer."""
+    output = ""
+    async for kind, payload in astream_fast_path(route, prompt):
+        if kind == "error":
+            raise payload
+        if kind == "output":
+            output = payload
+    return output
+
+# --- Per-Session Executors ---
+def _restore_session(state: dict | None) -> AgentExecutor:
+    """Builds a session executor, restoring its memory from a persisted state if any."""
+    return build_agent_executor(build_memory(state))
+
+
+def _snapshot_session(executor: AgentExecutor) -> dict:
+    """Extracts the part of a session executor worth persisting: its memory."""
+    return memory_state(executor.memory)
+
+
+# Used by the Streamlit chat page: one executor and memory per browser session
+session_pool = SessionPool(
+    factory=_restore_session,
+    snapshot=_snapshot_session,
+    store=SessionStore(session_store_dir, conversation_retention_days * 86400),
+    max_sessions=max_sessions,
+    idle_timeout=session_idle_timeout,
 )
-logging.info("Created AgentExecutor.")
+logging.info(f"Created session pool (max {max_sessions} sessions, idle timeout {session_idle_timeout}s).")
+
+
+def forget_session(session_id: str) -> None:
+    """Deletes a chat session's agent state: its live executor and its saved memory."""
+    session_pool.forget(session_id)
+
+# --- Async Entry Point ---
+async def arun_turn(session_id: str, prompt: str) -> str:
+    """
+    Runs one agent turn for a session without blocking the event loop.
+
+    Tool calls, LLM calls and the memory update all go through their async
+    implementations, so many overlapping turns can share one event loop. Prompts
+    that mean the same as a recent one are answered from the semantic cache, and
+    obvious single-tool prompts take the router's fast path; either way the
+    exchange is still saved to the session's memory.
+
+    Args:
+        session_id: The session whose executor and memory to use.
+        prompt: The user's message.
+
+    Returns:
+        The agent's final answer.
+    """
+    start = time.perf_counter()
+    with span("chat.turn", "turn") as turn:
+        cached = lookup_answer(prompt)
+        route = match_route(prompt) if cached is None else None
+        turn.set_attribute("route", "cache" if cached is not None else route[0].name if route else "agent")
+        async with session_pool.asession(session_id) as executor:
+            if cached is not None:
+                await executor.memory.asave_context({"input": prompt}, {"output": cached})
+                route_stats.record("cache", time.perf_counter() - start)
+                return cached
+            if route is not None:
+                output = await arun_fast_path(route, prompt)
+                tools_used = [route[1].name]
+                await executor.memory.asave_context({"input": prompt}, {"output": output})
+            else:
+                response = await executor.ainvoke({"input": prompt}, config={"callbacks": [langchain_callback()]})
+                output = response.get('output')
+                tools_used = [action.tool for action, _ in response.get("intermediate_steps", [])]
+    elapsed = time.perf_counter() - start
+    route_stats.record(route[0].name if route else "agent", elapsed)
+    if output:
+        remember_answer(prompt, output, elapsed, tools_used)
+    return output or 'Sorry, I could not find an answer.'
+
+
+async def astream_turn(session_id: str, prompt: str):
+    """
+    Runs one turn for a session like `arun_turn`, yielding its progress as it happens.
+
+    Yields a ("route", name) event first ("cache", "agent" or a router rule's
+    name), then the events of logic.chat_stream.astream_agent_events. A cached
+    answer comes through as a single token. The exchange is saved to the
+    session's memory either way.
+    """
+    from logic.chat_stream import astream_agent_events
+
+    start = time.perf_counter()
+    cached = lookup_answer(prompt)
+    route = match_route(prompt) if cached is None else None
+    route_name = "cache" if cached is not None else route[0].name if route else "agent"
+    yield "route", route_name
+    output, tools_used = None, []
+    async with session_pool.asession(session_id) as executor:
+        if cached is not None:
+            await executor.memory.asave_context({"input": prompt}, {"output": cached})
+            output = cached
+            yield "token", cached
+            yield "output", cached
+        else:
+            if route is not None:
+                events = astream_fast_path(route, prompt)
+            else:
+                events = astream_agent_events(executor, {"input": prompt}, answer_marker())
+            async for kind, payload in events:
+                if kind == "action":
+                    tools_used.append(payload.tool)
+                elif kind == "output":
+                    output = payload
+                yield kind, payload
+            if route is not None and output:
+                # The agent saves its own turns; a fast-path turn has to be added by hand
+                await executor.memory.asave_context({"input": prompt}, {"output": output})
+    elapsed = time.perf_counter() - start
+    route_stats.record(route_name, elapsed)
+    if output and cached is None:
+        remember_answer(prompt, output, elapsed, tools_used)
+
+
+def run_turn_job(job, session_id: str, prompt: str) -> str | None:
+    """
+    Job function (see logic.jobs) running one chat turn in a worker thread.
+
+    Every event of `astream_turn` is emitted on the job as it happens; the
+    turn is abandoned if the job is cancelled.
+
+    Returns:
+        The final answer, or None if the agent produced none.
+
+    Raises:
+        Exception: Whatever ended the turn with an error.
+    """
+    from logic.jobs import run_until_cancelled
+
+    async def pump():
+        output = None
+        # aclosing: an error or cancellation still releases the session right away
+        async with contextlib.aclosing(astream_turn(session_id, prompt)) as events:
+            with span("chat.turn", "turn") as turn:
+                async for kind, payload in events:
+                    job.emit(kind, payload)
+                    if kind == "route":
+                        turn.set_attribute("route", payload)
+                    elif kind == "output":
+                        output = payload
+                    elif kind == "error":
+                        raise payload
+        return output
+
+    return run_until_cancelled(job, pump)
+
 
 # --- Main Execution Block (Async) ---
-def main(): # Define main as an async function
+async def main(): # Define main as an async function
     """
     Runs the main interaction loop for the conversational AI agent.
     
-    Prompts the user for input, processes queries through the agent executor, and displays responses until the user types 'quit' to exit. Handles and logs errors during agent execution.
+    Uses a single executor (one conversation). Prompts the user for input, processes queries through the agent executor, and displays responses until the user types 'quit' to exit. Handles and logs errors during agent execution.
     """
     logging.info("Starting agent interaction loop.")
+    try:
+        agent_executor = build_agent_executor(build_memory())
+    except ValueError as e:
+        print(f"Could not start the agent: {e}")
+        return
     print("Agent is ready. Type 'quit' to exit.")
 
     while True:
         try:
-            query = input("You: ")
+            # Read input in a thread so the event loop stays free
+            query = await asyncio.to_thread(input, "You: ")
             if query.lower() == 'quit':
                 logging.info("Exiting interaction loop.")
                 break
@@ -141,7 +608,7 @@ def main(): # Define main as an async function
             logging.info(f"User Query: {query}")
 
             # Invoke the agent executor asynchronously
-            response = agent_executor.invoke({"input": query}) # Use ainvoke and await
+            response = await agent_executor.ainvoke({"input": query}) # Use ainvoke and await
 
             output = response.get('output', 'No output found.')
             logging.info(f"Agent Response: {output}")
@@ -154,4 +621,4 @@ def main(): # Define main as an async function
     logging.info("Agent interaction finished.")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
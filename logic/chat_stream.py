@@ -0,0 +1,134 @@
+import asyncio
+import functools
+from typing import AsyncIterator, Optional
+
+from logic.telemetry import langchain_callback
+
+# The ReAct prompt makes the model announce its reply with this marker
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Sentinel pushed once the agent run is over
+_DONE = object()
+
+
+@functools.cache
+def _queue_callback_handler_class():
+    """
+    Defines the callback handler on first use, so the chat page can render its
+    history before paying for the langchain_core import.
+    """
+    from langchain_core.callbacks import AsyncCallbackHandler
+
+    class _QueueCallbackHandler(AsyncCallbackHandler):
+        """
+        Forwards every LLM token and the end of every LLM call into an asyncio queue.
+
+        The tap_output_* methods make it a streaming handler in LangChain's
+        eyes, so an invoked (not streamed) chat model still streams its tokens
+        to it, e.g. when the model has a response cache.
+        """
+
+        def __init__(self, events: asyncio.Queue):
+            self.events = events
+
+        def tap_output_aiter(self, run_id, output):
+            return output
+
+        def tap_output_iter(self, run_id, output):
+            return output
+
+        async def on_llm_new_token(self, token: str, **kwargs) -> None:
+            await self.events.put(("llm_token", token))
+
+        async def on_llm_end(self, response, **kwargs) -> None:
+            await self.events.put(("llm_end", None))
+
+    return _QueueCallbackHandler
+
+
+class _FinalAnswerFilter:
+    """
+    Passes through only the tokens that follow the final answer marker.
+
+    Each LLM call in the ReAct loop streams "Thought/Action" text first; those
+    tokens are held back until the marker shows up, then everything after it
+    is released as it arrives. Without a marker (tool-calling agents, whose
+    text is the answer) every token passes.
+    """
+
+    def __init__(self, marker: Optional[str] = FINAL_ANSWER_MARKER):
+        self.marker = marker
+        self.reset()
+
+    def reset(self):
+        self.buffer = ""
+        self.streaming = self.marker is None
+        self.strip_pending = True
+
+    def feed(self, token: str) -> str:
+        if not self.streaming:
+            self.buffer += token
+            index = self.buffer.find(self.marker)
+            if index == -1:
+                return ""
+            self.streaming = True
+            token = self.buffer[index + len(self.marker):]
+        if self.strip_pending:
+            # Drop the whitespace between the marker and the answer itself
+            token = token.lstrip()
+            self.strip_pending = not token
+        return token
+
+
+async def astream_agent_events(executor, inputs: dict,
+                               final_answer_marker: Optional[str] = FINAL_ANSWER_MARKER) -> AsyncIterator[tuple[str, object]]:
+    """
+    Runs one agent turn through `executor.astream` and yields its progress as it happens.
+
+    Args:
+        executor: The AgentExecutor to drive.
+        inputs: The input dictionary, e.g. {"input": prompt}.
+        final_answer_marker: Text preceding the answer in the LLM output; None
+            if all of the LLM's text is the answer.
+
+    Yields:
+        (kind, payload) tuples, where kind is one of:
+            'action'      - an AgentAction (the model's Thought/Action/Action Input)
+            'observation' - the string result of a tool call
+            'token'       - a chunk of the Final Answer text
+            'output'      - the complete final answer once the run has finished
+            'error'       - the exception that ended the run
+    """
+    events = asyncio.Queue()
+    handler = _queue_callback_handler_class()(events)
+
+    async def run():
+        try:
+            async for chunk in executor.astream(inputs, config={"callbacks": [handler, langchain_callback()]}):
+                for action in chunk.get("actions", []):
+                    await events.put(("action", action))
+                for step in chunk.get("steps", []):
+                    await events.put(("observation", str(step.observation)))
+                if "output" in chunk:
+                    await events.put(("output", chunk["output"]))
+        except Exception as e:
+            await events.put(("error", e))
+        finally:
+            await events.put(_DONE)
+
+    task = asyncio.create_task(run())
+    answer_filter = _FinalAnswerFilter(final_answer_marker)
+    try:
+        while (event := await events.get()) is not _DONE:
+            kind, payload = event
+            if kind == "llm_token":
+                if text := answer_filter.feed(payload):
+                    yield "token", text
+            elif kind == "llm_end":
+                answer_filter.reset()
+            else:
+                yield kind, payload
+    finally:
+        # The consumer stopped early (e.g. the page was rerun): don't leave the turn running
+        if not task.done():
+            task.cancel()
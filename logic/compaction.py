@@ -0,0 +1,144 @@
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable
+
+from logic.memory import approximate_token_count
+from logic.search_cache import normalize_url
+from logic.semantic_cache import content_words
+from logic.telemetry import add_to_current
+
+# --- Configuration ---
+compaction_enabled = os.getenv("OBSERVATION_COMPACTION", "1") not in ("0", "false", "off")
+# Tokens one tool observation may take in the agent's prompt
+observation_token_budget = int(os.getenv("OBSERVATION_TOKEN_BUDGET", 300))
+# Sentences kept from each search result: the ones sharing the most words with the query
+observation_max_sentences = int(os.getenv("OBSERVATION_MAX_SENTENCES", 3))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def relevant_sentences(text: str, query: str, max_sentences: int) -> str:
+    """
+    Up to `max_sentences` sentences of `text` sharing the most words with
+    `query`, in their original order. Falls back to the leading sentences when
+    no sentence shares a word.
+    """
+    sentences = [s for s in _SENTENCE_END.split(text.strip()) if s]
+    if len(sentences) <= max_sentences:
+        return " ".join(sentences)
+    query_words = set(content_words(query))
+    scores = [len(query_words.intersection(content_words(s))) for s in sentences]
+    if not any(scores):
+        return " ".join(sentences[:max_sentences])
+    # Highest score first, ties to the earlier sentence; sentences sharing no word are left out
+    ranked = sorted((i for i in range(len(sentences)) if scores[i]), key=lambda i: (-scores[i], i))
+    keep = sorted(ranked[:max_sentences])
+    return " ".join(sentences[i] for i in keep)
+
+
+def truncate_to_tokens(text: str, tokens: int, token_counter: Callable[[str], int] = approximate_token_count) -> str:
+    """Cuts `text` at a word boundary so that it fits in about `tokens` tokens."""
+    if token_counter(text) <= tokens:
+        return text
+    # approximate_token_count is ~4 characters per token; trim until the counter agrees
+    cut = text[:max(0, tokens * 4)]
+    while cut and token_counter(cut + "…") > tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut.rsplit(" ", 1)[0] + "…" if " " in cut else cut + "…"
+
+
+class ObservationCompactor:
+    """
+    Shrinks tool observations before they go into the agent's prompt.
+
+    Used as the AgentExecutor's `trim_intermediate_steps`, so it runs before
+    every LLM call of the loop on all the steps so far. The steps themselves
+    (streamed to the page, returned to callers) keep the full observations;
+    only the prompt sees the compacted ones.
+
+    Search results (lists of {"title", "url", "content"}) are reduced to the
+    sentences most relevant to the tool input, results from a source already
+    shown in an earlier step are dropped, and each observation is held to
+    `token_budget`. Any other observation is truncated to the same budget.
+    """
+
+    def __init__(self, token_budget: int = observation_token_budget,
+                 max_sentences: int = observation_max_sentences,
+                 token_counter: Callable[[str], int] = approximate_token_count):
+        self.token_budget = token_budget
+        self.max_sentences = max_sentences
+        self.token_counter = token_counter
+        self._lock = threading.Lock()
+        self._stats = {"turns": 0, "llm_calls": 0, "observations": 0, "observation_tokens": 0, "prompt_tokens_saved": 0}
+
+    def compact_results(self, results: list, query: str, seen_urls: set) -> list | str:
+        """Relevant, deduplicated extracts of search `results` within the token budget."""
+        compacted, repeated = [], []
+        remaining = self.token_budget
+        for result in results:
+            if not isinstance(result, dict) or "content" not in result:
+                continue
+            url = result.get("url") or result.get("link") or ""
+            key = normalize_url(url) if url else result["content"][:200]
+            if key in seen_urls:
+                repeated.append(url)
+                continue
+            seen_urls.add(key)
+            entry = {"title": result.get("title", ""), "url": url,
+                     "content": relevant_sentences(str(result["content"]), query, self.max_sentences)}
+            cost = self.token_counter(str(entry))
+            if cost > remaining:
+                # Trim the last result that fits partially; skip the rest
+                overhead = cost - self.token_counter(entry["content"])
+                if remaining - overhead < 20:
+                    break
+                entry["content"] = truncate_to_tokens(entry["content"], remaining - overhead, self.token_counter)
+                cost = self.token_counter(str(entry))
+            compacted.append(entry)
+            remaining -= cost
+        if not compacted and repeated:
+            return f"No new results; already seen: {', '.join(repeated)}"
+        return compacted
+
+    def compact(self, observation: Any, tool_input: Any, seen_urls: set) -> Any:
+        """Compacts one observation; `seen_urls` collects sources across the steps of a prompt."""
+        if isinstance(observation, list):
+            query = tool_input.get("query", "") if isinstance(tool_input, dict) else str(tool_input)
+            return self.compact_results(observation, query, seen_urls)
+        if isinstance(observation, str):
+            return truncate_to_tokens(observation, self.token_budget, self.token_counter)
+        return observation
+
+    def __call__(self, intermediate_steps: list) -> list:
+        """The steps with compacted observations (AgentExecutor.trim_intermediate_steps)."""
+        seen_urls = set()
+        compacted_steps, raw_tokens, compacted_tokens = [], 0, 0
+        for action, observation in intermediate_steps:
+            compacted = self.compact(observation, action.tool_input, seen_urls)
+            raw_tokens += self.token_counter(str(observation))
+            compacted_tokens += self.token_counter(str(compacted))
+            compacted_steps.append((action, compacted))
+        saved = max(0, raw_tokens - compacted_tokens)
+        with self._lock:
+            # The first LLM call of a turn comes with no steps
+            self._stats["turns"] += not intermediate_steps
+            self._stats["llm_calls"] += 1
+            self._stats["observations"] += len(intermediate_steps)
+            self._stats["observation_tokens"] += compacted_tokens
+            self._stats["prompt_tokens_saved"] += saved
+        if saved:
+            # Summed over the turn's LLM calls on the turn's span (see the Performance page)
+            add_to_current("prompt_tokens_saved", saved)
+            logging.debug(f"Observation compaction saved {saved} prompt tokens ({raw_tokens} -> {compacted_tokens}).")
+        return compacted_steps
+
+    def stats(self) -> dict:
+        """Turns, LLM calls, observation tokens sent and saved so far, and the mean saved per turn."""
+        with self._lock:
+            turns = self._stats["turns"]
+            return dict(self._stats, saved_per_turn=self._stats["prompt_tokens_saved"] / turns if turns else 0.0)
+
+
+observation_compactor = ObservationCompactor()
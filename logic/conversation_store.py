@@ -0,0 +1,106 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+# --- Configuration ---
+conversation_db_path = os.getenv("CONVERSATION_DB", ".conversations.db")
+# Messages the chat page renders at first, and how many more each "load earlier" adds
+chat_page_size = int(os.getenv("CHAT_PAGE_SIZE", 20))
+# Conversations (and saved session memory) untouched for this many days are deleted; 0 keeps them forever
+conversation_retention_days = float(os.getenv("CONVERSATION_RETENTION_DAYS", 30))
+# Seconds between two sweeps for expired conversations
+purge_interval = 3600.0
+
+
+class ConversationStore:
+    """
+    Append-only message log per chat session, in SQLite.
+
+    Messages are numbered per session, so the page can fetch just the latest
+    few (or the page before a given message) without reading the whole
+    conversation; nothing is kept in memory between calls. Conversations
+    without a new message for `retention` seconds are deleted.
+    """
+
+    def __init__(self, path: str, retention: float = 0.0):
+        self.path = path
+        self.retention = retention
+        self._purged_at = 0.0
+        self._lock = threading.Lock()
+        # One shared connection; the lock serializes access from Streamlit's threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages "
+                "(session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+            )
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Deletes the conversations whose last message is older than `retention`; returns how many."""
+        self._purged_at = time.time()
+        if not self.retention:
+            return 0
+        with self._lock, self._conn:
+            deleted = self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN "
+                "(SELECT session_id FROM messages GROUP BY session_id HAVING MAX(created_at) < ?)",
+                (self._purged_at - self.retention,),
+            ).rowcount
+        if deleted:
+            logging.info(f"Deleted {deleted} expired conversation message(s).")
+        return deleted
+
+    def append(self, session_id: str, role: str, content: str) -> int:
+        """Adds a message to the end of the session's conversation and returns its number."""
+        with self._lock, self._conn:
+            (seq,) = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT INTO messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, time.time()),
+            )
+        if time.time() - self._purged_at > purge_interval:
+            self.purge_expired()
+        return seq
+
+    def recent(self, session_id: str, limit: int, before: Optional[int] = None) -> list[dict]:
+        """
+        The session's last `limit` messages (those numbered below `before`, if given), oldest first.
+
+        Returns:
+            A list of {"seq", "role", "content"} dictionaries.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages WHERE session_id = ? AND seq < ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, before if before is not None else 2 ** 62, limit),
+            ).fetchall()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in reversed(rows)]
+
+    def forget(self, session_id: str) -> None:
+        """Deletes the session's conversation."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store() -> ConversationStore:
+    """Returns the shared store, opening the database on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConversationStore(conversation_db_path, conversation_retention_days * 86400)
+            logging.info(f"Opened conversation store at {conversation_db_path} "
+                         f"(kept for {conversation_retention_days:g} days; 0 = forever).")
+        return _store
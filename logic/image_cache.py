@@ -0,0 +1,356 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Iterable, Optional
+from urllib.parse import urljoin, urlsplit
+
+# --- Configuration ---
+cache_dir = os.getenv("IMAGE_CACHE_DIR", ".image_cache")
+disk_max_bytes = int(os.getenv("IMAGE_CACHE_DISK_BYTES", 200 * 1024 * 1024))
+memory_max_bytes = int(os.getenv("IMAGE_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+fetch_timeout = float(os.getenv("IMAGE_FETCH_TIMEOUT", 5))
+fetch_workers = int(os.getenv("IMAGE_FETCH_WORKERS", 8))
+prefetch_workers = int(os.getenv("IMAGE_PREFETCH_WORKERS", 2))
+# Don't download anything bigger than this, whatever the host claims
+max_download_bytes = int(os.getenv("IMAGE_MAX_DOWNLOAD_BYTES", 10 * 1024 * 1024))
+max_redirects = 5
+# A URL that failed is not retried for this long, so a broken host can't stall every rerun
+failure_ttl = float(os.getenv("IMAGE_FAILURE_TTL", 300))
+# Image URLs come from search results; by default only public hosts are fetched.
+# Turn on only to test against a local stub server
+allow_private_hosts = os.getenv("IMAGE_FETCH_ALLOW_PRIVATE", "0") not in ("0", "false", "off")
+
+# Tile sizes (max width, max height) used by the search page
+IMAGE_TILE = (400, 400)
+THUMBNAIL_TILE = (240, 180)
+
+
+def _public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%")[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global
+
+
+def check_image_url(url: str) -> str:
+    """
+    Rejects URLs the image proxy must not fetch: anything but http(s), and hosts
+    resolving to loopback, private, link-local (e.g. the 169.254.169.254
+    metadata service) or otherwise non-public addresses.
+
+    Returns:
+        The vetted address to connect to, so a second DNS lookup can't swap it.
+
+    Raises:
+        ValueError: If the URL is not allowed.
+        OSError: If the host can't be resolved.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Not an http(s) URL: {url[:100]}")
+    addresses = [sockaddr[0] for *_, sockaddr in
+                 socket.getaddrinfo(parts.hostname, parts.port or parts.scheme, type=socket.SOCK_STREAM)]
+    if not allow_private_hosts:
+        for address in addresses:
+            if not _public_address(address):
+                raise ValueError(f"Not fetching {parts.hostname}: it resolves to non-public address {address}")
+    return addresses[0]
+
+
+class _PinnedConnection(http.client.HTTPConnection):
+    """Connects to an already vetted address; the Host header still names the original host."""
+
+    def __init__(self, host: str, port: int, address: str, timeout: float):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+
+    def _connect_pinned(self) -> socket.socket:
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        # The peer is whom we connected to, whatever DNS says by now
+        peer = sock.getpeername()[0]
+        if peer != self.address or not (allow_private_hosts or _public_address(peer)):
+            sock.close()
+            raise ValueError(f"Not fetching {self.host}: connected to unexpected address {peer}")
+        return sock
+
+    def connect(self) -> None:
+        self.sock = self._connect_pinned()
+
+
+class _PinnedHTTPSConnection(_PinnedConnection, http.client.HTTPSConnection):
+    def __init__(self, host: str, port: int, address: str, timeout: float):
+        http.client.HTTPSConnection.__init__(self, host, port, timeout=timeout)
+        self.address = address
+
+    def connect(self) -> None:
+        # Certificate and SNI are checked against the original host name
+        self.sock = self._context.wrap_socket(self._connect_pinned(), server_hostname=self.host)
+
+
+def fetch_image(url: str, timeout: float = fetch_timeout) -> bytes:
+    """
+    Downloads an image from a public http(s) URL (see `check_image_url`),
+    following up to `max_redirects` redirects, each checked the same way.
+
+    The whole download, redirects included, must finish within `timeout`
+    seconds, not just each socket operation.
+
+    Raises:
+        ValueError: If the URL is not allowed, or the response is larger than `max_download_bytes`.
+        OSError: On network errors, HTTP errors and timeouts.
+    """
+    deadline = time.monotonic() + timeout
+    for _ in range(max_redirects + 1):
+        parts = urlsplit(url)
+        address = check_image_url(url)
+        https = parts.scheme == "https"
+        connection_class = _PinnedHTTPSConnection if https else _PinnedConnection
+        connection = connection_class(parts.hostname, parts.port or (443 if https else 80), address,
+                                      timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            connection.request("GET", (parts.path or "/") + (f"?{parts.query}" if parts.query else ""),
+                               headers={"User-Agent": "coolGemini-image-proxy/1.0"})
+            sock = connection.sock
+            response = connection.getresponse()
+            location = response.getheader("Location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            if response.status != 200:
+                raise OSError(f"HTTP {response.status} for {url[:100]}")
+            chunks, received = [], 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Image download took longer than {timeout:g}s")
+                sock.settimeout(remaining)
+                # read1: whatever has arrived, so a trickling host is checked against the deadline often
+                chunk = response.read1(min(64 * 1024, max_download_bytes + 1 - received))
+                if not chunk:
+                    return b"".join(chunks)
+                chunks.append(chunk)
+                received += len(chunk)
+                if received > max_download_bytes:
+                    raise ValueError(f"Image larger than {max_download_bytes} bytes")
+        finally:
+            connection.close()
+    raise OSError(f"More than {max_redirects} redirects for {url[:100]}")
+
+
+def resize_image(data: bytes, size: tuple[int, int]) -> bytes:
+    """
+    Downscales an image to fit within `size`, keeping its aspect ratio.
+
+    Images with transparency are re-encoded as PNG, everything else as JPEG.
+    Smaller images are only re-encoded, never upscaled.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(size)
+        output = io.BytesIO()
+        if image.mode in ("RGBA", "LA", "P"):
+            image.save(output, format="PNG", optimize=True)
+        else:
+            image.convert("RGB").save(output, format="JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+class ImageCache:
+    """
+    Resized image bytes, in a size-bounded memory LRU backed by a size-bounded disk cache.
+
+    Both tiers evict least recently used entries once their byte budget is exceeded.
+    """
+
+    def __init__(self, directory: str, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._failures: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "failures": 0}
+
+    @staticmethod
+    def key(url: str, size: tuple[int, int]) -> str:
+        return hashlib.sha256(f"{size[0]}x{size[1]}:{url}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.img")
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+        try:
+            path = self._path(key)
+            with open(path, "rb") as f:
+                data = f.read()
+            # Refresh the file's mtime, which the disk LRU orders by
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key: str, data: bytes) -> None:
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_size -= len(previous)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def set(self, key: str, data: bytes) -> None:
+        self._remember(key, data)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(key)}.tmp{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._trim_disk()
+        except OSError as e:
+            logging.warning(f"Could not write image to disk cache: {e}")
+
+    def _trim_disk(self) -> None:
+        with self._disk_lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".img"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def mark_failed(self, url: str) -> None:
+        with self._lock:
+            self._failures[url] = time.monotonic() + failure_ttl
+            self._stats["failures"] += 1
+
+    def recently_failed(self, url: str) -> bool:
+        with self._lock:
+            until = self._failures.get(url)
+            if until is not None and until < time.monotonic():
+                del self._failures[url]
+                return False
+            return until is not None
+
+    def stats(self) -> dict:
+        """Hit/miss/failure counters and the bytes held in memory."""
+        with self._lock:
+            return {**self._stats, "memory_bytes": self._memory_size, "memory_entries": len(self._memory)}
+
+
+image_cache = ImageCache(cache_dir, memory_max_bytes, disk_max_bytes)
+
+# Bounded parallelism for all downloads, shared across sessions
+_fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="image-fetch")
+# Prefetches (images nobody is looking at yet) get their own few workers, so they
+# never hold up the downloads of images on screen
+_prefetch_executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="image-prefetch")
+# key -> (future, deadline, prefetch); the deadline is when the download started (or
+# was first needed on screen) plus its timeout
+_in_flight: dict[str, tuple[Future, float, bool]] = {}
+_in_flight_lock = threading.Lock()
+
+
+def _fetch_and_store(url: str, size: tuple[int, int], key: str) -> Optional[bytes]:
+    try:
+        data = resize_image(fetch_image(url), size)
+        image_cache.set(key, data)
+        return data
+    except Exception as e:
+        logging.info(f"Could not fetch image {url}: {e}")
+        image_cache.mark_failed(url)
+        return None
+    finally:
+        # Only once the result is cached (or marked failed), so nobody re-downloads in between
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def _submit(url: str, size: tuple[int, int], key: str, timeout: float = fetch_timeout,
+            prefetch: bool = False) -> tuple[Future, float]:
+    # One download per image even if several sessions ask for it at once
+    with _in_flight_lock:
+        entry = _in_flight.get(key)
+        if entry is not None and entry[2] and not prefetch:
+            # A prefetched image is now on screen: a prefetch still queued moves to the
+            # on-screen workers, one already downloading gets an on-screen deadline
+            future = entry[0]
+            if future.cancel():
+                entry = None
+            else:
+                entry = _in_flight[key] = (future, time.monotonic() + timeout, False)
+        if entry is None:
+            executor = _prefetch_executor if prefetch else _fetch_executor
+            future = executor.submit(_fetch_and_store, url, size, key)
+            entry = _in_flight[key] = (future, time.monotonic() + timeout, prefetch)
+        return entry[:2]
+
+
+def get_images(urls: Iterable[str], size: tuple[int, int] = IMAGE_TILE,
+               timeout: float = fetch_timeout) -> dict[str, Optional[bytes]]:
+    """
+    Returns resized image bytes for every URL, fetching missing ones concurrently.
+
+    Cached images are returned immediately. Missing ones are downloaded in
+    parallel; whatever has not arrived within `timeout` of its download starting
+    (or failed recently) maps to None, so one slow or broken host never stalls
+    the grid, and a straggler is not waited for again on every rerun. Late
+    downloads still land in the cache for the next rerun.
+    """
+    images, pending = {}, {}
+    for url in urls:
+        key = ImageCache.key(url, size)
+        data = image_cache.get(key)
+        if data is not None:
+            images[url] = data
+        elif image_cache.recently_failed(url):
+            images[url] = None
+        else:
+            pending[url] = _submit(url, size, key, timeout)
+
+    if pending:
+        deadline = max(until for _, until in pending.values())
+        wait([future for future, _ in pending.values()], timeout=max(0.0, deadline - time.monotonic()))
+    for url, (future, _) in pending.items():
+        images[url] = future.result() if future.done() else None
+    return images
+
+
+def prefetch(urls: Iterable[str], size: tuple[int, int] = IMAGE_TILE) -> None:
+    """Starts downloading images (e.g. the next page) in the background without waiting."""
+    for url in urls:
+        key = ImageCache.key(url, size)
+        if image_cache.get(key) is None and not image_cache.recently_failed(url):
+            _submit(url, size, key, prefetch=True)
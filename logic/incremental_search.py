@@ -0,0 +1,46 @@
+import os
+from typing import Optional
+
+from logic.jobs import Job, JobQueue, run_until_cancelled
+from logic.multi_search import asearch_all
+
+# --- Configuration ---
+search_job_workers = int(os.getenv("SEARCH_JOB_WORKERS", 8))
+search_job_max_active = int(os.getenv("SEARCH_JOB_MAX_ACTIVE", 64))
+# A superseded search that already started runs to completion, so a session can briefly have a few
+search_job_max_per_session = int(os.getenv("SEARCH_JOB_MAX_PER_SESSION", 3))
+
+# Searches run in the background, so the page stays responsive while they do
+search_jobs = JobQueue(search_job_workers, search_job_max_active, search_job_max_per_session)
+
+
+def _search_job(job: Job, query: str) -> dict:
+    return run_until_cancelled(job, lambda: asearch_all(query))
+
+
+def start_search(owner: str, query: str) -> Job:
+    """
+    Starts a background `asearch_all` for `query`.
+
+    Args:
+        owner: The session the search belongs to (for the per-session limit).
+
+    Returns:
+        The job; once done, its result is the `asearch_all` dictionary.
+
+    Raises:
+        logic.jobs.JobRejectedError: If too many searches are in flight.
+    """
+    return search_jobs.submit(owner, _search_job, query)
+
+
+def drop_search(job_id: Optional[str]) -> None:
+    """
+    Drops a search the page no longer waits for (e.g. a newer query was submitted).
+
+    A search still queued is cancelled. One that already started is left to
+    finish: its provider calls may be shared with other sessions searching
+    the same query, and its results fill the search cache either way.
+    """
+    if job_id is not None:
+        search_jobs.cancel_queued(job_id)
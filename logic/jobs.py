@@ -0,0 +1,222 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
+
+# --- Configuration ---
+job_workers = int(os.getenv("JOB_WORKERS", 8))
+# Jobs admitted at once (queued or running); more are turned away instead of piling up
+job_max_active = int(os.getenv("JOB_MAX_ACTIVE", 32))
+job_max_per_owner = int(os.getenv("JOB_MAX_PER_SESSION", 1))
+# Seconds a finished job stays around for a page that comes back for its result
+job_retention = float(os.getenv("JOB_RETENTION", 600))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+
+class JobRejectedError(RuntimeError):
+    """The queue is at its admission limit (overall or for the owner)."""
+
+
+class Job:
+    """
+    One unit of background work and its progress.
+
+    The worker appends (kind, payload) progress events with `emit`; readers
+    (e.g. a polling page) take a snapshot with `events_since`.
+    """
+
+    def __init__(self, owner: str):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.events: list[tuple[str, Any]] = []
+        self._cancel = threading.Event()
+        self._future = None
+        self._on_finish = None
+        self._finishing = False
+
+    @property
+    def done(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancellation was requested; long-running work should check it and stop."""
+        return self._cancel.is_set()
+
+    def emit(self, kind: str, payload: Any = None) -> None:
+        self.events.append((kind, payload))
+
+    def events_since(self, index: int = 0) -> list[tuple[str, Any]]:
+        return self.events[index:]
+
+
+def run_until_cancelled(job: Job, make_coroutine: Callable[[], Awaitable[Any]], poll_interval: float = 0.1) -> Any:
+    """
+    Runs a coroutine on a fresh event loop (in the job's worker thread), cancelling it when the job is.
+
+    Returns:
+        The coroutine's result.
+
+    Raises:
+        asyncio.CancelledError: If the job was cancelled first.
+    """
+
+    async def supervise():
+        task = asyncio.ensure_future(make_coroutine())
+        while not task.done():
+            await asyncio.wait({task}, timeout=poll_interval)
+            if job.cancelled and not task.done():
+                task.cancel()
+        return task.result()
+
+    return asyncio.run(supervise())
+
+
+class JobQueue:
+    """
+    A bounded pool of worker threads running jobs outside the Streamlit script thread.
+
+    Work keeps going when the page that started it reruns or is left, and its
+    result stays available for `retention` seconds. Admission is limited overall
+    (`max_active` queued or running jobs) and per owner (e.g. a chat session),
+    so a burst of users gets a clear "busy" answer instead of an ever-growing queue.
+    """
+
+    def __init__(self, max_workers: int = 8, max_active: int = 32, max_per_owner: int = 1, retention: float = 600.0):
+        self.max_active = max_active
+        self.max_per_owner = max_per_owner
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "rejected": 0, DONE: 0, FAILED: 0, CANCELLED: 0}
+
+    def _purge(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, owner: str, fn: Callable[..., Any], *args,
+               on_finish: Optional[Callable[[Job, str], None]] = None) -> Job:
+        """
+        Queues `fn(job, *args)`; its return value becomes `job.result`.
+
+        Args:
+            owner: Who the job belongs to, for the per-owner limit (e.g. a session id).
+            fn: The work; receives the Job first so it can emit progress and check cancellation.
+            on_finish: Called exactly once when the job ends, however it ends (done,
+                failed or cancelled, even before it started), with the job and its
+                final status. It runs before the job reports that status, so a
+                poller that sees the job done also sees what on_finish did.
+
+        Raises:
+            JobRejectedError: If the queue or the owner is at its admission limit.
+        """
+        job = Job(owner)
+        job._on_finish = on_finish
+        with self._lock:
+            self._purge()
+            active = [j for j in self._jobs.values() if not j.done]
+            if len(active) >= self.max_active or sum(j.owner == owner for j in active) >= self.max_per_owner:
+                self._stats["rejected"] += 1
+                raise JobRejectedError(f"{len(active)} jobs are active; try again shortly.")
+            self._jobs[job.id] = job
+            self._stats["submitted"] += 1
+        # The job runs in the submitter's context (e.g. its telemetry span and upstream priority)
+        job._future = self._executor.submit(contextvars.copy_context().run, self._run, job, fn, args)
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple) -> None:
+        with self._lock:
+            if job.done:
+                return  # Cancelled while queued
+            job.status = RUNNING
+            job.started_at = time.time()
+        try:
+            job.result = fn(job, *args)
+            status = CANCELLED if job.cancelled else DONE
+        except asyncio.CancelledError:
+            status = CANCELLED
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.error = e
+            status = CANCELLED if job.cancelled else FAILED
+        self._finish(job, status)
+
+    def _finish(self, job: Job, status: str) -> None:
+        with self._lock:
+            if job.done or job._finishing:
+                return
+            job._finishing = True
+        # Before the status changes: whoever sees the job done also sees what on_finish stored
+        if job._on_finish is not None:
+            try:
+                job._on_finish(job, status)
+            except Exception as e:
+                logging.error(f"on_finish of job {job.id} failed: {e}", exc_info=True)
+        with self._lock:
+            job.status = status
+            job.finished_at = time.time()
+            self._stats[status] += 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Requests cancellation. A queued job never runs; a running job is told to
+        stop (see `Job.cancelled` and `run_until_cancelled`).
+
+        Returns:
+            False if the job is unknown or already finished.
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job._cancel.set()
+        with self._lock:
+            queued = job.status == QUEUED
+        if queued and job._future.cancel():
+            self._finish(job, CANCELLED)
+        return True
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """
+        Cancels a job only if it hasn't started; a running job is left to finish.
+
+        Returns:
+            True if the job was cancelled before it ran.
+        """
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        with self._lock:
+            queued = job.status == QUEUED
+        if queued and job._future.cancel():
+            job._cancel.set()
+            self._finish(job, CANCELLED)
+            return True
+        return False
+
+    def stats(self) -> dict:
+        """Submitted, rejected and finished counts, and the jobs queued and running now."""
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return dict(self._stats, queued=statuses.count(QUEUED), running=statuses.count(RUNNING))
+
+
+# Shared by every session of the app
+job_queue = JobQueue(job_workers, job_max_active, job_max_per_owner, job_retention)
@@ -0,0 +1,206 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# --- Configuration ---
+llm_cache_enabled = os.getenv("LLM_CACHE", "1") not in ("0", "false", "off")
+# Responses to sampled (temperature > 0) calls differ run to run; cache them only if forced
+llm_cache_force = os.getenv("LLM_CACHE_FORCE", "0") not in ("0", "false", "off")
+llm_cache_size = int(os.getenv("LLM_CACHE_SIZE", 256))
+# SQLite tier shared across restarts; empty to keep the cache in memory only
+llm_cache_db_path = os.getenv("LLM_CACHE_DB", ".llm_cache.db")
+llm_cache_max_rows = int(os.getenv("LLM_CACHE_MAX_ROWS", 10000))
+llm_cache_ttl = float(os.getenv("LLM_CACHE_TTL", 86400))
+# Log the hit rate every this many lookups
+llm_cache_log_every = int(os.getenv("LLM_CACHE_LOG_EVERY", 50))
+
+
+def cache_key(prompt: str, llm_string: str) -> str:
+    """
+    Hash of an LLM call. LangChain's `llm_string` holds the model's settings
+    (model name, temperature, safety settings...) and the call's stop words;
+    `prompt` is the full serialized message list.
+    """
+    return hashlib.sha256(f"{llm_string}\0{prompt}".encode()).hexdigest()
+
+
+@functools.cache
+def _llm_cache_class():
+    """
+    Defines the cache class on first use, so importing this module doesn't
+    import langchain_core.
+    """
+    from langchain_core.caches import BaseCache
+    from langchain_core.messages import message_to_dict, messages_from_dict
+    from langchain_core.outputs import ChatGeneration, Generation
+
+    def dumps(generations) -> str:
+        return json.dumps([
+            {"message": message_to_dict(generation.message)} if isinstance(generation, ChatGeneration)
+            else {"text": generation.text}
+            for generation in generations
+        ])
+
+    def loads(value: str) -> list:
+        return [
+            ChatGeneration(message=messages_from_dict([item["message"]])[0]) if "message" in item
+            else Generation(text=item["text"])
+            for item in json.loads(value)
+        ]
+
+    class LLMResponseCache(BaseCache):
+        """
+        Exact-match cache of LLM responses: an in-memory LRU in front of an optional SQLite table.
+
+        Plugged into a chat model with its `cache` field, so LangChain looks
+        up every non-streamed call before sending it. Entries older than `ttl`
+        are never served. The memory tier holds `max_entries` responses; the
+        SQLite tier about `max_rows`, dropping the least recently used.
+        """
+
+        def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                     max_rows: int = 10000, ttl: float = 86400.0, log_every: int = 50):
+            self.max_entries = max_entries
+            self.max_rows = max_rows
+            self.ttl = ttl
+            self.log_every = log_every
+            self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()  # Least recently used first
+            self._lock = threading.Lock()
+            self._stats = {"lookups": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "updates": 0}
+            self._inserts_since_prune = 0
+            self._conn = None
+            if db_path:
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                with self._conn:
+                    self._conn.execute(
+                        "CREATE TABLE IF NOT EXISTS llm_cache "
+                        "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, used_at REAL NOT NULL)"
+                    )
+                self._prune()
+
+        def _prune(self) -> None:
+            with self._conn:
+                self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+            self._inserts_since_prune = 0
+
+        def _remember(self, key: str, value: str, created_at: float) -> None:
+            self._memory[key] = (value, created_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+        def _count(self, outcome: str) -> None:
+            self._stats["lookups"] += 1
+            self._stats[outcome] += 1
+            if self.log_every and self._stats["lookups"] % self.log_every == 0:
+                stats = self.stats()
+                logging.info(
+                    f"LLM cache: {stats['hit_rate']:.0%} hit rate over {stats['lookups']} lookups "
+                    f"({stats['memory_hits']} memory, {stats['disk_hits']} disk, {stats['misses']} misses)."
+                )
+
+        def lookup(self, prompt: str, llm_string: str):
+            key = cache_key(prompt, llm_string)
+            cutoff = time.time() - self.ttl
+            with self._lock:
+                entry = self._memory.get(key)
+                if entry is not None and entry[1] >= cutoff:
+                    self._memory.move_to_end(key)
+                    self._count("memory_hits")
+                    return loads(entry[0])
+                row = None
+                if self._conn is not None:
+                    try:
+                        row = self._conn.execute(
+                            "SELECT value, created_at FROM llm_cache WHERE key = ? AND created_at >= ?", (key, cutoff)
+                        ).fetchone()
+                        if row is not None:
+                            with self._conn:
+                                self._conn.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (time.time(), key))
+                    except sqlite3.Error as e:
+                        logging.warning(f"Could not read the LLM cache: {e}")
+                if row is None:
+                    self._count("misses")
+                    return None
+                self._remember(key, *row)
+                self._count("disk_hits")
+            return loads(row[0])
+
+        def update(self, prompt: str, llm_string: str, return_val) -> None:
+            key = cache_key(prompt, llm_string)
+            value = dumps(return_val)
+            now = time.time()
+            with self._lock:
+                self._remember(key, value, now)
+                self._stats["updates"] += 1
+                if self._conn is None:
+                    return
+                try:
+                    with self._conn:
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO llm_cache (key, value, created_at, used_at) VALUES (?, ?, ?, ?)",
+                            (key, value, now, now),
+                        )
+                    self._inserts_since_prune += 1
+                    if self._inserts_since_prune >= max(1, min(100, self.max_rows // 10)):
+                        self._prune()
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not write to the LLM cache: {e}")
+
+        def clear(self, **kwargs) -> None:
+            with self._lock:
+                self._memory.clear()
+                if self._conn is not None:
+                    with self._conn:
+                        self._conn.execute("DELETE FROM llm_cache")
+
+        def stats(self) -> dict:
+            """Lookups, hits per tier, misses, updates, hit rate and entries in memory."""
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = self._stats["lookups"]
+            return dict(self._stats, hit_rate=hits / lookups if lookups else 0.0, entries=len(self._memory))
+
+    return LLMResponseCache
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_for_temperature(temperature: float):
+    """
+    The shared LLM response cache for a model sampling at `temperature`, or
+    None if caching is off or would pin one of several possible answers
+    (temperature > 0, unless LLM_CACHE_FORCE is set).
+    """
+    global _cache
+    if not llm_cache_enabled:
+        return None
+    if temperature > 0 and not llm_cache_force:
+        logging.info(f"LLM cache bypassed: temperature {temperature:g} makes responses vary (LLM_CACHE_FORCE=1 to cache anyway).")
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = _llm_cache_class()(llm_cache_size, llm_cache_db_path or None, llm_cache_max_rows,
+                                        llm_cache_ttl, llm_cache_log_every)
+            logging.info(f"Opened LLM cache ({llm_cache_size} in memory, SQLite at {llm_cache_db_path or 'none'}).")
+        return _cache
+
+
+def has_cache(llm) -> bool:
+    """Whether a chat model has its own response cache (see `cache_for_temperature`)."""
+    from langchain_core.caches import BaseCache
+
+    return isinstance(getattr(llm, "cache", None), BaseCache)
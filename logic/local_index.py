@@ -0,0 +1,255 @@
+import heapq
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Iterable, Optional
+
+from logic.search_cache import normalize_url
+from logic.semantic_cache import Embedder, build_embedder, content_words, is_time_sensitive
+
+# --- Configuration ---
+# Index every web result fetched from Tavily (search page and agent tool)
+local_index_enabled = os.getenv("LOCAL_INDEX", "1") not in ("0", "false", "off")
+# Serve searches from the index when it covers the query well enough, calling Tavily only on a miss
+local_first_enabled = os.getenv("LOCAL_FIRST", "0") not in ("0", "false", "off")
+local_index_max_docs = int(os.getenv("LOCAL_INDEX_MAX_DOCS", 20000))
+# Seconds an indexed page is trusted before it is dropped
+local_index_ttl = float(os.getenv("LOCAL_INDEX_TTL", 86400))
+# Optional: path to a SQLite file so the index survives restarts
+local_index_db_path = os.getenv("LOCAL_INDEX_DB")
+# Optional: "hashing" or "google" to rerank BM25 candidates by embedding similarity
+local_index_embedder = os.getenv("LOCAL_INDEX_EMBEDDER", "")
+# A local answer needs this many results, each containing this share of the query's words
+local_first_min_results = int(os.getenv("LOCAL_FIRST_MIN_RESULTS", 3))
+local_first_min_coverage = float(os.getenv("LOCAL_FIRST_MIN_COVERAGE", 1.0))
+
+
+class _Doc:
+    __slots__ = ("title", "url", "content", "terms", "length", "added_at", "vector")
+
+    def __init__(self, title: str, url: str, content: str, added_at: float, vector=None):
+        self.title = title
+        self.url = url
+        self.content = content
+        # The title counts twice: it says what the page is about
+        self.terms = Counter(content_words(f"{title} {title} {content}"))
+        self.length = sum(self.terms.values())
+        self.added_at = added_at
+        self.vector = vector
+
+
+class LocalIndex:
+    """
+    A BM25 full-text index over web results fetched earlier, with optional embedding reranking.
+
+    Results are deduplicated by normalized URL; re-adding a page replaces its
+    entry. The index keeps at most `max_docs` pages, evicting the least recently
+    used, and drops pages older than `ttl` during compaction. With `db_path`,
+    pages are also written to SQLite and reloaded on start.
+    """
+
+    def __init__(self, max_docs: int = 20000, ttl: float = 86400.0, embed: Optional[Embedder] = None,
+                 db_path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.max_docs = max_docs
+        self.ttl = ttl
+        self.embed = embed
+        self.k1 = k1
+        self.b = b
+        self._docs: "OrderedDict[str, _Doc]" = OrderedDict()  # Least recently used first
+        self._postings: dict[str, dict[str, int]] = {}  # term -> {doc key: term frequency}
+        self._total_length = 0
+        self._adds_since_compaction = 0
+        self._lock = threading.RLock()
+        self._stats = {"added": 0, "evicted": 0, "expired": 0, "lookups": 0, "local_hits": 0}
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS local_index "
+                    "(key TEXT PRIMARY KEY, title TEXT NOT NULL, url TEXT NOT NULL, content TEXT NOT NULL, "
+                    "added_at REAL NOT NULL)"
+                )
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT key, title, url, content, added_at FROM local_index WHERE added_at >= ? "
+            "ORDER BY added_at DESC LIMIT ?",
+            (time.time() - self.ttl, self.max_docs),
+        ).fetchall()
+        with self._lock:
+            for key, title, url, content, added_at in reversed(rows):
+                self._insert(key, _Doc(title, url, content, added_at, self._embed(f"{title} {content}")))
+        logging.info(f"Loaded {len(rows)} pages into the local search index.")
+
+    def _embed(self, text: str):
+        return self.embed(text) if self.embed is not None else None
+
+    def _insert(self, key: str, doc: _Doc) -> None:
+        if key in self._docs:
+            self._remove(key)
+        self._docs[key] = doc
+        self._total_length += doc.length
+        for term, frequency in doc.terms.items():
+            self._postings.setdefault(term, {})[key] = frequency
+
+    def _remove(self, key: str) -> None:
+        doc = self._docs.pop(key)
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+    def add(self, results: Iterable[dict]) -> int:
+        """
+        Indexes web results ({"title", "url" or "link", "content"}); returns how many were added.
+        """
+        now = time.time()
+        added = []
+        for result in results:
+            url = result.get("url") or result.get("link")
+            content = result.get("content")
+            if not url or not content or not isinstance(content, str):
+                continue
+            title = result.get("title") or ""
+            key = normalize_url(url)
+            # Embedded outside the lock; a remote embedder may take a while
+            added.append((key, _Doc(title, url, content, now, self._embed(f"{title} {content}"))))
+        if not added:
+            return 0
+        with self._lock:
+            for key, doc in added:
+                self._insert(key, doc)
+            self._stats["added"] += len(added)
+            self._adds_since_compaction += len(added)
+            while len(self._docs) > self.max_docs:
+                self._forget(next(iter(self._docs)), "evicted")
+            if self._adds_since_compaction >= max(100, self.max_docs // 10):
+                self.compact()
+        if self._conn is not None:
+            try:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO local_index (key, title, url, content, added_at) VALUES (?, ?, ?, ?, ?)",
+                        [(key, doc.title, doc.url, doc.content, doc.added_at) for key, doc in added],
+                    )
+            except sqlite3.Error as e:
+                logging.warning(f"Could not write to the local search index: {e}")
+        return len(added)
+
+    def _forget(self, key: str, reason: str) -> None:
+        self._remove(key)
+        self._stats[reason] += 1
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute("DELETE FROM local_index WHERE key = ?", (key,))
+
+    def compact(self) -> int:
+        """Drops pages older than `ttl`; returns how many were dropped."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [key for key, doc in self._docs.items() if doc.added_at < cutoff]
+            for key in expired:
+                self._forget(key, "expired")
+            self._adds_since_compaction = 0
+        return len(expired)
+
+    def search(self, query: str, k: int = 5) -> list[dict]:
+        """
+        The `k` pages best matching `query`, best first.
+
+        Returns:
+            A list of {"title", "url", "content", "score", "coverage"} dictionaries,
+            where coverage is the share of the query's words found in the page.
+        """
+        terms = set(content_words(query))
+        if not terms:
+            return []
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            count = len(self._docs)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores: dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[key].length / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            # Embedding reranking looks at a wider set of BM25 candidates
+            candidates = heapq.nlargest(k * 4 if self.embed is not None else k, scores.items(), key=lambda item: item[1])
+            hits = [(key, score, self._docs[key]) for key, score in candidates if self._docs[key].added_at >= cutoff]
+            for key, _, _ in hits:
+                self._docs.move_to_end(key)
+        if self.embed is not None and hits:
+            query_vector = self.embed(query)
+            best = hits[0][1]
+            hits = sorted(
+                ((key, 0.5 * score / best + 0.5 * sum(a * b for a, b in zip(query_vector, doc.vector)), doc)
+                 for key, score, doc in hits),
+                key=lambda hit: hit[1], reverse=True,
+            )
+        return [
+            {"title": doc.title, "url": doc.url, "content": doc.content, "score": score,
+             "coverage": len(terms.intersection(doc.terms)) / len(terms)}
+            for _, score, doc in hits[:k]
+        ]
+
+    def lookup(self, query: str, k: int = 5, min_results: int = 3, min_coverage: float = 1.0) -> Optional[list[dict]]:
+        """
+        Answers `query` locally if the index covers it well enough, else returns None.
+
+        Needs at least `min_results` pages that each contain `min_coverage` of
+        the query's words. Time-sensitive queries ("latest", "today"...) always
+        go upstream.
+        """
+        with self._lock:
+            self._stats["lookups"] += 1
+        if is_time_sensitive(query):
+            return None
+        hits = [hit for hit in self.search(query, k) if hit["coverage"] >= min_coverage]
+        if len(hits) < min(min_results, k):
+            return None
+        with self._lock:
+            self._stats["local_hits"] += 1
+        return hits
+
+    def stats(self) -> dict:
+        """Pages and terms indexed, adds/evictions, and local-first lookups and hits."""
+        with self._lock:
+            return dict(self._stats, docs=len(self._docs), terms=len(self._postings))
+
+
+local_index = LocalIndex(
+    max_docs=local_index_max_docs,
+    ttl=local_index_ttl,
+    embed=build_embedder(local_index_embedder) if local_index_embedder else None,
+    db_path=local_index_db_path,
+)
+
+
+def index_results(results) -> None:
+    """Adds fetched web results to the shared index (if enabled); anything but a list is ignored."""
+    if local_index_enabled and isinstance(results, list):
+        local_index.add(results)
+
+
+def local_search(query: str, k: int = 5) -> Optional[list[dict]]:
+    """Local-first lookup in the shared index: results if LOCAL_FIRST is on and the index covers the query."""
+    if not local_first_enabled:
+        return None
+    return local_index.lookup(query, k, local_first_min_results, local_first_min_coverage)
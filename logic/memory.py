@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string, messages_from_dict, messages_to_dict
+from langchain_core.prompts import BasePromptTemplate
+from pydantic import PrivateAttr
+
+from logic.rate_limit import BACKGROUND, priority
+from logic.telemetry import langchain_callback, span
+
+# Summaries are written off the response path by this small shared pool
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+
+
+def approximate_token_count(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token); avoids a count_tokens API call."""
+    return len(text) // 4 + 1
+
+
+class BudgetedSummaryMemory(BaseChatMemory):
+    """
+    Keeps the most recent messages verbatim within a token budget and folds older
+    ones into a running summary in the background.
+
+    Unlike ConversationSummaryMemory, which calls the LLM after every turn, this
+    memory only calls it when the window overflows `max_token_limit`, and never
+    on the response path: messages pushed out of the window stay visible as-is
+    until the background summary has absorbed them.
+    """
+
+    llm: BaseLanguageModel
+    memory_key: str = "chat_history"
+    max_token_limit: int = 1000
+    summary: str = ""
+    summary_prompt: BasePromptTemplate = SUMMARY_PROMPT
+    token_counter: Callable[[str], int] = approximate_token_count
+
+    # Messages pushed out of the window, waiting to be folded into the summary
+    _pending: List[BaseMessage] = PrivateAttr(default_factory=list)
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+    _summarizing: bool = PrivateAttr(default=False)
+    _idle: Any = PrivateAttr(default_factory=threading.Event)
+    _stats: Dict[str, Any] = PrivateAttr(default_factory=lambda: {
+        "turns": 0, "summary_llm_calls": 0, "save_seconds": 0.0, "summary_seconds": 0.0,
+    })
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._idle.set()
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def buffer(self) -> List[BaseMessage]:
+        """Summary (as a system message), then pending and windowed messages, oldest first."""
+        with self._lock:
+            messages = list(self._pending) + list(self.chat_memory.messages)
+            if self.summary:
+                messages.insert(0, SystemMessage(content=self.summary))
+            return messages
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.return_messages:
+            return {self.memory_key: self.buffer}
+        return {self.memory_key: get_buffer_string(self.buffer)}
+
+    def _count_tokens(self, messages: List[BaseMessage]) -> List[int]:
+        return [self.token_counter(get_buffer_string([m])) for m in messages]
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        """Appends the turn and, if the window overflows, schedules a background summary."""
+        start = time.perf_counter()
+        with span("memory.save", "memory"), self._lock:
+            super().save_context(inputs, outputs)
+            messages = list(self.chat_memory.messages)
+            token_counts = self._count_tokens(messages)
+            window_tokens = sum(token_counts)
+            evicted = 0
+            # Always keep the latest exchange verbatim, even if it alone exceeds the budget
+            while len(messages) - evicted > 2 and window_tokens > self.max_token_limit:
+                window_tokens -= token_counts[evicted]
+                evicted += 1
+            if evicted:
+                self._pending.extend(messages[:evicted])
+                self.chat_memory.clear()
+                self.chat_memory.add_messages(messages[evicted:])
+            if self._pending and not self._summarizing:
+                self._summarizing = True
+                self._idle.clear()
+                _summary_executor.submit(self._summarize_pending)
+            self._stats["turns"] += 1
+            self._stats["save_seconds"] += time.perf_counter() - start
+
+    async def asave_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        # Saving never blocks on the LLM, so the sync version is fine here too
+        self.save_context(inputs, outputs)
+
+    def _summarize_pending(self) -> None:
+        """Folds pending messages into the summary until none are left (runs in the background)."""
+        while True:
+            with self._lock:
+                batch = list(self._pending)
+                summary = self.summary
+                if not batch:
+                    # Checked and cleared under the lock, so save_context never misses a wake-up
+                    self._summarizing = False
+                    self._idle.set()
+                    return
+            start = time.perf_counter()
+            try:
+                # Nobody waits for a summary, so a user's chat turn gets Gemini tokens first
+                with priority(BACKGROUND), span("memory.summarize", "memory", messages=len(batch)):
+                    new_summary = self.llm.invoke(
+                        self.summary_prompt.format(summary=summary, new_lines=get_buffer_string(batch)),
+                        config={"callbacks": [langchain_callback()]},
+                    )
+            except Exception as e:
+                # Keep the pending messages; they are retried after the next turn
+                logging.error(f"Background summarization failed: {e}")
+                with self._lock:
+                    self._summarizing = False
+                    self._idle.set()
+                return
+            with self._lock:
+                self.summary = getattr(new_summary, "content", new_summary)
+                del self._pending[:len(batch)]
+                self._stats["summary_llm_calls"] += 1
+                self._stats["summary_seconds"] += time.perf_counter() - start
+
+    def wait_for_summary(self, timeout: float = None) -> bool:
+        """Blocks until no background summary is running. Returns False on timeout."""
+        return self._idle.wait(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Turn count, summary LLM calls and time spent saving/summarizing so far."""
+        with self._lock:
+            window_tokens = sum(self._count_tokens(self.chat_memory.messages))
+            return dict(self._stats, window_tokens=window_tokens, pending_messages=len(self._pending))
+
+    def to_state(self) -> dict:
+        """Serializable state (summary plus unsummarized messages) for persisting a session."""
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "messages": messages_to_dict(list(self._pending) + list(self.chat_memory.messages)),
+            }
+
+    def load_state(self, state: dict) -> None:
+        """Restores a state produced by `to_state`."""
+        with self._lock:
+            self.summary = state.get("summary", "")
+            self._pending.clear()
+            self.chat_memory.clear()
+            self.chat_memory.add_messages(messages_from_dict(state.get("messages", [])))
+
+    def clear(self) -> None:
+        with self._lock:
+            super().clear()
+            self._pending.clear()
+            self.summary = ""
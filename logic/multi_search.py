@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from logic.local_index import local_search
+from logic.search_agent import asearch, search
+from logic.telemetry import traced
+from logic.youtube_agent import asearch_youtube_videos, search_youtube_videos
+
+# --- Configuration ---
+# Each provider gets its own deadline, measured from the moment the fan-out starts.
+provider_timeouts = {
+    "web": float(os.getenv("TAVILY_TIMEOUT", 20)),
+    "videos": float(os.getenv("YOUTUBE_TIMEOUT", 10)),
+}
+max_workers = int(os.getenv("SEARCH_MAX_WORKERS", 8))
+
+# Shared across Streamlit sessions so a burst of searches doesn't spawn unbounded threads
+_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search")
+
+
+def _local_web_results(query):
+    """
+    The local index's answer in `search`'s (output, response time) format, or
+    None if local-first search is off or the index doesn't cover the query.
+    """
+    hits = local_search(query)
+    if hits is None:
+        return None
+    results = [{"title": hit["title"], "link": hit["url"], "content": hit["content"]} for hit in hits]
+    return {"query": query, "answer": None, "images": [], "results": results, "source": "local"}, 0.0
+
+
+def _web_provider(query):
+    """Runs the Tavily search, turning its None-on-failure into an error."""
+    local = _local_web_results(query)
+    if local is not None:
+        return local
+    output = search(query)
+    if output is None:
+        raise RuntimeError("returned no results")
+    return output
+
+
+async def _aweb_provider(query):
+    """Async counterpart of `_web_provider`."""
+    local = _local_web_results(query)
+    if local is not None:
+        return local
+    output = await asearch(query)
+    if output is None:
+        raise RuntimeError("returned no results")
+    return output
+
+
+# Provider name -> callable taking the query. Add new providers here.
+providers = {
+    "web": _web_provider,
+    "videos": search_youtube_videos,
+}
+
+# Provider name -> coroutine function taking the query, for the async path
+async_providers = {
+    "web": _aweb_provider,
+    "videos": asearch_youtube_videos,
+}
+
+
+def run_providers(query: str, selected: dict = None, timeouts: dict = None) -> tuple[dict, dict]:
+    """
+    Runs every provider concurrently and collects whatever finished in time.
+
+    Args:
+        query: The search term passed to each provider.
+        selected: Mapping of provider name to callable (defaults to `providers`).
+        timeouts: Mapping of provider name to timeout in seconds (defaults to `provider_timeouts`).
+
+    Returns:
+        A tuple (results, errors). `results` maps provider name to its return value
+        for every provider that succeeded; `errors` maps provider name to a readable
+        error message for every provider that failed or timed out.
+    """
+    selected = providers if selected is None else selected
+    timeouts = provider_timeouts if timeouts is None else timeouts
+
+    start = time.monotonic()
+    # Each provider runs in the caller's context, so it keeps the caller's upstream priority
+    # (and its current span, so each provider call is timed as a child of it)
+    futures = {
+        name: _executor.submit(contextvars.copy_context().run, traced("search", f"search.{name}")(fn), query)
+        for name, fn in selected.items()
+    }
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        timeout = timeouts.get(name, 15.0)
+        remaining = max(0.0, start + timeout - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            # The worker keeps running in the background; its result is simply dropped
+            future.cancel()
+            errors[name] = f"timed out after {timeout:g} seconds"
+        except Exception as e:
+            errors[name] = str(e)
+
+    return results, errors
+
+
+async def arun_providers(query: str, selected: dict = None, timeouts: dict = None) -> tuple[dict, dict]:
+    """
+    Async version of `run_providers`: awaits every provider concurrently on the event loop.
+
+    Takes a mapping of provider name to coroutine function (defaults to `async_providers`)
+    and returns the same (results, errors) tuple.
+    """
+    selected = async_providers if selected is None else selected
+    timeouts = provider_timeouts if timeouts is None else timeouts
+
+    async def run(name, fn):
+        timeout = timeouts.get(name, 15.0)
+        try:
+            return name, await asyncio.wait_for(traced("search", f"search.{name}")(fn)(query), timeout), None
+        except asyncio.TimeoutError:
+            return name, None, f"timed out after {timeout:g} seconds"
+        except Exception as e:
+            return name, None, str(e)
+
+    results, errors = {}, {}
+    for name, value, error in await asyncio.gather(*(run(name, fn) for name, fn in selected.items())):
+        if error is None:
+            results[name] = value
+        else:
+            errors[name] = error
+    return results, errors
+
+
+def _outcome(results: dict, errors: dict, start: float) -> dict:
+    web, response_time = results.get("web", (None, None))
+    return {
+        "web": web,
+        "response_time": response_time,
+        "videos": results.get("videos"),
+        "errors": errors,
+        "elapsed": time.monotonic() - start,
+    }
+
+
+def search_all(query: str) -> dict:
+    """
+    Searches the web and YouTube in parallel.
+
+    The total latency is that of the slowest provider (bounded by its timeout)
+    instead of the sum of both calls.
+
+    Returns:
+        A dictionary with 'web' (structured Tavily output or None), 'response_time'
+        (Tavily's own timing or None), 'videos' (list of videos or None),
+        'errors' (provider name -> message) and 'elapsed' (wall-clock seconds).
+    """
+    start = time.monotonic()
+    results, errors = run_providers(query)
+    return _outcome(results, errors, start)
+
+
+async def asearch_all(query: str) -> dict:
+    """Async version of `search_all`, returning the same dictionary."""
+    start = time.monotonic()
+    results, errors = await arun_providers(query)
+    return _outcome(results, errors, start)
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from logic.search_cache import normalize_query
+
+# --- Configuration ---
+# Past queries a session remembers for suggestions; the least recently searched are forgotten first
+query_suggest_max = int(os.getenv("QUERY_SUGGEST_MAX", 500))
+query_suggest_count = int(os.getenv("QUERY_SUGGEST_COUNT", 5))
+
+
+class _Node:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.entry = None  # [query as typed, times searched, last searched at] at the end of a query
+
+
+class QueryTrie:
+    """
+    A prefix index (trie) of past search queries, for suggestions while typing.
+
+    Queries are keyed by their normalized form (see search_cache.normalize_query),
+    so "Python  tutorial?" and "python tutorial" are one entry. Completions are
+    ranked by how often, then how recently, a query was searched. At most
+    `max_queries` are kept.
+    """
+
+    def __init__(self, max_queries: int = 500):
+        self.max_queries = max_queries
+        self._root = _Node()
+        self._recent: "OrderedDict[str, _Node]" = OrderedDict()  # Least recently searched first
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def add(self, query: str) -> None:
+        """Records that `query` was searched."""
+        key = normalize_query(query)
+        if not key:
+            return
+        with self._lock:
+            node = self._root
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+            if node.entry is None:
+                node.entry = [query.strip(), 0, 0.0]
+            node.entry[0] = query.strip()
+            node.entry[1] += 1
+            node.entry[2] = time.time()
+            self._recent[key] = node
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_queries:
+                self._remove(next(iter(self._recent)))
+
+    def _remove(self, key: str) -> None:
+        del self._recent[key]
+        path = [self._root]
+        for char in key:
+            path.append(path[-1].children[char])
+        path[-1].entry = None
+        # Prune the branch back up to the nearest node still in use
+        for parent, char, node in zip(reversed(path[:-1]), reversed(key), reversed(path[1:])):
+            if node.children or node.entry is not None:
+                break
+            del parent.children[char]
+
+    def complete(self, prefix: str, k: int = 5) -> list[str]:
+        """
+        Up to `k` past queries starting with `prefix`, most often and most recently searched first.
+
+        An empty prefix returns the overall most searched queries.
+        """
+        key = normalize_query(prefix)
+        # "python " normalizes to "python"; keep the space so "pythonic" isn't suggested
+        if key and prefix[-1:].isspace():
+            key += " "
+        with self._lock:
+            node = self._root
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            entries, stack = [], [node]
+            while stack:
+                node = stack.pop()
+                if node.entry is not None:
+                    entries.append(tuple(node.entry))
+                stack.extend(node.children.values())
+        entries.sort(key=lambda entry: (entry[1], entry[2]), reverse=True)
+        return [entry[0] for entry in entries[:k]]
+
+
+def suggest(trie: QueryTrie, prefix: str, k: int = query_suggest_count) -> list[str]:
+    """
+    Past queries of `trie` completing `prefix`, excluding `prefix` itself.
+
+    Nothing is suggested for an empty prefix, so an idle search box doesn't
+    list what was searched before.
+    """
+    key = normalize_query(prefix)
+    if not key:
+        return []
+    return [query for query in trie.complete(prefix, k + 1) if normalize_query(query) != key][:k]
@@ -0,0 +1,460 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+# --- Priorities ---
+# Lower runs first: a user waiting in the chat beats batch and background work
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# The priority of upstream calls made from the current context (thread or task)
+current_priority: contextvars.ContextVar[int] = contextvars.ContextVar("upstream_priority", default=INTERACTIVE)
+
+# HTTP statuses worth retrying: throttling and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Provider SDK errors that don't carry a status code but mean one of the above
+_STATUS_BY_ERROR_NAME = {
+    "UsageLimitExceededError": 429,  # Tavily
+    "ResourceExhausted": 429,  # Gemini (google.api_core)
+    "TooManyRequests": 429,
+    "ServiceUnavailable": 503,
+    "InternalServerError": 500,
+    "DeadlineExceeded": 504,
+}
+# Network-level errors of clients that don't derive them from OSError (httpx)
+_TRANSIENT_ERROR_NAMES = {"ConnectError", "ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout",
+                          "ReadError", "RemoteProtocolError"}
+
+
+class UpstreamUnavailableError(RuntimeError):
+    """An upstream provider can't be used right now (throttled, failing or circuit open)."""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Calls to a provider are short-circuited after repeated failures."""
+
+
+@contextmanager
+def priority(level: int):
+    """Runs the upstream calls made inside the block at `level` (e.g. BACKGROUND)."""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def _parse_retry_after(value) -> Optional[float]:
+    """Parses a Retry-After header: delta-seconds or an HTTP date."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    import email.utils
+
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_and_headers(error: BaseException) -> tuple[Optional[int], Any]:
+    """The HTTP status a provider answered with (None if it didn't answer), and the response headers."""
+    status, headers = None, {}
+    if getattr(error, "resp", None) is not None:
+        status, headers = getattr(error.resp, "status", None), error.resp
+    elif getattr(error, "response", None) is not None:
+        response = error.response
+        status = getattr(response, "status_code", None)
+        headers = getattr(response, "headers", None) or {}
+    elif isinstance(getattr(error, "code", None), int):
+        status = error.code
+    return status or _STATUS_BY_ERROR_NAME.get(type(error).__name__), headers
+
+
+def retry_info(error: BaseException) -> tuple[bool, Optional[float]]:
+    """
+    Classifies an upstream error.
+
+    Understands googleapiclient HttpError (`resp`), requests/httpx errors
+    (`response`), google.api_core errors (`code`) and the provider SDK errors in
+    `_STATUS_BY_ERROR_NAME`; network errors and timeouts (OSError, which includes
+    requests' errors, and httpx's transport errors) are retryable too.
+
+    Returns:
+        (whether the call is worth retrying, the server's Retry-After in seconds or None)
+    """
+    status, headers = _status_and_headers(error)
+    try:
+        retry_after = _parse_retry_after(headers.get("retry-after") or headers.get("Retry-After"))
+    except AttributeError:
+        retry_after = None
+
+    if status is not None:
+        return int(status) in RETRYABLE_STATUSES, retry_after
+    transient = isinstance(error, (OSError, asyncio.TimeoutError)) or type(error).__name__ in _TRANSIENT_ERROR_NAMES
+    return transient, retry_after
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. Not thread-safe on its own."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> float:
+        """Takes a token if there is one; returns 0.0, or the seconds until the next token."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PriorityTokenBucket:
+    """
+    A token bucket whose waiters are served by priority, then in arrival order.
+
+    A waiter only takes a token once it is at the head of the queue, so
+    background work can never overtake a waiting interactive call.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self._waiters: list[tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def acquire(self, level: int = INTERACTIVE, timeout: Optional[float] = None) -> bool:
+        """Waits for a token; returns False if none was granted within `timeout` seconds."""
+        ticket = (level, next(self._sequence))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters[0] == ticket:
+                        wait = self.bucket.try_take()
+                        if wait == 0.0:
+                            return True
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                # The next waiter may be able to go now
+                self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after `failure_threshold` consecutive failures.
+
+    While open, calls fail immediately instead of costing a timeout each. After
+    `reset_timeout` seconds one trial call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        # When the half-open trial call was let through; a trial that never reports back expires
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> Optional[float]:
+        """Returns None if a call may proceed, else the seconds until the next trial call."""
+        with self._lock:
+            if self.opened_at is None:
+                return None
+            now = time.monotonic()
+            remaining = self.opened_at + self.reset_timeout - now
+            trial_running = self._trial_started is not None and now - self._trial_started < self.reset_timeout
+            if remaining <= 0 and not trial_running:
+                self._trial_started = now
+                return None
+            return max(remaining, 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            trial_failed = self._trial_started is not None
+            if trial_failed or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.warning(f"Circuit opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+            self._trial_started = None
+
+
+class UpstreamLimiter:
+    """
+    Client-side rate control for one upstream provider.
+
+    Every call takes a token from its API key's bucket (waiting by priority),
+    is retried with jittered exponential backoff on throttling and transient
+    errors (never sooner than the server's Retry-After), and goes through the
+    provider's circuit breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        max_wait: float = 30.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        """
+        Args:
+            name: Provider name, used in errors and stats.
+            rate: Requests per second allowed per API key.
+            burst: Requests that may be made at once after an idle period.
+            max_retries: Retries after the first attempt of a retryable failure.
+            base_delay: Backoff before the first retry; doubles with every retry.
+            max_delay: Upper bound for a single backoff (and for honoring Retry-After).
+            max_wait: Seconds a call may wait for a token before giving up.
+            failure_threshold: Consecutive failures that open the circuit.
+            reset_timeout: Seconds the circuit stays open before a trial call.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._buckets: dict[str, PriorityTokenBucket] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled_waits": 0, "retries": 0, "failures": 0, "short_circuited": 0}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._stats[counter] += 1
+
+    def _bucket(self, api_key: Optional[str]) -> PriorityTokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(api_key or "")
+            if bucket is None:
+                bucket = self._buckets[api_key or ""] = PriorityTokenBucket(self.rate, self.burst)
+            return bucket
+
+    def _check_circuit(self) -> None:
+        retry_in = self.breaker.allow()
+        if retry_in is not None:
+            self._count("short_circuited")
+            raise CircuitOpenError(f"{self.name} is unavailable after repeated failures; retrying in {retry_in:.1f}s")
+
+    def acquire(self, api_key: Optional[str] = None) -> None:
+        """
+        Waits for the circuit and a token, at the current context's priority.
+
+        Raises:
+            CircuitOpenError: If the circuit is open.
+            UpstreamUnavailableError: If no token was granted within `max_wait`.
+        """
+        self._check_circuit()
+        start = time.monotonic()
+        if not self._bucket(api_key).acquire(current_priority.get(), timeout=self.max_wait):
+            raise UpstreamUnavailableError(f"{self.name} rate limit: no capacity within {self.max_wait:g}s")
+        if time.monotonic() - start > 0.001:
+            self._count("throttled_waits")
+        self._count("calls")
+
+    async def aacquire(self, api_key: Optional[str] = None) -> None:
+        """Async version of `acquire`; waits in a worker thread, not on the event loop."""
+        await asyncio.to_thread(self.acquire, api_key)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return min(self.max_delay, max(delay, retry_after or 0.0))
+
+    def _failed(self, error: Exception, attempt: int) -> Optional[float]:
+        """Records a failed attempt; returns the delay before retrying, or None to give up."""
+        retryable, retry_after = retry_info(error)
+        if not retryable:
+            # e.g. a bad request or invalid key: the provider itself is fine
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.max_retries or self.breaker.state == "open":
+            self._count("failures")
+            return None
+        self._count("retries")
+        delay = self._backoff(attempt, retry_after)
+        logging.info(f"{self.name} call failed ({error!r}); retry {attempt + 1} in {delay:.2f}s")
+        return delay
+
+    def _give_up(self, error: Exception) -> Exception:
+        if retry_info(error)[0]:
+            return UpstreamUnavailableError(f"{self.name} is unavailable: {error}")
+        return error
+
+    def call(self, fn: Callable[..., Any], *args, api_key: Optional[str] = None, **kwargs) -> Any:
+        """
+        Calls `fn(*args, **kwargs)` under the limiter.
+
+        Raises:
+            UpstreamUnavailableError: If throttling or transient errors persist
+                past the retries, or the circuit is open.
+            Exception: Non-retryable errors from `fn`, unchanged.
+        """
+        for attempt in itertools.count():
+            self.acquire(api_key)
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, fn: Callable[..., Any], *args, api_key: Optional[str] = None, **kwargs) -> Any:
+        """Async version of `call`; `fn` is a coroutine function."""
+        for attempt in itertools.count():
+            await self.aacquire(api_key)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise self._give_up(e) from e
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        """Call, wait, retry and failure counters, and the circuit state."""
+        with self._lock:
+            return {**self._stats, "circuit": self.breaker.state}
+
+
+def _limiter_from_env(name: str, env_prefix: str, rate: float, burst: float) -> UpstreamLimiter:
+    return UpstreamLimiter(
+        name,
+        rate=float(os.getenv(f"{env_prefix}_RATE", rate)),
+        burst=float(os.getenv(f"{env_prefix}_BURST", burst)),
+        max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", 3)),
+        failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30)),
+    )
+
+
+# --- Shared Limiters ---
+# Rates are requests per second per API key; set them to your plan's quota.
+# Tavily and YouTube calls go through `call`/`acall`. Gemini calls only take tokens
+# and feed the breaker (see the LangChain adapters below); they are retried by the
+# langchain-google-genai SDK's own retry, not with this module's backoff.
+limiters = {
+    "tavily": _limiter_from_env("Tavily", "TAVILY", rate=5, burst=10),
+    "youtube": _limiter_from_env("YouTube", "YOUTUBE", rate=5, burst=10),
+    "gemini": _limiter_from_env("Gemini", "GEMINI", rate=4, burst=10),
+}
+
+
+def stats() -> dict:
+    """Limiter stats per provider."""
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+@functools.cache
+def _langchain_adapter_classes():
+    """
+    Defines the LangChain adapters on first use, so importing this module
+    doesn't pay for the langchain_core import.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.rate_limiters import BaseRateLimiter
+
+    class LimiterRateLimiter(BaseRateLimiter):
+        """Lets a LangChain chat model take its tokens from an UpstreamLimiter."""
+
+        def __init__(self, limiter: UpstreamLimiter, api_key: Optional[str] = None):
+            self.limiter = limiter
+            self.api_key = api_key
+
+        def acquire(self, *, blocking: bool = True) -> bool:
+            self.limiter.acquire(self.api_key)
+            return True
+
+        async def aacquire(self, *, blocking: bool = True) -> bool:
+            await self.limiter.aacquire(self.api_key)
+            return True
+
+    class CircuitBreakerCallback(BaseCallbackHandler):
+        """Feeds a chat model's call outcomes into the limiter's circuit breaker."""
+
+        def __init__(self, limiter: UpstreamLimiter):
+            self.limiter = limiter
+
+        def on_llm_end(self, response, **kwargs) -> None:
+            self.limiter.breaker.record_success()
+
+        def on_llm_error(self, error: BaseException, **kwargs) -> None:
+            if isinstance(error, UpstreamUnavailableError):
+                # Raised by the limiter itself (circuit open, no token): Gemini wasn't called
+                return
+            if retry_info(error)[0]:
+                self.limiter.breaker.record_failure()
+            elif _status_and_headers(error)[0] is not None:
+                # e.g. a rejected request: Gemini answered, so it is fine (and a half-open trial is over)
+                self.limiter.breaker.record_success()
+
+    return LimiterRateLimiter, CircuitBreakerCallback
+
+
+def langchain_rate_limiter(limiter: UpstreamLimiter, api_key: Optional[str] = None):
+    """A langchain_core BaseRateLimiter backed by `limiter`, for a chat model's `rate_limiter`."""
+    return _langchain_adapter_classes()[0](limiter, api_key)
+
+
+def circuit_breaker_callback(limiter: UpstreamLimiter):
+    """A callback handler recording a chat model's successes and failures in `limiter`'s breaker."""
+    return _langchain_adapter_classes()[1](limiter)
@@ -0,0 +1,136 @@
+import logging
+import re
+import threading
+from typing import Any, AsyncIterator, Callable, Optional
+
+from logic.semantic_cache import is_follow_up
+from logic.telemetry import langchain_callback
+
+
+class RouteRule:
+    """
+    Sends prompts matching a pattern straight to one tool, skipping the agent loop.
+
+    With an `answer_template`, the tool's output and the prompt are handed to the
+    LLM for a single call that writes the answer; without one, the tool's output
+    is the answer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tool: str,
+        pattern: str,
+        tool_input: Callable[[re.Match], dict],
+        answer_template: Optional[str] = None,
+        max_words: Optional[int] = None,
+        allow_follow_ups: bool = False,
+    ):
+        """
+        Args:
+            name: The route's name, used in the latency counters.
+            tool: Name of the tool to call.
+            pattern: Regex searched in the prompt (case-insensitive).
+            tool_input: Builds the tool's arguments from the pattern's match.
+            answer_template: Prompt with {input} and {observation} for the single LLM call.
+            max_words: Longer prompts are left to the agent.
+            allow_follow_ups: Whether prompts referring to earlier turns ("search for it") match.
+        """
+        self.name = name
+        self.tool = tool
+        self.pattern = re.compile(pattern, re.IGNORECASE)
+        self.tool_input = tool_input
+        self.answer_template = answer_template
+        self.max_words = max_words
+        self.allow_follow_ups = allow_follow_ups
+
+    def match(self, prompt: str) -> Optional[dict]:
+        """Returns the tool's arguments if `prompt` is for this route, else None."""
+        if self.max_words is not None and len(prompt.split()) > self.max_words:
+            return None
+        if not self.allow_follow_ups and is_follow_up(prompt):
+            return None
+        match = self.pattern.search(prompt)
+        return self.tool_input(match) if match else None
+
+
+class Router:
+    """
+    A cheap, local pre-dispatch step in front of the agent.
+
+    Rules are tried in order and the first match wins; prompts that match no
+    rule (or whose tool is not available) go to the agent loop.
+    """
+
+    def __init__(self, rules: Optional[list[RouteRule]] = None):
+        self.rules = list(rules or [])
+
+    def add_rule(self, rule: RouteRule) -> None:
+        self.rules.append(rule)
+
+    def match(self, prompt: str, tools: list) -> Optional[tuple[RouteRule, Any, dict]]:
+        """
+        Finds the route for `prompt`.
+
+        Returns:
+            (rule, tool, tool arguments), or None if the agent should handle the prompt.
+        """
+        tools_by_name = {tool.name: tool for tool in tools}
+        for rule in self.rules:
+            tool = tools_by_name.get(rule.tool)
+            if tool is None:
+                continue
+            tool_input = rule.match(prompt)
+            if tool_input is not None:
+                return rule, tool, tool_input
+        return None
+
+
+async def astream_route(rule: RouteRule, tool, tool_input: dict, prompt: str, llm) -> AsyncIterator[tuple[str, object]]:
+    """
+    Runs a routed turn and yields the same (kind, payload) events as
+    logic.chat_stream.astream_agent_events, so callers render both alike.
+    """
+    from langchain_core.agents import AgentAction
+
+    try:
+        yield "action", AgentAction(tool=tool.name, tool_input=tool_input, log="")
+        config = {"callbacks": [langchain_callback()]}
+        observation = str(await tool.ainvoke(tool_input, config=config))
+        yield "observation", observation
+        if rule.answer_template is None:
+            yield "token", observation
+            yield "output", observation
+            return
+        answer = ""
+        async for chunk in llm.astream(rule.answer_template.format(input=prompt, observation=observation), config=config):
+            if chunk.content:
+                answer += chunk.content
+                yield "token", chunk.content
+        yield "output", answer.strip()
+    except Exception as e:
+        yield "error", e
+
+
+class RouteStats:
+    """Turn counts and latency per route ("agent", "cache" or a rule's name)."""
+
+    def __init__(self):
+        self._routes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, seconds: float) -> None:
+        with self._lock:
+            counters = self._routes.setdefault(route, {"turns": 0, "total_s": 0.0, "max_s": 0.0})
+            counters["turns"] += 1
+            counters["total_s"] += seconds
+            counters["max_s"] = max(counters["max_s"], seconds)
+        logging.info(f"Turn answered via {route} in {seconds:.2f}s")
+
+    def stats(self) -> dict:
+        """Per route: turns, total/mean/max seconds."""
+        with self._lock:
+            return {
+                route: {**counters, "mean_s": counters["total_s"] / counters["turns"]}
+                for route, counters in self._routes.items()
+            }
@@ -1,60 +1,115 @@
+from __future__ import annotations
+
 import os
 import dotenv
-from tavily import TavilyClient
+from typing import TYPE_CHECKING
+from logic.local_index import index_results
+from logic.rate_limit import UpstreamUnavailableError, limiters
+from logic.search_cache import cached
+
+# The Tavily SDK (and httpx/requests behind it) is imported on first use
+if TYPE_CHECKING:
+    from tavily import AsyncTavilyClient, TavilyClient
 
 # It's good practice to handle potential missing environment variables
 dotenv.load_dotenv(".env")
 tavily_api_key = os.getenv("TAVILY_API_KEY")
 
-if not tavily_api_key:
-    raise ValueError("TAVILY_API_KEY not found in environment variables or .env file.")
+# The Tavily clients are created on first use, so importing this module never
+# fails; benchmarks can also assign fake clients to these names.
+client = None
+async_client = None
+
+
+def get_client() -> TavilyClient:
+    """Returns the Tavily client, creating it on first use."""
+    global client
+    if client is None:
+        if not tavily_api_key:
+            raise ValueError("TAVILY_API_KEY not found in environment variables or .env file.")
+        from tavily import TavilyClient
+
+        client = TavilyClient(api_key=tavily_api_key)
+    return client
+
+
+def get_async_client() -> AsyncTavilyClient:
+    """Returns the async Tavily client, creating it on first use."""
+    global async_client
+    if async_client is None:
+        if not tavily_api_key:
+            raise ValueError("TAVILY_API_KEY not found in environment variables or .env file.")
+        from tavily import AsyncTavilyClient
+
+        async_client = AsyncTavilyClient(api_key=tavily_api_key)
+    return async_client
+
+# Parameters shared by the sync and async search paths
+search_params = dict(
+    search_depth="advanced", # Often gives better structured results
+    num_results=10,
+    include_answer=True,
+    include_images=True,
+)
+
+
+def _structure_results(results_dict):
+    """
+    Turns a raw Tavily response into the (structured output, response time) tuple returned by `search`.
+    """
+    # Extract the LIST of individual search results using .get() for safety
+    individual_results_list = results_dict.get("results", [])
+    response_time = results_dict.get("response_time", "N/A") # Optional: Get response time
+
+    # Process each individual result item from the list
+    extracted_results = []
+    for result_item in individual_results_list: # Iterate over the LIST
+        extracted_result = {
+            # Use .get() on each item dictionary for safety
+            "title": result_item.get("title", "N/A"),
+            "link": result_item.get("url", "N/A"),
+            "content": result_item.get("content", "N/A"),
+            # Note: 'answer' and 'images' are typically top-level, not per-result.
+            # If Tavily *does* provide per-result images/context, adjust here.
+            # Example: "score": result_item.get("score")
+        }
+        extracted_results.append(extracted_result)
+
+    # Create the final structured output, including top-level info
+    final_output = {
+        "query": results_dict.get("query"),
+        "answer": results_dict.get("answer"), # Get the main answer
+        "images": results_dict.get("images", []), # Get top-level images
+        "results": extracted_results # The list of processed individual results
+    }
+
+    return final_output, response_time # Return the structured dictionary with response time
 
-# Initialize the Tavily client
-client = TavilyClient(api_key=tavily_api_key)
 
 # Define the search function
+@cached("tavily")
 def search(query):
     """
     Search for the given query using the Tavily API and return structured results.
+
+    Results are cached by normalized query (see logic.search_cache), so repeated
+    searches don't pay for another "advanced" Tavily call, and added to the
+    local search index (see logic.local_index). Calls go through the shared
+    Tavily rate limiter, which retries throttled requests.
+
+    Raises:
+        UpstreamUnavailableError: If Tavily keeps throttling or failing.
     """
     try:
         # Perform the search - this returns a DICTIONARY
-        results_dict = client.search(
-            query,
-            search_depth="advanced", # Often gives better structured results
-            num_results=10,
-            include_answer=True,
-            include_images=True,
-        )
-
-        # Extract the LIST of individual search results using .get() for safety
-        individual_results_list = results_dict.get("results", [])
-        response_time = results_dict.get("response_time", "N/A") # Optional: Get response time
-
-        # Process each individual result item from the list
-        extracted_results = []
-        for result_item in individual_results_list: # Iterate over the LIST
-            extracted_result = {
-                # Use .get() on each item dictionary for safety
-                "title": result_item.get("title", "N/A"),
-                "link": result_item.get("url", "N/A"),
-                "content": result_item.get("content", "N/A"),
-                # Note: 'answer' and 'images' are typically top-level, not per-result.
-                # If Tavily *does* provide per-result images/context, adjust here.
-                # Example: "score": result_item.get("score")
-            }
-            extracted_results.append(extracted_result)
-
-        # Create the final structured output, including top-level info
-        final_output = {
-            "query": results_dict.get("query"),
-            "answer": results_dict.get("answer"), # Get the main answer
-            "images": results_dict.get("images", []), # Get top-level images
-            "results": extracted_results # The list of processed individual results
-        }
-
-        return final_output, response_time # Return the structured dictionary with response time
+        results_dict = limiters["tavily"].call(get_client().search, query, api_key=tavily_api_key, **search_params)
+        structured = _structure_results(results_dict)
+        index_results(structured[0]["results"])
+        return structured
 
+    except UpstreamUnavailableError:
+        # Let the caller say why instead of showing an empty result
+        raise
     except Exception as e:
         print(f"An error occurred during Tavily search: {e}")
         # Optional: Log the full traceback for more detailed debugging
@@ -62,6 +117,26 @@ def search(query):
         # traceback.print_exc()
         return None
 
+
+@cached("tavily")
+async def asearch(query):
+    """
+    Async version of `search`, using Tavily's native async client.
+
+    Shares the cache with `search`, so either one can serve the other's results.
+    """
+    try:
+        results_dict = await limiters["tavily"].acall(get_async_client().search, query, api_key=tavily_api_key, **search_params)
+        structured = _structure_results(results_dict)
+        index_results(structured[0]["results"])
+        return structured
+
+    except UpstreamUnavailableError:
+        raise
+    except Exception as e:
+        print(f"An error occurred during Tavily search: {e}")
+        return None
+
 # Example usage
 if __name__ == "__main__":
     query = "What is the capital of India?"
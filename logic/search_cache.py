@@ -0,0 +1,261 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlsplit
+
+from logic.singleflight import SingleFlight
+
+# --- Configuration ---
+cache_ttl = float(os.getenv("SEARCH_CACHE_TTL", 3600))
+cache_size = int(os.getenv("SEARCH_CACHE_SIZE", 256))
+# Optional: path to a SQLite file so cached results survive restarts
+cache_db_path = os.getenv("SEARCH_CACHE_DB")
+
+# Returned by cache lookups on a miss (None is never stored, but could be confused with a value)
+MISS = object()
+
+
+# Punctuation that only frames a word: dropped from its start or end by `normalize_query`
+_LEADING_PUNCT = "\"'([{¿¡“‘«"
+_TRAILING_PUNCT = "?!.,;:\"')]}”’»"
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query so trivially different spellings share a cache entry.
+
+    Lowercases, collapses whitespace and strips quotes, brackets and sentence
+    punctuation from the edges of words:
+    "  What is   the Capital of India? " -> "what is the capital of india"
+
+    Symbols that change a query's meaning are kept, so "C++ tutorial", "C#
+    tutorial" and "C tutorial", or "-5 + 3" and "5 + 3", stay distinct.
+    """
+    words = (word.lstrip(_LEADING_PUNCT).rstrip(_TRAILING_PUNCT) for word in query.casefold().split())
+    return " ".join(word for word in words if word)
+
+
+def normalize_url(url: str) -> str:
+    """Reduces a URL to what identifies the page: no scheme, "www.", fragment or trailing slash."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+class TTLCache:
+    """A thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISS
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return MISS
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (expires_at or time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """An on-disk cache tier backed by SQLite; values are stored as JSON."""
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # One shared connection; the lock serializes access from Streamlit's threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+
+    def get(self, key: str) -> tuple[Any, float]:
+        """Returns (value, expires_at), or (MISS, 0) if the key is absent or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM search_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return MISS, 0.0
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl),
+            )
+
+
+class SearchCache:
+    """
+    Two-tier result cache: an in-memory LRU with TTL, optionally backed by SQLite.
+
+    Disk hits are promoted into memory. Hit/miss counters are kept per namespace
+    (e.g. 'tavily', 'youtube', 'tavily_tool').
+    """
+
+    def __init__(self, maxsize: int, ttl: float, db_path: Optional[str] = None):
+        self.memory = TTLCache(maxsize, ttl)
+        self.disk = SQLiteCache(db_path, ttl) if db_path else None
+        self._counters: dict[str, dict[str, int]] = {}
+        self._counter_lock = threading.Lock()
+
+    def _count(self, namespace: str, outcome: str) -> None:
+        with self._counter_lock:
+            counters = self._counters.setdefault(namespace, {"hits": 0, "disk_hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, namespace: str, key: str) -> Any:
+        value = self.memory.get(key)
+        if value is not MISS:
+            self._count(namespace, "hits")
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get(key)
+            if value is not MISS:
+                self.memory.set(key, value, expires_at)
+                self._count(namespace, "disk_hits")
+                return value
+        self._count(namespace, "misses")
+        return MISS
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logging.warning(f"Could not write search cache entry to disk: {e}")
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters per namespace plus the number of entries in memory."""
+        with self._counter_lock:
+            counters = {namespace: dict(values) for namespace, values in self._counters.items()}
+        return {"namespaces": counters, "memory_entries": len(self.memory)}
+
+
+# Shared by the search page and the agent's search tool
+search_cache = SearchCache(cache_size, cache_ttl, cache_db_path)
+
+# Concurrent misses for the same key (e.g. many users searching a trending term)
+# share one upstream request instead of each paying for it
+search_flights = SingleFlight()
+
+
+def fetch(namespace: str, key: str, fn: Callable[[], Any], should_store: Callable[[Any], bool] = bool,
+          lookup: Optional[Callable[[], Any]] = None) -> Any:
+    """
+    Returns the cached value for `key`, or runs `fn()` once for all concurrent callers.
+
+    Args:
+        namespace: Name used for the hit/miss and coalescing counters.
+        key: Cache key (see `make_key`).
+        fn: Fetches the value from upstream on a miss.
+        should_store: Decides whether a fetched value is cached (default: only truthy values).
+        lookup: Custom cache lookup returning MISS on a miss (default: `key` in `namespace`).
+    """
+    value = lookup() if lookup else search_cache.get(namespace, key)
+    if value is not MISS:
+        return value
+
+    def fetch_and_store():
+        value = fn()
+        if should_store(value):
+            search_cache.set(key, value)
+        return value
+
+    return search_flights.do(namespace, key, fetch_and_store)
+
+
+async def afetch(namespace: str, key: str, fn: Callable[[], Awaitable[Any]],
+                 should_store: Callable[[Any], bool] = bool, lookup: Optional[Callable[[], Any]] = None) -> Any:
+    """Async version of `fetch`; `fn` is a coroutine function."""
+    value = lookup() if lookup else search_cache.get(namespace, key)
+    if value is not MISS:
+        return value
+
+    async def fetch_and_store():
+        value = await fn()
+        if should_store(value):
+            search_cache.set(key, value)
+        return value
+
+    return await search_flights.ado(namespace, key, fetch_and_store)
+
+
+def stats() -> dict:
+    """Cache hit/miss counters and single-flight coalescing counters."""
+    return dict(search_cache.stats(), coalescing=search_flights.stats())
+
+
+def make_key(namespace: str, query: str, *params: Any) -> str:
+    """Builds a cache key from the normalized query and any result-shaping parameters."""
+    return json.dumps([namespace, normalize_query(query), *params], default=str)
+
+
+def cached(namespace: str, ignore: tuple[str, ...] = ()) -> Callable:
+    """
+    Decorator caching a search function (sync or async) whose first argument is the query.
+
+    Falsy results (None, empty lists) are never cached, so failed or empty
+    searches are retried on the next call. Concurrent calls for the same
+    normalized query share a single upstream request.
+
+    Args:
+        namespace: Name used for the key prefix and the hit/miss counters.
+        ignore: Arguments left out of the key (e.g. API keys).
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        def key_for(query: str, args: tuple, kwargs: dict) -> str:
+            # Bind with defaults so f(q) and f(q, max_results=10) share an entry
+            bound = signature.bind(query, *args, **kwargs)
+            bound.apply_defaults()
+            params = [(k, v) for k, v in list(bound.arguments.items())[1:] if k not in ignore]
+            return make_key(namespace, query, params)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(query: str, *args, **kwargs):
+                key = key_for(query, args, kwargs)
+                return await afetch(namespace, key, lambda: fn(query, *args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(query: str, *args, **kwargs):
+            key = key_for(query, args, kwargs)
+            return fetch(namespace, key, lambda: fn(query, *args, **kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,49 @@
+import os
+
+# --- Configuration ---
+# How many items of each kind are rendered before the user asks for more
+page_sizes = {
+    "images": int(os.getenv("SEARCH_PAGE_IMAGES", 6)),
+    "videos": int(os.getenv("SEARCH_PAGE_VIDEOS", 5)),
+    "web": int(os.getenv("SEARCH_PAGE_WEB", 5)),
+}
+
+
+def build_view_model(query: str, outcome: dict) -> dict:
+    """
+    Computes everything the search page renders from one `search_all` outcome.
+
+    Done once per query, so reruns (switching views, "load more") only render
+    instead of re-deriving the results.
+
+    Args:
+        query: The search query the outcome belongs to.
+        outcome: The dictionary returned by logic.multi_search.search_all.
+
+    Returns:
+        A dictionary with 'query', 'answer', 'images', 'videos', 'web' (lists, possibly
+        empty), 'web_ran'/'videos_ran' (whether that provider returned at all), 'web_source',
+        'errors' (provider name -> message) and 'elapsed' (seconds).
+    """
+    web = outcome.get("web") or {}
+    videos = outcome.get("videos")
+    return {
+        "query": query,
+        "answer": web.get("answer"),
+        "images": list(web.get("images") or []),
+        "videos": list(videos or []),
+        "web": web.get("results") or [],
+        "web_ran": outcome.get("web") is not None,
+        # "local" when the local index answered instead of Tavily
+        "web_source": web.get("source", "tavily"),
+        "videos_ran": videos is not None,
+        "errors": outcome.get("errors", {}),
+        "elapsed": outcome.get("elapsed", 0.0),
+    }
+
+
+def visible_items(items: list, shown: int) -> tuple[list, bool]:
+    """
+    Returns the first `shown` items and whether there are more to load.
+    """
+    return items[:shown], len(items) > shown
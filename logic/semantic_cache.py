@@ -0,0 +1,251 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from typing import Callable, Optional, Sequence
+
+# --- Configuration ---
+# Off by default: answers are shared by every session
+semantic_cache_enabled = os.getenv("SEMANTIC_CACHE", "0") not in ("0", "false", "off")
+# "hashing" (local, offline) or "google" (Gemini text embeddings, needs GOOGLE_API_KEY)
+semantic_cache_embedder = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashing")
+# Minimum cosine similarity for a cached answer to be reused; tune it per embedder
+semantic_cache_threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.85))
+semantic_cache_ttl = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+# Answers to time-sensitive prompts (weather, news, prices...) expire much sooner
+semantic_cache_volatile_ttl = float(os.getenv("SEMANTIC_CACHE_VOLATILE_TTL", 300))
+semantic_cache_size = int(os.getenv("SEMANTIC_CACHE_SIZE", 512))
+
+# Prompts whose answer changes over time
+_TIME_SENSITIVE = re.compile(
+    r"\b(today|tonight|now|currently|current|latest|recent|news|weather|forecast|"
+    r"price|prices|stock|score|scores|live|yesterday|tomorrow|this (week|month|year))\b",
+    re.IGNORECASE,
+)
+# Follow-ups only make sense with the conversation that preceded them
+_FOLLOW_UP = re.compile(
+    r"\b(it|its|that|those|these|they|them|he|she|him|her|again|more|another|above|previous)\b",
+    re.IGNORECASE,
+)
+
+# About the user or the assistant: the answer belongs to one conversation
+_PERSONAL = re.compile(r"\b(i|me|my|mine|myself|you|your|yours|we|us|our)\b", re.IGNORECASE)
+
+# Carry almost no meaning; left out so "capital of France" and "capital of Germany" don't look alike
+_STOPWORDS = frozenset(
+    "a an the is are was were be been am do does did of in on at to for from by with about "
+    "and or what whats what's which who whom how when where why please can could would you me "
+    "i my tell show give find s".split()
+)
+
+# Stopwords that still tell prompts apart ("my name" is not "your name")
+_PRONOUNS = frozenset("i my me you".split())
+
+Embedder = Callable[[str], Sequence[float]]
+
+
+def content_words(text: str) -> list[str]:
+    """Lowercased words of `text`, without stopwords."""
+    return [w for w in re.findall(r"\w+", text.casefold()) if w not in _STOPWORDS]
+
+
+def key_words(text: str) -> list[str]:
+    """Like `content_words`, but keeping pronouns: the words a cached prompt is matched on."""
+    return [w for w in re.findall(r"\w+", text.casefold()) if w not in _STOPWORDS or w in _PRONOUNS]
+
+
+def same_order(words: Sequence[str], other: Sequence[str]) -> bool:
+    """
+    Whether two prompts use their shared words in the same order and the same numbers.
+
+    Similar embeddings ignore word order, yet "convert 5 usd to inr" and
+    "convert 5 inr to usd" (or "5 usd" and "50 usd") need different answers.
+    """
+    if {w for w in words if w.isdigit()} != {w for w in other if w.isdigit()}:
+        return False
+    shared = set(words).intersection(other)
+    return [w for w in dict.fromkeys(words) if w in shared] == [w for w in dict.fromkeys(other) if w in shared]
+
+
+class HashingEmbedder:
+    """
+    A local, dependency-free embedding: hashed content-word unigrams/bigrams and character trigrams.
+
+    Good at catching rephrasings that share most of their words ("weather Pune
+    today" / "what's the weather in Pune"), deterministic and offline, which also
+    makes it the embedder for tests and benchmarks.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> tuple[int, float]:
+        digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def __call__(self, text: str) -> list[float]:
+        words = key_words(text)
+        features = [(f"w:{w}", 1.0) for w in words]
+        features += [(f"b:{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [(f"c:{padded[i:i + 3]}", 0.25) for i in range(len(padded) - 2)]
+
+        vector = [0.0] * self.dim
+        for feature, weight in features:
+            index, sign = self._bucket(feature)
+            vector[index] += sign * weight
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+
+def build_embedder(name: str = semantic_cache_embedder) -> Embedder:
+    """
+    Returns the embedding function called `name`.
+
+    Raises:
+        ValueError: For an unknown name.
+    """
+    if name == "hashing":
+        return HashingEmbedder()
+    if name == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004").embed_query
+    raise ValueError(f"Unknown SEMANTIC_CACHE_EMBEDDER: {name}")
+
+
+def is_time_sensitive(prompt: str) -> bool:
+    return bool(_TIME_SENSITIVE.search(prompt))
+
+
+def is_follow_up(prompt: str) -> bool:
+    return bool(_FOLLOW_UP.search(prompt))
+
+
+def is_personal(prompt: str) -> bool:
+    return bool(_PERSONAL.search(prompt))
+
+
+class SemanticCache:
+    """
+    Reuses answers of earlier prompts that mean the same thing.
+
+    Keeps a bounded vector index of recent prompt -> answer pairs; a lookup
+    embeds the prompt and returns the most similar entry's answer if the cosine
+    similarity reaches `threshold` and the two prompts use their shared words in
+    the same order (see `same_order`). Entries expire after `ttl` seconds, or
+    `volatile_ttl` for time-sensitive prompts. Follow-up prompts ("tell me more
+    about it") and personal ones ("what is my name?") depend on the conversation
+    and are never looked up or stored.
+    """
+
+    def __init__(
+        self,
+        embed: Embedder,
+        threshold: float = 0.85,
+        ttl: float = 3600.0,
+        volatile_ttl: float = 300.0,
+        maxsize: int = 512,
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.volatile_ttl = volatile_ttl
+        self.maxsize = maxsize
+        # Parallel lists, oldest first; `_matrix` caches the stacked, normalized vectors
+        self._entries: list[dict] = []
+        self._vectors: list = []
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "stores": 0, "saved_latency_s": 0.0}
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]):
+        import numpy as np
+
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _expire(self, now: float) -> None:
+        live = [i for i, entry in enumerate(self._entries) if entry["expires_at"] > now]
+        if len(live) != len(self._entries):
+            self._entries = [self._entries[i] for i in live]
+            self._vectors = [self._vectors[i] for i in live]
+            self._matrix = None
+
+    def lookup(self, prompt: str) -> Optional[dict]:
+        """
+        Returns the cached entry most similar to `prompt`, or None.
+
+        Returns:
+            A dictionary with 'answer', 'prompt' (the cached prompt), 'similarity'
+            and 'latency' (seconds the original answer took), or None on a miss.
+        """
+        if is_follow_up(prompt) or is_personal(prompt):
+            return None
+        import numpy as np
+
+        words = key_words(prompt)
+        query = self._normalize(self.embed(prompt))
+        with self._lock:
+            self._stats["lookups"] += 1
+            self._expire(time.time())
+            if not self._entries:
+                return None
+            if self._matrix is None:
+                self._matrix = np.vstack(self._vectors)
+            similarities = self._matrix @ query
+            candidates = [int(i) for i in np.argsort(-similarities) if similarities[i] >= self.threshold]
+            best = next((i for i in candidates if same_order(words, self._entries[i]["words"])), None)
+            if best is None:
+                return None
+            similarity = float(similarities[best])
+            entry = self._entries[best]
+            self._stats["hits"] += 1
+            self._stats["saved_latency_s"] += entry["latency"]
+        logging.info(f"Semantic cache hit ({similarity:.2f}): {prompt!r} ~ {entry['prompt']!r}")
+        return {**entry, "similarity": similarity}
+
+    def store(self, prompt: str, answer: str, latency: float = 0.0) -> bool:
+        """
+        Caches `answer` for `prompt`.
+
+        Args:
+            prompt: The user's prompt.
+            answer: The agent's final answer.
+            latency: Seconds the answer took; a later hit counts it as saved.
+
+        Returns:
+            Whether the answer was stored (follow-up and personal prompts are not).
+        """
+        if is_follow_up(prompt) or is_personal(prompt) or not answer:
+            return False
+        vector = self._normalize(self.embed(prompt))
+        ttl = self.volatile_ttl if is_time_sensitive(prompt) else self.ttl
+        entry = {"prompt": prompt, "words": key_words(prompt), "answer": answer, "latency": latency,
+                 "expires_at": time.time() + ttl}
+        with self._lock:
+            self._entries.append(entry)
+            self._vectors.append(vector)
+            if len(self._entries) > self.maxsize:
+                del self._entries[0], self._vectors[0]
+            self._matrix = None
+            self._stats["stores"] += 1
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Lookups, hits, hit rate, total latency saved by hits and current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+            stats["entries"] = len(self._entries)
+            return stats
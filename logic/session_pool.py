@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+
+class SessionStore:
+    """
+    Persists per-session state as one JSON file per session id.
+
+    Files not written for `retention` seconds are deleted when the store is
+    opened and, at most hourly, on later saves; 0 keeps them forever.
+    """
+
+    def __init__(self, directory: str, retention: float = 0.0):
+        self.directory = directory
+        self.retention = retention
+        self._purged_at = 0.0
+        self.purge_expired()
+
+    def _path(self, session_id: str) -> str:
+        # Session ids come from the UI; keep them filesystem-safe
+        safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", session_id)
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def load(self, session_id: str) -> Optional[dict]:
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not load session {session_id}: {e}")
+            return None
+
+    def save(self, session_id: str, state: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(session_id)
+        # Write to a temporary file first so a crash never leaves a half-written session
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+        if time.time() - self._purged_at > 3600:
+            self.purge_expired()
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self) -> int:
+        """Deletes the session files older than `retention`; returns how many."""
+        self._purged_at = time.time()
+        if not self.retention:
+            return 0
+        deleted = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < self._purged_at - self.retention:
+                    os.remove(path)
+                    deleted += 1
+            except OSError as e:
+                logging.warning(f"Could not delete expired session file {path}: {e}")
+        if deleted:
+            logging.info(f"Deleted {deleted} expired session file(s).")
+        return deleted
+
+
+class _Session:
+    def __init__(self, executor: Any):
+        self.executor = executor
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Callers between looking the session up and releasing it; a pinned session is never evicted
+        self.pins = 0
+        # Set by `forget`: a turn still holding the session must not save it back
+        self.forgotten = False
+
+
+class SessionPool:
+    """
+    A bounded LRU of live per-session agent executors.
+
+    Each session gets its own executor (and therefore its own memory), so
+    concurrent users never share conversation state and only turns within the
+    same session are serialized. A session's state is persisted to the store
+    after every turn. Sessions idle for longer than `idle_timeout`, or the least
+    recently used ones once `max_sessions` is exceeded, are evicted from memory
+    and restored from the store on the next access.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[Optional[dict]], Any],
+        snapshot: Callable[[Any], dict],
+        store: SessionStore,
+        max_sessions: int = 100,
+        idle_timeout: float = 1800.0,
+    ):
+        """
+        Args:
+            factory: Builds a new executor from a persisted state (None for a fresh session).
+            snapshot: Extracts the state to persist from an executor.
+            store: Where session state is written to after each turn.
+            max_sessions: Maximum number of executors kept in memory.
+            idle_timeout: Seconds of inactivity after which a session is evicted.
+        """
+        self.factory = factory
+        self.snapshot = snapshot
+        self.store = store
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _acquire_entry(self, session_id: str) -> _Session:
+        """Looks up or restores a session and pins it; the caller must `_release_entry` it."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions.move_to_end(session_id)
+                entry.last_used = time.monotonic()
+                entry.pins += 1
+                return entry
+
+        # Build outside the pool lock: restoring can hit the disk and constructing is not free
+        entry = _Session(self.factory(self.store.load(session_id)))
+        with self._lock:
+            # Another thread may have created the same session in the meantime
+            entry = self._sessions.setdefault(session_id, entry)
+            self._sessions.move_to_end(session_id)
+            entry.last_used = time.monotonic()
+            # Pinned before the pool lock is released, so the eviction below can't pick it
+            entry.pins += 1
+        self.evict()
+        return entry
+
+    def _release_entry(self, entry: _Session) -> None:
+        with self._lock:
+            entry.pins -= 1
+            entry.last_used = time.monotonic()
+
+    @asynccontextmanager
+    async def asession(self, session_id: str):
+        """
+        Yields the executor of `session_id`, holding that session's lock.
+
+        Turns of different sessions run in parallel; turns of the same session
+        wait for each other so its memory is updated in order. The session lock
+        is acquired in a worker thread, so waiting for another turn of the same
+        session never blocks the event loop.
+        """
+        entry = self._acquire_entry(session_id)
+        acquired = asyncio.ensure_future(asyncio.to_thread(entry.lock.acquire))
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            # The thread may still get the lock after we gave up; hand it straight back
+            acquired.add_done_callback(lambda f: f.cancelled() or entry.lock.release())
+            self._release_entry(entry)
+            raise
+        try:
+            yield entry.executor
+        finally:
+            try:
+                # Saved while the turn still holds the lock, so saves of one session never interleave
+                if not entry.forgotten:
+                    self.store.save(session_id, self.snapshot(entry.executor))
+            except Exception as e:
+                logging.error(f"Failed to persist session {session_id}: {e}")
+            finally:
+                entry.lock.release()
+                self._release_entry(entry)
+
+    def forget(self, session_id: str) -> None:
+        """
+        Drops a session from memory and deletes its persisted state.
+
+        A turn of the session that is still running is waited for, and its
+        state is not saved when it ends.
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                entry.forgotten = True
+        if entry is None:
+            self.store.delete(session_id)
+            return
+        # Deleted under the session lock, so a turn can't save the state back afterwards
+        with entry.lock:
+            self.store.delete(session_id)
+
+    def evict(self) -> int:
+        """
+        Evicts idle sessions and trims the pool to `max_sessions`.
+
+        Sessions that are in use (or about to be) are never evicted.
+
+        Returns:
+            The number of sessions evicted.
+        """
+        now = time.monotonic()
+        with self._lock:
+            overflow = len(self._sessions) - self.max_sessions
+            victims = []
+            # Oldest first, thanks to the LRU ordering
+            for session_id, entry in self._sessions.items():
+                is_idle = now - entry.last_used > self.idle_timeout
+                if (is_idle or len(victims) < overflow) and not entry.pins:
+                    victims.append((session_id, entry))
+            for session_id, _ in victims:
+                del self._sessions[session_id]
+
+        # Also keeps memory updates finished after the last turn (e.g. a background summary)
+        for session_id, entry in victims:
+            try:
+                self.store.save(session_id, self.snapshot(entry.executor))
+            except Exception as e:
+                logging.error(f"Failed to persist session {session_id}: {e}")
+        if victims:
+            logging.info(f"Evicted {len(victims)} idle session(s); {len(self._sessions)} live.")
+        return len(victims)
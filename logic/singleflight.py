@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+# Result of a flight whose leader was cancelled: a waiter takes over the call
+_ABANDONED = object()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one upstream request.
+
+    The first caller for a key (the leader) runs the request; everyone asking
+    for the same key while it is in flight waits for, and shares, its result or
+    exception. Works across threads and event loops alike: the in-flight result
+    is a concurrent.futures.Future, which sync callers block on and async
+    callers await.
+
+    Cancellation stays with the caller it was meant for: a cancelled waiter
+    stops waiting without affecting the others, and if the leader is cancelled
+    (e.g. its search was superseded or timed out) one of the waiters takes over
+    the call instead of them all failing.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[str, int]] = {}
+
+    def _join(self, namespace: str, key: str) -> tuple[Future, bool]:
+        """Returns the in-flight future for `key` and whether the caller is its leader."""
+        with self._lock:
+            counters = self._counters.setdefault(namespace, {"upstream": 0, "coalesced": 0})
+            future = self._in_flight.get(key)
+            if future is not None:
+                counters["coalesced"] += 1
+                return future, False
+            future = self._in_flight[key] = Future()
+            counters["upstream"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, value: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(value)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            # The leader's task was cancelled (or interrupted), not the request itself failing
+            future.set_result(_ABANDONED)
+
+    def do(self, namespace: str, key: str, fn: Callable[[], Any]) -> Any:
+        """Runs `fn()` unless a call for `key` is already in flight, in which case waits for it."""
+        while True:
+            future, leader = self._join(namespace, key)
+            if leader:
+                break
+            value = future.result()
+            if value is not _ABANDONED:
+                return value
+        try:
+            value = fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    async def ado(self, namespace: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of `do`; `fn` is a coroutine function."""
+        while True:
+            future, leader = self._join(namespace, key)
+            if leader:
+                break
+            # Shielded: cancelling this waiter must not cancel the flight shared with others
+            value = await asyncio.shield(asyncio.wrap_future(future))
+            if value is not _ABANDONED:
+                return value
+        try:
+            value = await fn()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, value)
+        return value
+
+    def stats(self) -> dict:
+        """Upstream and coalesced call counts per namespace."""
+        with self._lock:
+            return {namespace: dict(values) for namespace, values in self._counters.items()}
@@ -0,0 +1,424 @@
+import collections
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+# --- Configuration ---
+telemetry_enabled = os.getenv("TELEMETRY", "1") not in ("0", "false", "off")
+# Comma-separated: "memory" (always on, feeds the Performance page), "json", "otel"
+telemetry_exporters = {name.strip() for name in os.getenv("TELEMETRY_EXPORTERS", "memory").split(",") if name.strip()}
+telemetry_json_path = os.getenv("TELEMETRY_JSON_PATH", "telemetry.jsonl")
+telemetry_buffer_size = int(os.getenv("TELEMETRY_BUFFER_SIZE", 5000))
+
+# The open span of the current context (thread or task); new spans become its children
+current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Span:
+    """
+    One timed operation: an LLM call, a tool call, a memory update, a search
+    provider call, a page render...
+
+    `stage` groups spans for the per-stage percentiles ("llm", "tool", "memory",
+    "search", "render", "turn"); `name` identifies the operation itself. Ids
+    follow the OpenTelemetry format (hex trace and span ids).
+    """
+
+    __slots__ = ("name", "stage", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+                 "attributes", "status", "error", "_start")
+
+    def __init__(self, name: str, stage: str, parent: Optional["Span"] = None, attributes: dict = None):
+        self.name = name
+        self.stage = stage
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_time = time.time()
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error = None
+        self._start = time.perf_counter()
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Seconds between start and end, or None while the span is open."""
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self, error: BaseException = None) -> None:
+        """Closes the span (once) and hands it to the exporters."""
+        if self.end_time is not None:
+            return
+        self.end_time = self.start_time + (time.perf_counter() - self._start)
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+        for exporter in exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                logging.warning(f"Telemetry exporter {type(exporter).__name__} failed: {e}")
+
+    def to_dict(self) -> dict:
+        """OTLP-style representation, as written by JsonLinesExporter."""
+        return {
+            "name": self.name,
+            "stage": self.stage,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": int(self.start_time * 1e9),
+            "end_time_unix_nano": int(self.end_time * 1e9) if self.end_time is not None else None,
+            "duration_s": self.duration,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a Span while telemetry is disabled."""
+
+    trace_id = span_id = parent_id = None
+    attributes = {}
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def end(self, error: BaseException = None) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# --- Exporters ---
+class InMemoryExporter:
+    """Keeps the most recent finished spans in memory (for the Performance page and tests)."""
+
+    def __init__(self, maxlen: int = 5000):
+        self._spans = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, since: Optional[float] = None) -> list[Span]:
+        """Finished spans, oldest first; only those started after `since` (epoch seconds) if given."""
+        with self._lock:
+            spans = list(self._spans)
+        return spans if since is None else [span for span in spans if span.start_time >= since]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonLinesExporter:
+    """Appends every finished span to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class OpenTelemetryExporter:
+    """
+    Re-emits finished spans through the OpenTelemetry API, so whatever SDK and
+    exporter the deployment configures (OTLP, console...) receives them.
+
+    Requires the opentelemetry-api package. Children finish before their
+    parents, so spans are held per trace until its root span finishes, then
+    emitted parents first with their original timestamps, attributes and status.
+    """
+
+    def __init__(self, max_pending: int = 5000):
+        from opentelemetry import trace
+
+        self._trace = trace
+        self._tracer = trace.get_tracer("coolgemini")
+        self.max_pending = max_pending
+        self._pending = collections.defaultdict(list)  # trace_id -> finished spans
+        self._emitted = collections.OrderedDict()  # span_id -> OpenTelemetry span, for late children
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if span.parent_id is not None and span.parent_id not in self._emitted:
+                self._pending[span.trace_id].append(span)
+                # Drop the oldest trace if roots never finish (e.g. abandoned background work)
+                if len(self._pending) > self.max_pending:
+                    self._pending.pop(next(iter(self._pending)))
+                return
+            batch = [span] + self._pending.pop(span.trace_id, []) if span.parent_id is None else [span]
+            for recorded in sorted(batch, key=lambda s: s.start_time):
+                self._emit(recorded)
+
+    def _emit(self, span: Span) -> None:
+        from opentelemetry.trace import Status, StatusCode
+
+        parent = self._emitted.get(span.parent_id)
+        otel_span = self._tracer.start_span(
+            span.name,
+            context=self._trace.set_span_in_context(parent) if parent is not None else None,
+            start_time=int(span.start_time * 1e9),
+            attributes={"stage": span.stage, **{k: v for k, v in span.attributes.items() if v is not None}},
+        )
+        if span.status == "error":
+            otel_span.set_status(Status(StatusCode.ERROR, span.error))
+        otel_span.end(end_time=int(span.end_time * 1e9))
+        self._emitted[span.span_id] = otel_span
+        while len(self._emitted) > self.max_pending:
+            self._emitted.popitem(last=False)
+
+
+memory_exporter = InMemoryExporter(telemetry_buffer_size)
+exporters: list = [memory_exporter]
+if "json" in telemetry_exporters:
+    exporters.append(JsonLinesExporter(telemetry_json_path))
+if "otel" in telemetry_exporters:
+    try:
+        exporters.append(OpenTelemetryExporter(telemetry_buffer_size))
+    except ImportError:
+        logging.warning("TELEMETRY_EXPORTERS includes otel, but opentelemetry-api is not installed.")
+
+
+# --- Recording Spans ---
+def start_span(name: str, stage: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """
+    Opens a span without making it current; the caller must `end()` it.
+
+    The parent defaults to the current context's span.
+    """
+    if not telemetry_enabled:
+        return _NOOP_SPAN
+    return Span(name, stage, parent if parent is not None else current_span.get(), attributes)
+
+
+@contextmanager
+def span(name: str, stage: str, **attributes):
+    """
+    Times the block as a span, made current so spans opened inside become its children.
+
+    An exception leaving the block marks the span as failed and propagates.
+    Streamlit's rerun/stop signals are not Exceptions and don't count as failures.
+    """
+    opened = start_span(name, stage, **attributes)
+    token = current_span.set(opened if telemetry_enabled else None)
+    try:
+        yield opened
+    except Exception as e:
+        opened.end(e)
+        raise
+    finally:
+        current_span.reset(token)
+        opened.end()
+
+
+def add_to_current(key: str, amount: float) -> None:
+    """Adds `amount` to a numeric attribute of the current span, e.g. a running total for the turn."""
+    current = current_span.get()
+    if current is not None:
+        current.set_attribute(key, current.attributes.get(key, 0) + amount)
+
+
+def traced(stage: str, name: str = None) -> Callable:
+    """Decorator running every call of a function or coroutine function inside a span."""
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# --- Reporting ---
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _summarize(spans: list[Span]) -> dict:
+    durations = sorted(span.duration for span in spans)
+    return {
+        "count": len(durations),
+        "errors": sum(span.status == "error" for span in spans),
+        "p50_s": _percentile(durations, 0.50),
+        "p95_s": _percentile(durations, 0.95),
+        "max_s": durations[-1],
+        "input_tokens": sum(span.attributes.get("input_tokens") or 0 for span in spans),
+        "output_tokens": sum(span.attributes.get("output_tokens") or 0 for span in spans),
+    }
+
+
+def stage_stats(since: Optional[float] = None, by: str = "stage") -> dict:
+    """
+    Count, errors, p50/p95/max seconds and token totals of the recorded spans.
+
+    Args:
+        since: Only spans started after this time (epoch seconds).
+        by: "stage" to group by stage, or "name" to group by operation.
+
+    Returns:
+        A dictionary mapping each stage (or "stage/name") to its summary.
+    """
+    groups = collections.defaultdict(list)
+    for recorded in memory_exporter.spans(since):
+        key = recorded.stage if by == "stage" else f"{recorded.stage}/{recorded.name}"
+        groups[key].append(recorded)
+    return {key: _summarize(spans) for key, spans in sorted(groups.items())}
+
+
+def trace_breakdown(root_name: str = "chat.turn", since: Optional[float] = None, limit: int = 20) -> list[dict]:
+    """
+    Where the most recent `root_name` spans spent their time.
+
+    Returns:
+        Newest first, one dictionary per root span: its duration, the summed
+        seconds of its descendants per stage, and its token totals.
+    """
+    spans = memory_exporter.spans(since)
+    children = collections.defaultdict(list)
+    for recorded in spans:
+        children[recorded.parent_id].append(recorded)
+    roots = [recorded for recorded in spans if recorded.name == root_name][-limit:]
+    breakdown = []
+    for root in reversed(roots):
+        row = {"start_time": root.start_time, "duration_s": root.duration, "status": root.status,
+               **root.attributes, "stages": collections.Counter(), "input_tokens": 0, "output_tokens": 0}
+        # (span, stage of its nearest enclosing span below the root)
+        pending = [(child, None) for child in children[root.span_id]]
+        while pending:
+            child, enclosing_stage = pending.pop()
+            pending.extend((grandchild, child.stage) for grandchild in children[child.span_id])
+            # Spans nested in a span of the same stage are already part of its time
+            if child.stage != enclosing_stage:
+                row["stages"][child.stage] += child.duration
+            row["input_tokens"] += child.attributes.get("input_tokens") or 0
+            row["output_tokens"] += child.attributes.get("output_tokens") or 0
+        breakdown.append(row)
+    return breakdown
+
+
+# --- LangChain Integration ---
+def _approximate_tokens(text: str) -> int:
+    # Same ~4 characters per token estimate as logic.memory, without importing LangChain
+    return len(text) // 4 + 1
+
+
+@functools.cache
+def _langchain_callback_class():
+    """
+    Defines the callback handler on first use, so importing this module
+    doesn't pay for the langchain_core import.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+    from langchain_core.messages import get_buffer_string
+
+    class TelemetryCallbackHandler(BaseCallbackHandler):
+        """
+        Records a span per LLM call (with token counts) and per tool call.
+
+        Token counts come from the provider's usage metadata when it reports
+        them; otherwise they are estimated from the text ("token_source" tells
+        which). Spans are parented to the span current when the call started.
+        """
+
+        # Called in the caller's context, so the current span is the right parent
+        run_inline = True
+
+        def __init__(self):
+            self._spans = {}  # run_id -> (Span, estimated input tokens)
+            self._lock = threading.Lock()
+
+        def _start(self, run_id, name: str, stage: str, estimated_tokens: int = 0, **attributes) -> None:
+            with self._lock:
+                self._spans[run_id] = (start_span(name, stage, **attributes), estimated_tokens)
+
+        def _pop(self, run_id):
+            with self._lock:
+                return self._spans.pop(run_id, (None, 0))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+            text = "".join(get_buffer_string(batch) for batch in messages)
+            self._start(run_id, f"llm.{kwargs.get('name') or (serialized or {}).get('name', 'chat')}", "llm",
+                        _approximate_tokens(text))
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+            self._start(run_id, f"llm.{kwargs.get('name') or (serialized or {}).get('name', 'llm')}", "llm",
+                        _approximate_tokens("".join(prompts)))
+
+        def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+            opened, estimated_input = self._pop(run_id)
+            if opened is None:
+                return
+            usage = {}
+            for generations in response.generations:
+                for generation in generations:
+                    for key, value in (getattr(getattr(generation, "message", None), "usage_metadata", None) or {}).items():
+                        if key in ("input_tokens", "output_tokens"):
+                            usage[key] = usage.get(key, 0) + value
+            if usage:
+                opened.set_attribute("token_source", "provider")
+            else:
+                opened.set_attribute("token_source", "estimate")
+                text = "".join(generation.text for generations in response.generations for generation in generations)
+                usage = {"input_tokens": estimated_input, "output_tokens": _approximate_tokens(text)}
+            for key, value in usage.items():
+                opened.set_attribute(key, value)
+            opened.end()
+
+        def on_llm_error(self, error: BaseException, *, run_id, **kwargs) -> None:
+            opened, _ = self._pop(run_id)
+            if opened is not None:
+                opened.end(error)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+            self._start(run_id, f"tool.{kwargs.get('name') or (serialized or {}).get('name', 'tool')}", "tool")
+
+        def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+            opened, _ = self._pop(run_id)
+            if opened is not None:
+                opened.end()
+
+        def on_tool_error(self, error: BaseException, *, run_id, **kwargs) -> None:
+            opened, _ = self._pop(run_id)
+            if opened is not None:
+                opened.end(error)
+
+    return TelemetryCallbackHandler
+
+
+@functools.cache
+def langchain_callback():
+    """The shared LangChain callback handler recording LLM and tool spans; pass it in `callbacks`."""
+    return _langchain_callback_class()()
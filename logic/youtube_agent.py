@@ -1,17 +1,85 @@
+import asyncio
+import contextvars
+import functools
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import dotenv
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+from logic.rate_limit import UpstreamUnavailableError, limiters
+from logic.search_cache import cached
 
 # Load environment variables from .env file
 dotenv.load_dotenv(".env")
 
 # Get the YouTube API key from environment variables
+# Checked when the client is built, so importing this module never fails
 youtube_api_key = os.getenv("YOUTUBE_API_KEY")
-if youtube_api_key is None:
-    raise ValueError("YOUTUBE_API_KEY is not set in the .env file.")
+
+# Optional: point the client at another endpoint (e.g. a local stub server)
+youtube_api_endpoint = os.getenv("YOUTUBE_API_ENDPOINT")
+http_timeout = float(os.getenv("YOUTUBE_HTTP_TIMEOUT", 10))
+async_workers = int(os.getenv("YOUTUBE_ASYNC_WORKERS", 4))
+
+# --- Client Reuse ---
+# The discovery document ships with google-api-python-client (static discovery);
+# it is parsed once, on the first search, instead of on every search. The Google
+# client libraries are imported at that point too, keeping this module cheap to import.
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+
+def _get_discovery_doc() -> dict:
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is None:
+            from googleapiclient.discovery_cache import get_static_doc
+
+            _discovery_doc = json.loads(get_static_doc("youtube", "v3"))
+        return _discovery_doc
+
+# httplib2.Http is not thread-safe, so each thread (Streamlit session or search
+# worker) keeps its own long-lived client and keep-alive connection per API key.
+_thread_clients = threading.local()
+# Long-lived threads for the async API, so their clients outlive any one event loop
+# (asyncio.to_thread would use each loop's own default executor, and fresh threads)
+_async_executor = ThreadPoolExecutor(max_workers=async_workers, thread_name_prefix="youtube")
+
+
+def get_youtube_client(api_key: str = youtube_api_key, api_endpoint: str = None):
+    """
+    Returns the calling thread's YouTube API client for `api_key`, building it on first use.
+
+    Args:
+        api_key: Your YouTube Data API v3 key.
+        api_endpoint: Optional API root URL override (defaults to YOUTUBE_API_ENDPOINT).
+
+    Returns:
+        A googleapiclient Resource for the YouTube Data API v3.
+    """
+    if not api_key:
+        raise ValueError("YOUTUBE_API_KEY is not set in the .env file.")
+    api_endpoint = api_endpoint or youtube_api_endpoint
+    clients = getattr(_thread_clients, "by_key", None)
+    if clients is None:
+        clients = _thread_clients.by_key = {}
+
+    key = (api_key, api_endpoint)
+    if key not in clients:
+        import httplib2
+        from googleapiclient.discovery import build_from_document
+
+        clients[key] = build_from_document(
+            _get_discovery_doc(),
+            developerKey=api_key,
+            http=httplib2.Http(timeout=http_timeout),
+            client_options={"api_endpoint": api_endpoint} if api_endpoint else None,
+        )
+    return clients[key]
+
 
 # --- Function to Search Videos ---
+@cached("youtube", ignore=("api_key",))
 def search_youtube_videos(query: str, api_key=youtube_api_key, max_results: int = 10) -> list[dict]:
     """
     Searches for YouTube videos based on a query string using the YouTube Data API v3.
@@ -25,12 +93,18 @@ def search_youtube_videos(query: str, api_key=youtube_api_key, max_results: int
         A list of dictionaries, where each dictionary contains the 'title',
         'thumbnail_url', and 'video_link' of a found video.
         Returns an empty list if no videos are found or an API error occurs.
+        Non-empty results are cached by normalized query to save API quota.
+
+    Raises:
+        UpstreamUnavailableError: If YouTube keeps throttling or failing after the
+            rate limiter's retries, so callers can tell that apart from "no videos".
     """
+    from googleapiclient.errors import HttpError
+
     results = []
     try:
-        # Build the YouTube API service object
-        # You might need to install the library: pip install google-api-python-client
-        youtube = build('youtube', 'v3', developerKey=api_key)
+        # Reuse this thread's client (and its open connection) for the key
+        youtube = get_youtube_client(api_key)
 
         # Create a request to the search().list endpoint
         request = youtube.search().list(
@@ -42,8 +116,8 @@ def search_youtube_videos(query: str, api_key=youtube_api_key, max_results: int
             fields="items(id/videoId,snippet(title,thumbnails/default/url))"
         )
 
-        # Execute the request
-        response = request.execute()
+        # Execute the request through the shared limiter (throttling, retries, circuit breaker)
+        response = limiters["youtube"].call(request.execute, api_key=api_key)
 
         # Process the search results
         for item in response.get('items', []):
@@ -61,6 +135,8 @@ def search_youtube_videos(query: str, api_key=youtube_api_key, max_results: int
                     'video_link': video_link,
                 })
 
+    except UpstreamUnavailableError:
+        raise
     except HttpError as e:
         print(f"An HTTP error {e.resp.status} occurred: {e.content}")
         # Consider more specific error handling or logging
@@ -70,6 +146,18 @@ def search_youtube_videos(query: str, api_key=youtube_api_key, max_results: int
 
     return results
 
+async def asearch_youtube_videos(query: str, api_key=youtube_api_key, max_results: int = 10) -> list[dict]:
+    """
+    Async version of `search_youtube_videos`.
+
+    google-api-python-client has no async transport, so the call runs on a small
+    module-level thread pool instead of blocking the event loop. The pool's
+    threads live as long as the process, so each keeps its client and
+    connection across calls, whichever event loop they come from.
+    """
+    call = functools.partial(search_youtube_videos, query, api_key=api_key, max_results=max_results)
+    return await asyncio.get_running_loop().run_in_executor(_async_executor, contextvars.copy_context().run, call)
+
 # --- Example Usage ---
 if __name__ == "__main__":
     # Make sure you have set YOUTUBE_API_KEY in your .env file
@@ -1,12 +1,22 @@
+import os
 import streamlit as st
+from logic.telemetry import span
 
 chat_page = st.Page("chat.py", title="Chat AI Assistant", icon="🤖")
 search_page = st.Page("search.py", title="Search with Tavily", icon="🔍")
 terms_page = st.Page("terms.py", title="Terms of Use", icon=":material/gavel:")
 privacy_page = st.Page("privacy.py", title="Privacy Policy", icon=":material/checkbook:")
 about_page = st.Page("about.py", title="About", icon=":material/info:")
+pages = [chat_page, search_page, terms_page, privacy_page, about_page]
 
-router = st.navigation([chat_page, search_page, terms_page, privacy_page, about_page])
+# The Performance page stays out of the menu unless PERFORMANCE_PAGE=1 is set,
+# or the session was opened with ?perf=1
+if st.query_params.get("perf") == "1":
+    st.session_state.show_performance = True
+if os.getenv("PERFORMANCE_PAGE") == "1" or st.session_state.get("show_performance"):
+    pages.append(st.Page("performance.py", title="Performance", icon=":material/speed:"))
+
+router = st.navigation(pages)
 # Set the page configuration
 st.set_page_config(
     page_title="coolGemini",
@@ -14,4 +24,5 @@ st.set_page_config(
     layout="wide",
 )
 
-router.run()
\ No newline at end of file
+with span("page.render", "render", page=router.title):
+    router.run()
@@ -0,0 +1,79 @@
+import os
+import time
+import streamlit as st
+from logic import telemetry
+from logic.jobs import job_queue
+
+st.title("⏱️ Performance")
+st.caption("Spans recorded by this server process: LLM calls, tool calls, memory updates, search providers and page renders.")
+
+windows = {"Last 5 minutes": 300, "Last hour": 3600, "Everything recorded": None}
+window = st.radio("Window", list(windows), horizontal=True)
+since = time.time() - windows[window] if windows[window] else None
+
+
+def _rows(stats: dict, label: str) -> list[dict]:
+    """Turns a `telemetry.stage_stats` result into table rows, in milliseconds."""
+    return [
+        {
+            label: key,
+            "count": summary["count"],
+            "errors": summary["errors"],
+            "p50 (ms)": round(summary["p50_s"] * 1000, 1),
+            "p95 (ms)": round(summary["p95_s"] * 1000, 1),
+            "max (ms)": round(summary["max_s"] * 1000, 1),
+            "input tokens": summary["input_tokens"],
+            "output tokens": summary["output_tokens"],
+        }
+        for key, summary in stats.items()
+    ]
+
+
+by_stage = telemetry.stage_stats(since)
+if not by_stage:
+    st.info("No spans recorded yet. Chat or search a little, then come back.")
+else:
+    st.subheader("Per stage")
+    st.dataframe(_rows(by_stage, "stage"), hide_index=True, use_container_width=True)
+
+    st.subheader("Per operation")
+    st.dataframe(_rows(telemetry.stage_stats(since, by="name"), "operation"), hide_index=True, use_container_width=True)
+
+    # Time inside each stage adds up to less than the turn: the rest is rendering and glue
+    st.subheader("Recent chat turns")
+    turns = telemetry.trace_breakdown("chat.turn", since)
+    if not turns:
+        st.caption("No chat turns in this window.")
+    else:
+        stages = sorted({stage for turn in turns for stage in turn["stages"]})
+        st.dataframe(
+            [
+                {
+                    "started": time.strftime("%H:%M:%S", time.localtime(turn["start_time"])),
+                    "route": turn.get("route", ""),
+                    "status": turn["status"],
+                    "total (ms)": round(turn["duration_s"] * 1000, 1),
+                    **{f"{stage} (ms)": round(turn["stages"].get(stage, 0.0) * 1000, 1) for stage in stages},
+                    "tokens": turn["input_tokens"] + turn["output_tokens"],
+                    "tokens saved": turn.get("prompt_tokens_saved", 0),
+                }
+                for turn in turns
+            ],
+            hide_index=True,
+            use_container_width=True,
+        )
+
+# Chat turns run as background jobs; rejections mean the queue was at its admission limit
+jobs = job_queue.stats()
+st.subheader("Chat turn queue")
+columns = st.columns(4)
+columns[0].metric("Running", jobs["running"])
+columns[1].metric("Queued", jobs["queued"])
+columns[2].metric("Finished", jobs["done"] + jobs["failed"] + jobs["cancelled"], help=f"{jobs['failed']} failed, {jobs['cancelled']} stopped")
+columns[3].metric("Rejected (busy)", jobs["rejected"])
+
+# Spans are shared by every session; only an operator who enabled the page in the
+# server config may clear them, not anyone who opened the app with ?perf=1
+if os.getenv("PERFORMANCE_PAGE") == "1" and st.button("Clear recorded spans"):
+    telemetry.memory_exporter.clear()
+    st.rerun()
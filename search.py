@@ -1,7 +1,15 @@
+import os
+import uuid
 import streamlit as st
-# Assume these functions exist in the specified paths and handle API calls
-from logic.search_agent import search
-from logic.youtube_agent import search_youtube_videos
+# Runs the Tavily and YouTube searches concurrently
+from logic.multi_search import search_all
+# Background searches (the page stays usable meanwhile) and suggestions from the session's past queries
+from logic.incremental_search import drop_search, search_jobs, start_search
+from logic.jobs import DONE, QUEUED, JobRejectedError
+from logic.query_suggest import QueryTrie, query_suggest_max, suggest
+from logic.search_view import build_view_model, page_sizes, visible_items
+# Downloads, downscales and caches images so they are served from local bytes
+from logic.image_cache import IMAGE_TILE, THUMBNAIL_TILE, get_images, prefetch
 
 # --- Helper Functions for Displaying Results ---
 
@@ -20,14 +28,15 @@ def display_images(images):
         st.subheader("Images")
         # Use columns for better layout, adjust number as needed
         cols = st.columns(3)  # Create 3 columns for images
+        # Fetched in parallel; slow or broken hosts come back as None instead of stalling the grid
+        image_bytes = get_images(images, IMAGE_TILE)
         for i, image_url in enumerate(images):
             with cols[i % 3]:
-                # Add error handling for potentially broken image links
                 with st.container(height=200):  # Set a fixed height for the image container
-                    try:
-                        st.image(image_url, use_container_width=True)
-                    except Exception as e:
-                        st.warning(f"Could not load image. Error: {e}")
+                    if image_bytes.get(image_url):
+                        st.image(image_bytes[image_url], use_container_width=True)
+                    else:
+                        st.caption("Image unavailable.")
         st.write("---")
     else:
         st.info("No images found.")
@@ -36,6 +45,7 @@ def display_videos(videos):
     """Displays video results."""
     if videos:
         st.subheader("Videos")
+        thumbnails = get_images([video['thumbnail_url'] for video in videos if video.get('thumbnail_url')], THUMBNAIL_TILE)
         for video in videos:
             title = video.get('title', 'No Title')
             link = video.get('video_link', '#')
@@ -47,11 +57,8 @@ def display_videos(videos):
 
                 # Display thumbnail in the first column
                 with cols[0]:
-                    if thumbnail:
-                        try:
-                            st.image(thumbnail, use_container_width=True)
-                        except Exception as e:
-                            st.warning(f"Could not load thumbnail for '{title}'. Error: {e}")
+                    if thumbnails.get(thumbnail):
+                        st.image(thumbnails[thumbnail], use_container_width=True)
                     else:
                         st.caption("No thumbnail available.")
 
@@ -76,130 +83,202 @@ def display_web_results(results):
     else:
         st.info("No web results found.")
 
+# --- Paginated Sections ---
+
+# Renders a page of each result kind
+section_display = {
+    "images": display_images,
+    "videos": display_videos,
+    "web": display_web_results,
+}
+
+# Starts downloading the images of a section's next page in the background
+section_prefetch = {
+    "images": lambda items: prefetch(items, IMAGE_TILE),
+    "videos": lambda items: prefetch([video['thumbnail_url'] for video in items if video.get('thumbnail_url')], THUMBNAIL_TILE),
+}
+
+def load_more(kind):
+    """Shows the next page of a section (runs before the fragment reruns)."""
+    st.session_state.search_shown[kind] += page_sizes[kind]
+
+@st.fragment
+def render_section(kind):
+    """
+    Renders the visible part of one result section with a "Load more" button.
+
+    As a fragment, clicking "Load more" reruns only this section instead of the
+    whole page, and only the visible items are emitted.
+    """
+    items = st.session_state.search_view[kind]
+    visible, has_more = visible_items(items, st.session_state.search_shown[kind])
+    section_display[kind](visible)
+    if has_more:
+        # So "Load more" is served from the image cache
+        if kind in section_prefetch:
+            section_prefetch[kind](items[len(visible):len(visible) + page_sizes[kind]])
+        st.button(
+            f"Load more ({len(items) - len(visible)} more)",
+            key=f"load_more_{kind}",
+            on_click=load_more,
+            args=(kind,),
+        )
+
+# --- Background Search and Suggestions ---
+
+def use_suggestion(suggestion):
+    """Puts the picked suggestion into the search box (runs before the rerun)."""
+    st.session_state.search_query = suggestion
+
+def show_results(query, outcome):
+    st.session_state.search_view = build_view_model(query, outcome)
+    st.session_state.search_shown = dict(page_sizes)
+    if outcome.get("web") is not None or outcome.get("videos") is not None:
+        st.session_state.search_history.add(query)
+
+@st.fragment(run_every=0.25)
+def await_search(job_id, query):
+    """
+    Shows that a background search is pending, and reruns the page once it is done.
+
+    As a fragment polling the job, the rest of the page (earlier results, the
+    search box) stays usable in the meantime.
+    """
+    job = search_jobs.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    if job.status == QUEUED:
+        st.caption(f"Search for “{query}” is queued...")
+    else:
+        st.caption(f"Searching across sources for “{query}”...")
+
 # --- Streamlit App Layout ---
 
 st.title("🔍 Search Engine")
 
+if "search_owner" not in st.session_state:
+    st.session_state.search_owner = uuid.uuid4().hex
+# Suggestions only ever come from this session's own searches
+if "search_history" not in st.session_state:
+    st.session_state.search_history = QueryTrie(query_suggest_max)
+
 # Input field for the search query
-# Use session state to keep the query across reruns if needed, but simple text_input is fine for this structure
 query = st.text_input("Enter your search query:", key="search_query")
+in_background = st.toggle(
+    "Search in the background",
+    value=os.getenv("SEARCH_IN_BACKGROUND", "1") not in ("0", "false", "off"),
+    key="search_in_background",
+    help="Run the search submitted with Enter in the background, so the page stays usable, and suggest your earlier queries.",
+)
+
+if in_background and (suggestions := suggest(st.session_state.search_history, query)):
+    for column, suggestion in zip(st.columns(len(suggestions)), suggestions):
+        column.button(suggestion, key=f"suggestion_{suggestion}", type="tertiary", icon=":material/history:",
+                      on_click=use_suggestion, args=(suggestion,))
 
-# Initialize variables to store results
-web_search_results = None
-video_search_results = None
 search_error = None
 
-# Perform search only if a query is entered
-if query:
+# Perform the search once per query; reruns for the same query (switching views,
+# loading more results) reuse the view model kept in session state. A search
+# where every provider failed is retried on the next rerun.
+previous_view = st.session_state.get("search_view")
+needs_search = bool(query) and (
+    previous_view is None
+    or previous_view["query"] != query
+    or not (previous_view["web_ran"] or previous_view["videos_ran"])
+)
+# {"query", "id"} of the latest background search
+pending = st.session_state.get("search_job")
+if pending is not None and (not in_background or pending["query"] != query):
+    # Superseded (or the mode was switched off): stop waiting for it
+    drop_search(pending["id"])
+    pending = st.session_state.search_job = None
+
+if needs_search and not in_background:
     # Use a spinner to indicate activity during API calls
     with st.spinner("Searching across sources..."):
+        # Both providers run in parallel, so the wait is the slower of the two
+        show_results(query, search_all(query))
+elif needs_search:
+    job = search_jobs.get(pending["id"]) if pending is not None else None
+    if job is None:
+        # A failed search is retried on the next rerun (the job is forgotten), as above
         try:
-            # Perform all searches once using the actual imported functions
-            # Ensure your 'search' function returns a dict like the mock
-            # Ensure your 'search_youtube_videos' returns a list of dicts like the mock
-            web_search_results, response_time = search(query) # Fetches web results and images
-            video_search_results = search_youtube_videos(query)
-            if response_time:
-                st.success(f"Search completed in {response_time:.2f} seconds.")
-        except Exception as e:
-            # Catch potential errors during API calls (network issues, API errors, etc.)
-            search_error = f"An error occurred during search: {e}"
-            # Display error immediately below the search bar
-            st.error(search_error)
-
-# Create tabs
-tab_titles = ["All", "Images", "Videos", "Web"]
-tabs = st.tabs(tab_titles)
-
-# --- Tab Content ---
-
-# Tab 1: All Results
-with tabs[0]:
+            job = start_search(st.session_state.search_owner, query)
+            st.session_state.search_job = {"query": query, "id": job.id}
+        except JobRejectedError:
+            st.warning("Too many searches are running right now. Press Enter to try again.")
+    if job is not None and job.done:
+        st.session_state.search_job = None
+        if job.status == DONE:
+            show_results(query, job.result)
+        else:
+            show_results(query, {"errors": {"search": str(job.error or "was cancelled")}})
+    elif job is not None:
+        await_search(job.id, query)
+
+view = st.session_state.get("search_view") if query else None
+if view is not None and view["query"] != query:
+    # Results of the previous query stay up until the new ones arrive
+    st.caption(f"Showing results for “{view['query']}”.")
+
+if view:
+    provider_labels = {"web": "Web search", "videos": "Video search"}
+    if view["errors"] and not view["web_ran"] and not view["videos_ran"]:
+        # Every provider failed, so there is nothing to show
+        search_error = "An error occurred during search: " + "; ".join(
+            f"{provider_labels.get(name, name)} {message}" for name, message in view["errors"].items()
+        )
+        # Display error immediately below the search bar
+        st.error(search_error)
+    else:
+        # Keep whatever came back and flag the providers that didn't make it
+        for name, message in view["errors"].items():
+            st.warning(f"{provider_labels.get(name, name)} unavailable: {message}")
+        st.success(f"Search completed in {view['elapsed']:.2f} seconds.")
+        if view["web_source"] == "local":
+            st.caption("Web results served from the local index of earlier searches.")
+
+# Only the selected view is rendered (st.tabs would build all four on every rerun)
+selected_view = st.radio(
+    "View", ["All", "Images", "Videos", "Web"], key="search_tab", horizontal=True, label_visibility="collapsed"
+)
+
+if not view:
+    # Prompt user to enter a query if the input is empty
+    st.info("Enter a search query above to see results.")
+elif search_error:
+    st.error(search_error)
+
+elif selected_view == "All":
     st.header("All Results")
-    if query:
-        if search_error:
-            # If an error occurred during search, display it here as well
-            st.error(search_error)
-        # Check if either search returned results (even if one failed, the other might have succeeded)
-        elif web_search_results or video_search_results:
-            # Display Answer (from web search results)
-            # Check if web_search_results exists and has the 'answer' key
-            if web_search_results and web_search_results.get('answer'):
-                 display_answer(web_search_results.get('answer'))
-            else:
-                 # Provide feedback if the answer specifically wasn't found or web search failed
-                 if web_search_results is not None: # Check if web search ran
-                     st.info("No direct answer found for this query.")
-
-            # Display Images (from web search results)
-            if web_search_results and web_search_results.get('images'):
-                display_images(web_search_results.get('images'))
-            else:
-                 if web_search_results is not None:
-                     st.info("No images found for this query.")
-
-
-            # Display Videos
-            if video_search_results:
-                display_videos(video_search_results)
-            else:
-                 # Check if video search ran but returned no results vs. failed entirely
-                 if not search_error: # Only show info if no major error occurred
-                     st.info("No videos found for this query.")
-
-            # Display Web Results (from web search results)
-            if web_search_results and web_search_results.get('results'):
-                display_web_results(web_search_results.get('results'))
-            else:
-                 if web_search_results is not None:
-                     st.info("No web results found for this query.")
-
-        elif not search_error: # If no error but both results are None/empty
-            st.warning("No results found for your query.")
+    if not (view["answer"] or view["images"] or view["videos"] or view["web"]):
+        st.warning("No results found for your query.")
     else:
-        # Prompt user to enter a query if the input is empty
-        st.info("Enter a search query above to see results.")
+        if view["web_ran"]:
+            display_answer(view["answer"])
+            render_section("images")
+        render_section("videos")
+        if view["web_ran"]:
+            render_section("web")
 
-# Tab 2: Images
-with tabs[1]:
+elif selected_view == "Images":
     st.header("Image Results")
-    if query:
-        if search_error:
-            st.error(search_error) # Show general search error if it occurred
-        elif web_search_results:
-            # Display images if web search results are available
-            display_images(web_search_results.get('images'))
-        elif not search_error: # Only show warning if no general error
-             st.warning("Image search could not be performed or yielded no results. Check the 'All' tab.")
+    if view["web_ran"]:
+        render_section("images")
     else:
-        st.info("Enter a search query to see image results.")
+        st.warning("Image search could not be performed or yielded no results. Check the 'All' view.")
 
-# Tab 3: Videos
-with tabs[2]:
+elif selected_view == "Videos":
     st.header("Video Results")
-    if query:
-        if search_error:
-            # Show general search error if it occurred
-             st.error(search_error)
-        # Check specifically if video_search_results is available (it might be None even if web_search_results exists)
-        elif video_search_results is not None:
-             display_videos(video_search_results)
-        elif not search_error: # Only show warning if no general error
-             # This case handles if search_youtube_videos specifically returned None or empty list
-             st.warning("Video search could not be performed or yielded no results.")
+    if view["videos_ran"]:
+        render_section("videos")
     else:
-        st.info("Enter a search query to see video results.")
+        st.warning("Video search could not be performed or yielded no results.")
 
-# Tab 4: Web Results
-with tabs[3]:
+elif selected_view == "Web":
     st.header("Web Results")
-    if query:
-        if search_error:
-            st.error(search_error) # Show general search error
-        elif web_search_results:
-            # Display web results if available
-            display_web_results(web_search_results.get('results'))
-        elif not search_error: # Only show warning if no general error
-             st.warning("Web search could not be performed or yielded no results. Check the 'All' tab.")
+    if view["web_ran"]:
+        render_section("web")
     else:
-        st.info("Enter a search query to see web results.")
+        st.warning("Web search could not be performed or yielded no results. Check the 'All' view.")
@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Tuple, Union
+
+from langchain_community.tools import TavilySearchResults
+from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+from langchain_core.callbacks import AsyncCallbackManagerForToolRun, CallbackManagerForToolRun
+from pydantic import Field
+
+from logic.local_index import index_results, local_search
+from logic.rate_limit import limiters
+from logic.search_cache import MISS, afetch, fetch, make_key, search_cache
+
+
+class LimitedTavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily API wrapper whose requests go through the shared Tavily rate limiter."""
+
+    def raw_results(self, query: str, *args, **kwargs) -> Dict:
+        return limiters["tavily"].call(
+            super().raw_results, query, *args, api_key=self.tavily_api_key.get_secret_value(), **kwargs
+        )
+
+    async def raw_results_async(self, query: str, *args, **kwargs) -> Dict:
+        return await limiters["tavily"].acall(
+            super().raw_results_async, query, *args, api_key=self.tavily_api_key.get_secret_value(), **kwargs
+        )
+
+
+class CachedTavilySearchResults(TavilySearchResults):
+    """
+    TavilySearchResults that shares the search result cache with the search page.
+
+    Results fetched from Tavily are added to the local search index; with
+    LOCAL_FIRST on, queries the index covers are answered from it instead.
+    """
+
+    api_wrapper: TavilySearchAPIWrapper = Field(default_factory=LimitedTavilySearchAPIWrapper)
+
+    def _cache_key(self, query: str) -> str:
+        return make_key("tavily_tool", query, self.max_results, self.search_depth, self.include_answer)
+
+    def _lookup(self, query: str):
+        """
+        Looks the query up in the tool's own entries, then in the search page's.
+
+        The page runs an "advanced" search with more results, so its cached
+        output can answer the tool as well: its top results are reshaped into
+        the tool's [{"title", "url", "content"}] format.
+        """
+        cached = search_cache.get("tavily_tool", self._cache_key(query))
+        if cached is not MISS:
+            return cached
+
+        page_output = search_cache.get("tavily", make_key("tavily", query, []))
+        if page_output is not MISS:
+            web_results, _ = page_output
+            content = [
+                {"title": r["title"], "url": r["link"], "content": r["content"]}
+                for r in web_results.get("results", [])[:self.max_results]
+            ]
+            if content:
+                return content, web_results
+        return MISS
+
+    def _local(self, query: str):
+        """The local index's results in the tool's (content, artifact) format, or None on a miss."""
+        hits = local_search(query, self.max_results)
+        if hits is None:
+            return None
+        content = [{"title": hit["title"], "url": hit["url"], "content": hit["content"]} for hit in hits]
+        return content, {"query": query, "source": "local", "results": content}
+
+    def _run(
+        self,
+        query: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> Tuple[Union[List[Dict[str, str]], str], Dict]:
+        """Returns cached results for the query, calling Tavily only on a miss."""
+        local = self._local(query)
+        if local is not None:
+            return local
+
+        def fetch_upstream():
+            content, artifact = super(CachedTavilySearchResults, self)._run(query, run_manager=run_manager)
+            index_results(content)
+            return content, artifact
+
+        # Concurrent identical questions share one Tavily call. Errors come back
+        # as (repr(e), {}); only real results are cached.
+        content, artifact = fetch(
+            "tavily_tool", self._cache_key(query), fetch_upstream,
+            should_store=lambda value: bool(value[1]),
+            lookup=lambda: self._lookup(query),
+        )
+        return content, artifact
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+    ) -> Tuple[Union[List[Dict[str, str]], str], Dict]:
+        """Async variant of `_run`, sharing the same cache."""
+        local = self._local(query)
+        if local is not None:
+            return local
+
+        async def fetch_upstream():
+            content, artifact = await super(CachedTavilySearchResults, self)._arun(query, run_manager=run_manager)
+            index_results(content)
+            return content, artifact
+
+        content, artifact = await afetch(
+            "tavily_tool", self._cache_key(query), fetch_upstream,
+            should_store=lambda value: bool(value[1]),
+            lookup=lambda: self._lookup(query),
+        )
+        return content, artifact
@@ -38,11 +38,11 @@ class ProvideJoke(BaseTool):
             except Exception as e:
                 return f"Error fetching joke: {e}"
 
-    async def _arun(self, language: Optional[str] = None, category: Optional[str] = None) -> str:
+    async def _arun(self, language: Optional[str] = "en", category: Optional[str] = "neutral") -> str:
         """
-        Asynchronously executes the tool, but always raises NotImplementedError.
-        
-        Raises:
-            NotImplementedError: Async execution is not supported for this tool.
+        Asynchronously fetches a random joke.
+
+        pyjokes picks from an in-memory list, so this simply runs `_run` without
+        handing it off to a thread.
         """
-        raise NotImplementedError("This tool does not support async execution.")
\ No newline at end of file
+        return self._run(language=language, category=category)